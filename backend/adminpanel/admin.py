@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Department, Position, Employee
+from .search import search_employees
 
 @admin.register(Department)
 class DepartmentAdmin(admin.ModelAdmin):
@@ -16,4 +17,9 @@ class EmployeeAdmin(admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'email', 'phone_number', 'department', 'position', 'salary')
     search_fields = ('first_name', 'last_name', 'email', 'phone_number')
     list_filter = ('department', 'position')
+    list_select_related = ('department', 'position')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the token index instead of OR'd LIKE '%term%' scans; the changelist applies its own ordering
+        return search_employees(queryset, search_term, ranked=False), False
 
@@ -0,0 +1,385 @@
+"""
+Pre-aggregated workforce analytics.
+
+WorkforceSummary keeps headcount and salary sum/min/max per (department,
+position, month of joining); SalaryHistogram keeps headcount per (department,
+position, salary bucket), with bucket bounds growing by BUCKET_GROWTH so a
+percentile read from it is within about 1% of the exact value. Both tables are
+tiny next to Employee, so the analytics endpoints aggregate them instead of
+scanning employees.
+
+Employee writes are turned into a SummaryDelta and applied as set-based SQL:
+one increment UPDATE per touched cell (headcount = headcount + n), sent as a
+single executemany, which locks just those rows. Signals cover single saves and
+deletes, and bulk writers wrap their batch in batched_updates() so it is
+applied once. `manage.py rebuild_analytics`
+recomputes both tables from scratch.
+"""
+import math
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection, connections, router, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.constants import OnConflict
+from django.db.models.functions import TruncMonth
+
+from .models import Employee, SalaryHistogram, WorkforceSummary
+
+BUCKET_GROWTH = 1.02
+LOG_GROWTH = math.log(BUCKET_GROWTH)
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+CENTS = Decimal('0.01')
+
+SUMMARY_FIELDS = ('department_id', 'position_id', 'date_of_joining', 'salary')
+SUMMARY_KEY = ('department_id', 'position_id', 'hire_month')
+HISTOGRAM_KEY = ('department_id', 'position_id', 'bucket')
+
+
+def salary_bucket(salary):
+    """Bucket 0 holds salaries below 1; bucket b >= 1 holds [GROWTH ** (b - 1), GROWTH ** b)."""
+    salary = float(salary)
+    if salary < 1:
+        return 0
+    return int(math.log(salary) / LOG_GROWTH) + 1
+
+
+def bucket_value(bucket):
+    """Representative salary of a bucket (its geometric midpoint)."""
+    return 0.0 if bucket == 0 else BUCKET_GROWTH ** (bucket - 0.5)
+
+
+def summary_row(department_id, position_id, date_of_joining, salary):
+    """The employee values the summaries depend on, normalised."""
+    if isinstance(date_of_joining, str):
+        date_of_joining = date.fromisoformat(date_of_joining)
+    return department_id, position_id, date_of_joining, Decimal(str(salary))
+
+
+def employee_summary_row(employee):
+    return summary_row(*(getattr(employee, field) for field in SUMMARY_FIELDS))
+
+
+def _month_after(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _min(*values):
+    values = [value for value in values if value is not None]
+    return min(values) if values else None
+
+
+def _max(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _insert_sql(connection, model, fields, ignore_conflicts=False):
+    on_conflict = OnConflict.IGNORE if ignore_conflicts else None
+    quote = connection.ops.quote_name
+    return ' '.join([
+        connection.ops.insert_statement(on_conflict=on_conflict),
+        quote(model._meta.db_table),
+        f"({', '.join(quote(field.column) for field in fields)})",
+        '{}',  # VALUES or SELECT
+        connection.ops.on_conflict_suffix_sql(fields, on_conflict, None, None),
+    ])
+
+
+def _insert_rows(model, field_names, rows, ignore_conflicts=False):
+    """INSERT rows of field_names values as one executemany; bulk_create's per-value compilation costs far more."""
+    connection = connections[router.db_for_write(model)]
+    fields = [model._meta.get_field(name) for name in field_names]
+    sql = _insert_sql(connection, model, fields, ignore_conflicts).format(f"VALUES ({', '.join(['%s'] * len(fields))})")
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)] for row in rows
+        ])
+
+
+def _ensure_rows(model, key_fields, changes):
+    """
+    Create the empty summary rows that keys gaining employees don't have yet; rows
+    only losing employees exist already. Returns all the keys, sorted.
+    """
+    keys = sorted(changes)  # Same lock order in every writer
+    counters = [field for field in model._meta.concrete_fields if field.has_default()]  # Starting at 0
+    defaults = tuple(field.get_default() for field in counters)
+    rows = [(*key, *defaults) for key in keys if changes[key][0]]
+    if rows:
+        _insert_rows(model, [*key_fields, *(field.name for field in counters)], rows, ignore_conflicts=True)
+    return keys
+
+
+def _update_each(model, key_fields, assignments, params):
+    """
+    UPDATE model's table SET assignments for one key per params tuple (the SET
+    parameters followed by the key), as a single executemany. Each UPDATE
+    locks its row until the transaction ends.
+    """
+    if not params:
+        return
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    where = ' AND '.join(f'{quote(model._meta.get_field(field).column)} = %s' for field in key_fields)
+    with connection.cursor() as cursor:
+        cursor.executemany(f'UPDATE {quote(model._meta.db_table)} SET {assignments} WHERE {where}', params)
+
+
+# Never below 0, and without a negative intermediate for the unsigned column on MySQL
+HEADCOUNT = 'headcount = CASE WHEN headcount + %s > %s THEN headcount + %s - %s ELSE 0 END'
+
+
+def _headcount_params(added, removed):
+    return added, removed, added, removed
+
+
+def _delete_emptied(model, keys):
+    # The department and position narrow it down through the unique key's leading columns
+    model.objects.filter(
+        department_id__in={key[0] for key in keys}, position_id__in={key[1] for key in keys}, headcount=0,
+    ).delete()
+
+
+class SummaryDelta:
+    """Net change to the summary tables from a set of employee rows added and removed."""
+
+    def __init__(self):
+        # (department_id, position_id, hire_month) -> [added, removed, salary_sum, added min, added max]
+        self.cells = defaultdict(lambda: [0, 0, Decimal(0), None, None])
+        # (department_id, position_id, bucket) -> [added, removed]
+        self.buckets = defaultdict(lambda: [0, 0])
+
+    def add(self, row, sign=1):
+        department_id, position_id, date_of_joining, salary = row
+        cell = self.cells[(department_id, position_id, date_of_joining.replace(day=1))]
+        bucket = self.buckets[(department_id, position_id, salary_bucket(salary))]
+        cell[2] += sign * salary
+        if sign > 0:
+            cell[0] += 1
+            bucket[0] += 1
+            cell[3], cell[4] = _min(cell[3], salary), _max(cell[4], salary)
+        else:
+            cell[1] += 1
+            bucket[1] += 1
+
+    def remove(self, row):
+        self.add(row, sign=-1)
+
+    def apply(self):
+        buckets = {key: change for key, change in self.buckets.items() if change[0] != change[1]}
+        if not self.cells and not buckets:
+            return
+        with transaction.atomic(savepoint=False):  # Part of the caller's transaction if there is one
+            if self.cells:
+                self._apply_cells()
+            if buckets:
+                self._apply_buckets(buckets)
+        self.cells.clear()
+        self.buckets.clear()
+
+    def _apply_cells(self):
+        keys = _ensure_rows(WorkforceSummary, SUMMARY_KEY, self.cells)
+        # Only additions: the new extremes are merged in
+        merge = f"""{HEADCOUNT},
+            salary_sum = salary_sum + %s,
+            salary_min = CASE WHEN salary_min IS NULL OR salary_min > %s THEN %s ELSE salary_min END,
+            salary_max = CASE WHEN salary_max IS NULL OR salary_max < %s THEN %s ELSE salary_max END"""
+        # Removals: an extreme may have left, so both are reread through the (department, date_of_joining) index
+        quote = connection.ops.quote_name
+        extreme = (
+            f'SELECT {{}}({quote("salary")}) FROM {quote(Employee._meta.db_table)} WHERE {quote("department_id")} = %s '
+            f'AND {quote("position_id")} = %s AND {quote("date_of_joining")} >= %s AND {quote("date_of_joining")} < %s'
+        )
+        reread = f"""{HEADCOUNT},
+            salary_sum = salary_sum + %s,
+            salary_min = ({extreme.format('MIN')}),
+            salary_max = ({extreme.format('MAX')})"""
+
+        merged, reread_params = [], []
+        for key in keys:
+            added, removed, salary_sum, added_min, added_max = self.cells[key]
+            counts = _headcount_params(added, removed)
+            if removed:
+                month = (key[0], key[1], key[2], _month_after(key[2]))
+                reread_params.append((*counts, salary_sum, *month, *month, *key))
+            else:
+                merged.append((*counts, salary_sum, added_min, added_min, added_max, added_max, *key))
+        _update_each(WorkforceSummary, SUMMARY_KEY, merge, merged)
+        _update_each(WorkforceSummary, SUMMARY_KEY, reread, reread_params)
+        if reread_params:
+            _delete_emptied(WorkforceSummary, keys)
+
+    def _apply_buckets(self, buckets):
+        keys = _ensure_rows(SalaryHistogram, HISTOGRAM_KEY, buckets)
+        _update_each(SalaryHistogram, HISTOGRAM_KEY, HEADCOUNT, [(*_headcount_params(*buckets[key]), *key) for key in keys])
+        if any(removed for _, removed in buckets.values()):
+            _delete_emptied(SalaryHistogram, keys)
+
+
+_local = threading.local()
+
+
+def pending_delta():
+    """The delta collected by an enclosing batched_updates() block, or None."""
+    return getattr(_local, 'delta', None)
+
+
+@contextmanager
+def batched_updates():
+    """
+    Collect summary changes made inside the block, including those from signals,
+    and apply them once when it exits without an error. Use it inside the
+    transaction that writes the employees.
+    """
+    if pending_delta() is not None:
+        yield pending_delta()
+        return
+    delta = _local.delta = SummaryDelta()
+    try:
+        yield delta
+    finally:
+        _local.delta = None
+    delta.apply()
+
+
+def record_change(before=None, after=None):
+    """Apply (or queue, inside batched_updates) an employee's move from `before` to `after` summary rows."""
+    if before == after:
+        return
+    delta = pending_delta() or SummaryDelta()
+    if before is not None:
+        delta.remove(before)
+    if after is not None:
+        delta.add(after)
+    if pending_delta() is None:
+        delta.apply()
+
+
+def rebuild_summaries(batch_size=5000):
+    """Recompute both summary tables from Employee. Returns (summary cells, histogram cells)."""
+    cells = (
+        Employee.objects.order_by()
+        .annotate(hire_month=TruncMonth('date_of_joining'))
+        .values('department_id', 'position_id', 'hire_month')
+        .annotate(headcount=Count('id'), salary_sum=Sum('salary'), salary_min=Min('salary'), salary_max=Max('salary'))
+    )
+    # Buckets are computed in Python so they match the incremental path exactly
+    buckets = Counter()
+    for department_id, position_id, salary in Employee.objects.order_by().values_list(
+        'department_id', 'position_id', 'salary'
+    ).iterator(chunk_size=batch_size):
+        buckets[(department_id, position_id, salary_bucket(salary))] += 1
+
+    summary_fields = ['department_id', 'position_id', 'hire_month', 'headcount', 'salary_sum', 'salary_min', 'salary_max']
+    connection = connections[router.db_for_write(WorkforceSummary)]
+    select, params = cells.values_list(*summary_fields).query.get_compiler(connection=connection).as_sql()
+    fields = [WorkforceSummary._meta.get_field(name) for name in summary_fields]
+    with transaction.atomic():
+        WorkforceSummary.objects.all().delete()
+        SalaryHistogram.objects.all().delete()
+        # Straight from the GROUP BY into the table
+        with connection.cursor() as cursor:
+            cursor.execute(_insert_sql(connection, WorkforceSummary, fields).format(select), params)
+            summaries = cursor.rowcount
+        _insert_rows(SalaryHistogram, HISTOGRAM_KEY + ('headcount',), [
+            (*key, headcount) for key, headcount in buckets.items()
+        ])
+    return summaries, len(buckets)
+
+
+# Reading
+
+GROUP_FIELDS = {
+    'department': ('department_id', 'department__name'),
+    'position': ('position_id', 'position__title'),
+}
+
+
+def _filtered(queryset, department=None, position=None):
+    if department is not None:
+        queryset = queryset.filter(department_id=department)
+    if position is not None:
+        queryset = queryset.filter(position_id=position)
+    return queryset
+
+
+def _group_output(row, group_by):
+    output = {}
+    for group in group_by:
+        id_field, name_field = GROUP_FIELDS[group]
+        output[group] = row[id_field]
+        output[f'{group}_name'] = row[name_field]
+    return output
+
+
+def _percentiles(buckets, total, low, high, percentiles):
+    ordered = sorted(buckets.items())
+    estimates = {}
+    for percentile in percentiles:
+        rank = max(1, math.ceil(percentile / 100 * total))
+        seen = 0
+        for bucket, headcount in ordered:
+            seen += headcount
+            if seen >= rank:
+                break
+        # The bucket midpoint, kept within the exact min/max of the group
+        value = Decimal(bucket_value(bucket)).quantize(CENTS)
+        estimates[f'p{percentile:g}'] = min(max(value, low), high)
+    return estimates
+
+
+def salary_stats(group_by=(), department=None, position=None, percentiles=DEFAULT_PERCENTILES):
+    """Headcount and salary sum/avg/min/max/percentiles, one entry per group."""
+    id_fields = [GROUP_FIELDS[group][0] for group in group_by]
+    fields = [field for group in group_by for field in GROUP_FIELDS[group]]
+    totals = dict(headcount=Sum('headcount'), salary_sum=Sum('salary_sum'),
+                  salary_min=Min('salary_min'), salary_max=Max('salary_max'))
+
+    summaries = _filtered(WorkforceSummary.objects.order_by(), department, position)
+    rows = list(summaries.values(*fields).annotate(**totals).order_by(*fields)) if fields else [summaries.aggregate(**totals)]
+
+    histograms = defaultdict(dict)
+    bucket_rows = (
+        _filtered(SalaryHistogram.objects.order_by(), department, position)
+        .values(*id_fields, 'bucket').annotate(count=Sum('headcount'))
+    )
+    for row in bucket_rows:
+        histograms[tuple(row[field] for field in id_fields)][row['bucket']] = row['count']
+
+    results = []
+    for row in rows:
+        headcount = row['headcount'] or 0
+        if not headcount:
+            continue
+        results.append({
+            **_group_output(row, group_by),
+            'headcount': headcount,
+            'salary_sum': row['salary_sum'],
+            'salary_avg': (row['salary_sum'] / headcount).quantize(CENTS),
+            'salary_min': row['salary_min'],
+            'salary_max': row['salary_max'],
+            'salary_percentiles': _percentiles(
+                histograms[tuple(row[field] for field in id_fields)], headcount,
+                row['salary_min'], row['salary_max'], percentiles,
+            ),
+        })
+    return results
+
+
+def hires_per_month(group_by=(), department=None, position=None, start=None, end=None):
+    """Hires per month of joining (months given as first-of-month dates, inclusive)."""
+    fields = [field for group in group_by for field in GROUP_FIELDS[group]]
+    summaries = _filtered(WorkforceSummary.objects.order_by(), department, position)
+    if start is not None:
+        summaries = summaries.filter(hire_month__gte=start)
+    if end is not None:
+        summaries = summaries.filter(hire_month__lte=end)
+    rows = summaries.values(*fields, 'hire_month').annotate(hires=Sum('headcount')).order_by(*fields, 'hire_month')
+    return [
+        {**_group_output(row, group_by), 'month': row['hire_month'].strftime('%Y-%m'), 'hires': row['hires']}
+        for row in rows
+    ]
@@ -0,0 +1,216 @@
+"""
+Native async variants of the read endpoints, for ASGI deployments.
+
+With ASYNC_READ_VIEWS on (core/asgi.py turns it on), adminpanel/urls.py routes
+these endpoints to the views below: the department, position and employee
+list/detail endpoints and the CSV export.
+
+A GET never holds a worker thread while it waits:
+- Authentication reads the token claims and checks the token version through
+  the async cache API.
+- The response cache and page counts use the async cache API too.
+- Rows come from the async ORM (async for, aget, acount, aiterator).
+- The CSV export streams from an async generator.
+
+Filtering, ordering, pagination and serialization are the sync DRF view's own,
+so the responses and cache entries are identical. Other methods (writes) are
+passed to the sync DRF view.
+
+Only JSON is served. The browsable API stays on the sync views.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+
+from .authentication import ClaimsJWTAuthentication
+from .exports import astream_csv, employee_export_arows
+from .models import Department, Employee, Position
+from .renderers import FastJSONRenderer
+from .response_cache import response_cache_headers, response_cache_key
+from .row_serializers import EmployeeRowSerializer
+from .versioning import aget_versions
+from .views import (
+    DepartmentListCreateView, DepartmentRetrieveUpdateDestroyView, EmployeeExportCSVView, EmployeeListCreateView,
+    EmployeeRetrieveUpdateDestroyView, PositionListCreateView, PositionRetrieveUpdateDestroyView,
+)
+
+# Employee filters that query while they are built: search ids and department/position validation
+EMPLOYEE_DB_FILTER_PARAMS = ('search', 'department', 'position')
+
+
+class AsyncReadView(View):
+    drf_view = None  # The sync DRF view whose queryset, filters, pagination and serializer are reused
+    cache_models = ()  # As in CachedResponseMixin
+    db_filter_params = ()  # Query params whose filters can't be built without the database
+    sync_view = None  # drf_view.as_view(), which serves every other method
+    authentication = ClaimsJWTAuthentication()
+    renderer = FastJSONRenderer()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(sync_view=cls.drf_view.as_view(), **initkwargs)
+        # drf_yasg documents the endpoint from the DRF view it mirrors
+        view.cls = cls.drf_view
+        view.initkwargs = {}
+        return csrf_exempt(view)
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            view = await self.initial(request, args, kwargs)
+            return await self.read(request, view)
+        except exceptions.APIException as exc:
+            return self.error_response(request, exc)
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    post = put = patch = delete = delegate
+
+    async def initial(self, request, args, kwargs):
+        """Authenticate, then set up an instance of the DRF view for this request."""
+        result = await self.authentication.aauthenticate_read(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        drf_request = Request(request)
+        drf_request.user, drf_request.auth = result
+
+        view = self.drf_view()
+        view.setup(drf_request, *args, **kwargs)
+        view.format_kwarg = None
+        view.headers = {}
+        view.check_permissions(drf_request)
+        return view
+
+    async def read(self, request, view):
+        """The cached JSON response, as CachedResponseMixin.get() gives it."""
+        key = response_cache_key(request, await aget_versions(*self.cache_models))
+        headers = response_cache_headers(key)
+        if headers['ETag'] in request.headers.get('If-None-Match', ''):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = await cache.aget(key)
+        if data is None:
+            data = await self.get_data(view)
+            await cache.aset(key, data, settings.API_CACHE_TIMEOUT)
+        return self.json_response(data, headers=headers)
+
+    async def get_data(self, view):
+        raise NotImplementedError
+
+    async def filter_queryset(self, view):
+        queryset = view.get_queryset()
+        if any(param in view.request.query_params for param in self.db_filter_params):
+            return await sync_to_async(view.filter_queryset)(queryset)
+        return view.filter_queryset(queryset)
+
+    def json_response(self, data, status=status.HTTP_200_OK, headers=None):
+        return HttpResponse(self.renderer.render(data), status=status, headers=headers, content_type='application/json')
+
+    def error_response(self, request, exc):
+        # What DRF's exception handler returns for the same error
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        headers = {}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            headers['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+        return self.json_response(data, status=exc.status_code, headers=headers)
+
+
+class AsyncListView(AsyncReadView):
+    def prepare(self, view, queryset):
+        return queryset
+
+    def serialize(self, view, rows):
+        return view.get_serializer(rows, many=True).data
+
+    async def get_data(self, view):
+        queryset = self.prepare(view, await self.filter_queryset(view))
+        page = await view.paginator.apaginate_queryset(queryset, view.request, view)
+        if page is None:
+            return self.serialize(view, [row async for row in queryset])
+        return view.paginator.get_paginated_response(self.serialize(view, page)).data
+
+
+class AsyncDetailView(AsyncListView):
+    async def get_data(self, view):
+        queryset = self.prepare(view, await self.filter_queryset(view))
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            obj = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+        except ObjectDoesNotExist:
+            raise exceptions.NotFound(f'No {queryset.model._meta.object_name} matches the given query.')
+        view.check_object_permissions(view.request, obj)
+        return self.serialize(view, [obj])[0]
+
+
+class EmployeeRowsMixin:
+    # The .values() field plan of EmployeeListCreateView instead of EmployeeSerializer; same output
+    def get_row_serializer(self, view):
+        return EmployeeRowSerializer()
+
+    def prepare(self, view, queryset):
+        self.row_serializer = self.get_row_serializer(view)
+        return self.row_serializer.values(queryset)
+
+    def serialize(self, view, rows):
+        return self.row_serializer.to_representation(rows)
+
+
+class AsyncDepartmentListView(AsyncListView):
+    drf_view = DepartmentListCreateView
+    cache_models = (Department,)
+
+
+class AsyncDepartmentDetailView(AsyncDetailView):
+    drf_view = DepartmentRetrieveUpdateDestroyView
+    cache_models = (Department,)
+
+
+class AsyncPositionListView(AsyncListView):
+    drf_view = PositionListCreateView
+    cache_models = (Position,)
+
+
+class AsyncPositionDetailView(AsyncDetailView):
+    drf_view = PositionRetrieveUpdateDestroyView
+    cache_models = (Position,)
+
+
+class AsyncEmployeeListView(EmployeeRowsMixin, AsyncListView):
+    drf_view = EmployeeListCreateView
+    cache_models = (Employee, Department, Position)  # As in EmployeeListCreateView
+    db_filter_params = EMPLOYEE_DB_FILTER_PARAMS
+
+    def get_row_serializer(self, view):
+        return view.get_row_serializer()  # Honours ?nested=
+
+
+class AsyncEmployeeDetailView(EmployeeRowsMixin, AsyncDetailView):
+    drf_view = EmployeeRetrieveUpdateDestroyView
+    cache_models = (Employee, Department, Position)
+
+
+class AsyncEmployeeExportCSVView(AsyncReadView):
+    drf_view = EmployeeExportCSVView
+    db_filter_params = EMPLOYEE_DB_FILTER_PARAMS
+
+    async def read(self, request, view):
+        employees = await self.filter_queryset(view)
+        response = StreamingHttpResponse(astream_csv(employee_export_arows(employees)), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="employees.csv"'
+        return response
+
+
+# Sync DRF view -> async read variant (see adminpanel/urls.py)
+ASYNC_VIEWS = {
+    view.drf_view: view for view in (
+        AsyncDepartmentListView, AsyncDepartmentDetailView, AsyncPositionListView, AsyncPositionDetailView,
+        AsyncEmployeeListView, AsyncEmployeeDetailView, AsyncEmployeeExportCSVView,
+    )
+}
@@ -0,0 +1,194 @@
+"""
+JWT authentication without a user query per request.
+
+Tokens issued by MyTokenObtainPairSerializer carry the user's id, email,
+is_staff and token version. Safe (read) requests are authenticated from those
+claims alone: request.user is a ClaimsUser, and anything the claims don't
+cover is loaded from a short-lived cache of the full user. Writes get the full
+user from that cache, so its is_active flag is checked.
+
+Revocation goes through a per-user token version kept in the configured cache.
+A token is only accepted while its version claim matches. Any change to the
+user account (see signals.py) bumps the version. `manage.py revoke_tokens`
+bumps it on demand. A missing version is seeded from the clock, as in
+versioning.py, so a flushed cache revokes every token instead of reviving
+revoked ones.
+
+A successful login's token pair is kept for TOKEN_REUSE_SECONDS, so the same
+credentials from the same client get it back without running the password
+hasher again.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+def _version_key(user_id):
+    return f'adminpanel:token_version:{user_id}'
+
+
+def get_token_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_token_version(user_id):
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def revoke_tokens(user_id):
+    """Invalidate every token issued to the user so far."""
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def add_claims(token, user):
+    """The claims ClaimsJWTAuthentication needs; called when a token pair is issued."""
+    token['email'] = user.email
+    token['is_staff'] = user.is_staff
+    token[TOKEN_VERSION_CLAIM] = get_token_version(user.pk)
+    return token
+
+
+def _token_pair_key(request, email, password):
+    # Keyed by an HMAC of the credentials and the client, so a wrong password never matches
+    # and the cache never holds anything a password could be recovered from
+    client = f"{request.META.get('REMOTE_ADDR', '')}\0{request.META.get('HTTP_USER_AGENT', '')}"
+    digest = salted_hmac(
+        'adminpanel.token_pair', f'{email.strip().lower()}\0{password}\0{client}', secret=settings.TOKEN_REUSE_KEY,
+    ).hexdigest()
+    return f'adminpanel:token_pair:{digest}'
+
+
+def _reuse_enabled(request):
+    # Without its own key there is no reuse: the cache keys would derive from SECRET_KEY,
+    # which is checked into settings.py
+    return bool(settings.TOKEN_REUSE_SECONDS and settings.TOKEN_REUSE_KEY and request is not None)
+
+
+def reusable_token_pair(request, email, password):
+    """The pair issued to the same credentials and client in the last TOKEN_REUSE_SECONDS, if still valid."""
+    if not _reuse_enabled(request):
+        return None
+    entry = cache.get(_token_pair_key(request, email, password))
+    if entry is None or entry['version'] != get_token_version(entry['user_id']):
+        return None
+    return entry['tokens']
+
+
+def remember_token_pair(request, email, password, user, tokens):
+    if _reuse_enabled(request):
+        entry = {'user_id': user.pk, 'version': get_token_version(user.pk), 'tokens': tokens}
+        cache.set(_token_pair_key(request, email, password), entry, settings.TOKEN_REUSE_SECONDS)
+
+
+def _token_user_id(token):
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None:
+        raise InvalidToken('Token contained no recognizable user identification')
+    return user_id
+
+
+def _check_version(token, current):
+    version = token.get(TOKEN_VERSION_CLAIM)
+    if version is None or version != current:
+        raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+
+
+def check_token_version(token):
+    _check_version(token, get_token_version(_token_user_id(token)))
+
+
+async def acheck_token_version(token):
+    _check_version(token, await aget_token_version(_token_user_id(token)))
+
+
+def cached_user(user_id, version):
+    """The full user row, cached for AUTH_USER_CACHE_TIMEOUT seconds per token version; None if it is gone."""
+    key = f'adminpanel:auth_user:{user_id}:{version}'
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+class ClaimsUser(TokenUser):
+    """A user built from token claims; other attributes come from the cached full user."""
+
+    @cached_property
+    def user(self):
+        user = cached_user(self.id, self.token[TOKEN_VERSION_CLAIM])
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        return user
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.user, attr)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that checks the token version instead of querying the user table."""
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        token = self.get_validated_token(raw_token)
+        check_token_version(token)
+        if request.method in SAFE_METHODS:
+            return ClaimsUser(token), token
+        return self.get_user(token), token
+
+    async def aauthenticate_read(self, request):
+        """authenticate() for a safe request on a plain Django request, through the async cache API."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        token = self.get_validated_token(raw_token)
+        await acheck_token_version(token)
+        return ClaimsUser(token), token
+
+    def get_user(self, validated_token):
+        user = cached_user(validated_token[api_settings.USER_ID_CLAIM], validated_token[TOKEN_VERSION_CLAIM])
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
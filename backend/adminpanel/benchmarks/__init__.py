@@ -0,0 +1,160 @@
+"""
+Benchmark suites for ``python manage.py benchmark <suite>``.
+
+Each suite is a function registered with ``@register('name')`` that receives the
+parsed command options and returns a list of result dicts (one per measurement).
+The command can write the results as JSON and compare them with a stored
+baseline through compare_results().
+"""
+import multiprocessing
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+SUITES = {}
+
+
+def register(name):
+    def decorator(func):
+        SUITES[name] = func
+        return func
+    return decorator
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_calls(func, iterations, warmup=2):
+    """Call func repeatedly; returns latency stats in milliseconds plus calls/sec."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(samples, 0.50), 2),
+        'p95_ms': round(percentile(samples, 0.95), 2),
+        'p99_ms': round(percentile(samples, 0.99), 2),
+        'per_sec': round(iterations / elapsed, 1) if elapsed else None,
+    }
+
+
+def time_concurrent(func, threads, iterations, warmup=2):
+    """Call func from `threads` threads, `iterations` times each; same stats as time_calls over every call."""
+    def worker():
+        try:
+            for _ in range(warmup):
+                func()
+            barrier.wait()
+            latencies = []
+            for _ in range(iterations):
+                call_started = time.perf_counter()
+                func()
+                latencies.append((time.perf_counter() - call_started) * 1000)
+            return latencies
+        except BaseException:
+            barrier.abort()  # Release the other threads; the error is raised by future.result()
+            raise
+        finally:
+            connections.close_all()  # Each thread opened its own connections
+
+    barrier = threading.Barrier(threads + 1)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(worker) for _ in range(threads)]
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        started = time.perf_counter()
+        samples = [latency for future in futures for latency in future.result()]
+        elapsed = time.perf_counter() - started
+    return {
+        'threads': threads,
+        'iterations': len(samples),
+        'p50_ms': round(percentile(samples, 0.50), 2),
+        'p95_ms': round(percentile(samples, 0.95), 2),
+        'p99_ms': round(percentile(samples, 0.99), 2),
+        'per_sec': round(len(samples) / elapsed, 1) if elapsed else None,
+    }
+
+
+# Metrics compared against a baseline, by whether lower or higher is better
+LOWER_IS_BETTER = ('p50_ms', 'p95_ms', 'p99_ms', 'seconds', 'peak_rss_mb')
+HIGHER_IS_BETTER = ('per_sec', 'rows_per_sec')
+IDENTITY_FIELDS = ('suite', 'benchmark', 'rows_requested', 'threads')
+
+
+def _identity(result):
+    return tuple(result.get(field) for field in IDENTITY_FIELDS)
+
+
+def compare_results(baseline, results, threshold):
+    """Descriptions of every metric in results that is more than threshold percent worse than baseline."""
+    previous = {_identity(result): result for result in baseline if 'benchmark' in result}
+    regressions = []
+    for result in results:
+        old = previous.get(_identity(result))
+        if old is None:
+            continue
+        name = '/'.join(str(part) for part in _identity(result) if part is not None)
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > threshold:
+                regressions.append(f"{name} {metric}: {before} -> {after} ({change:+.1f}% worse)")
+    return regressions
+
+
+def _current_rss_kb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def _child(func, args, queue):
+    baseline_kb = _current_rss_kb()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({
+        'seconds': round(elapsed, 3),
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'rss_growth_mb': round(max(peak_kb - baseline_kb, 0) / 1024, 1),
+        'result': result,
+    })
+
+
+def run_isolated(func, *args):
+    """
+    Run func(*args) in a forked child so its peak RSS is measured on its own.
+
+    DB connections are closed first so the child opens its own instead of sharing
+    the parent's socket.
+    """
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(func, args, queue))
+    process.start()
+    measurement = queue.get()
+    process.join()
+    return measurement
+
+
+# Import suites so they register themselves
+from . import api, asgi, auth, bulk, crud, db_connections, exports, imports, serialization  # noqa: E402,F401
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from adminpanel.models import Department, Employee
+from adminpanel.views import EmployeeListCreateView
+
+from . import register, time_calls
+
+factory = APIRequestFactory(SERVER_NAME='localhost')  # A host in ALLOWED_HOSTS
+benchmark_user = User(username='benchmark')  # Unsaved; only needs to be authenticated
+
+
+def call_view(view, path, params=None, method='get', data=None, **kwargs):
+    request = getattr(factory, method)(path, data if data is not None else params, format='json' if data is not None else None)
+    force_authenticate(request, user=benchmark_user)
+    response = view(request, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def list_cases():
+    department = Department.objects.order_by('id').values_list('id', flat=True).first()
+    total = Employee.objects.count()
+    deep_page = max(1, total // 50 // 2)  # Halfway through the table
+    return [
+        ('list_default', {}),
+        ('list_order_joining_desc', {'ordering': '-date_of_joining'}),
+        ('list_order_salary', {'ordering': 'salary'}),
+        ('list_dept_order_salary', {'department': department, 'ordering': '-salary'}),
+        ('list_dept_joining_range', {'department': department, 'date_of_joining__gte': '2020-01-01',
+                                     'ordering': '-date_of_joining'}),
+        ('list_salary_range', {'salary__gte': 50000, 'salary__lte': 60000, 'ordering': 'salary'}),
+        ('list_deep_page_number', {'page': deep_page}),
+        ('list_deep_keyset_equivalent', {'pagination': 'keyset', 'ordering': 'id',
+                                         'cursor': _id_cursor(deep_page * 50)}),
+    ]
+
+
+def _id_cursor(offset):
+    # The cursor a client would hold after scrolling `offset` rows in id order
+    from adminpanel.pagination import KeysetPagination
+    last_id = Employee.objects.order_by('id').values_list('id', flat=True)[offset - 1:offset].first() or 0
+    return KeysetPagination(50).encode_cursor([last_id])
+
+
+def search_cases():
+    employee = Employee.objects.order_by('id').values('first_name', 'last_name', 'email', 'phone_number').first()
+    if employee is None:
+        return []
+    first_name = employee['first_name'].lower()
+    return [
+        ('search_first_name', {'search': first_name}),
+        ('search_name_prefix', {'search': first_name[:3]}),
+        ('search_full_name', {'search': f"{first_name} {employee['last_name'].lower()}"}),
+        ('search_email_prefix', {'search': employee['email'].split('@')[0][:8]}),
+        ('search_phone_prefix', {'search': employee['phone_number'][:6]}),
+        ('search_fuzzy_typo', {'search': first_name[:-1] + ('x' if first_name[-1] != 'x' else 'y')}),
+        ('search_ordered_by_salary', {'search': first_name, 'ordering': '-salary'}),
+    ]
+
+
+def run_list_cases(cases, options):
+    view = EmployeeListCreateView.as_view()
+    rows_in_table = Employee.objects.count()
+    results = []
+    # A zero timeout keeps the response cache from storing anything, so every call reaches the database
+    with override_settings(API_CACHE_TIMEOUT=0):
+        for name, params in cases:
+            stats = time_calls(lambda: call_view(view, '/api/employees/', params), options['iterations'])
+            results.append({'benchmark': name, 'rows_in_table': rows_in_table, **stats})
+    return results
+
+
+@register('list')
+def list_suite(options):
+    results = run_list_cases(list_cases(), options)
+    view = EmployeeListCreateView.as_view()
+    stats = time_calls(lambda: call_view(view, '/api/employees/'), options['iterations'])
+    results.append({'benchmark': 'list_default_cached', 'rows_in_table': results[0]['rows_in_table'], **stats})
+    return results
+
+
+@register('search')
+def search_suite(options):
+    return run_list_cases(search_cases(), options)
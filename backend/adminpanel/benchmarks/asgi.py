@@ -0,0 +1,107 @@
+import asyncio
+import importlib
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+
+from adminpanel.serializers import MyTokenObtainPairSerializer
+
+from . import percentile, register, run_isolated, time_concurrent
+from .auth import BENCHMARK_EMAIL
+
+CASES = (
+    ('employee_list', '/api/employees/?page_size=50', 1),
+    # Whole-table downloads are far slower than list pages, so each client makes fewer of them
+    ('employee_export_csv', '/api/employees/export/csv/', 10),
+)
+
+
+def _check(response):
+    assert response.status_code == 200, (response.status_code, getattr(response, 'content', b''))
+
+
+def wsgi_load(path, headers, concurrency, iterations):
+    # A threaded WSGI server: every worker thread runs the request through Django's WSGI handler
+    local = threading.local()
+
+    def get():
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        response = local.client.get(path, headers=headers)
+        _check(response)
+        for _ in response:  # Consume streamed exports, as a server would
+            pass
+
+    return time_concurrent(get, concurrency, iterations)
+
+
+async def _asgi_load(path, headers, concurrency, iterations, warmup=2):
+    async def get(client):
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        _check(response)
+        if response.streaming:
+            async for _ in response.streaming_content:
+                pass
+        return (time.perf_counter() - started) * 1000
+
+    async def worker(client):
+        return [await get(client) for _ in range(iterations)]
+
+    clients = [AsyncClient() for _ in range(concurrency)]
+    for _ in range(warmup):
+        await get(clients[0])
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(worker(client) for client in clients))
+    elapsed = time.perf_counter() - started
+    samples = [latency for client_latencies in latencies for latency in client_latencies]
+    return {
+        'threads': concurrency,
+        'iterations': len(samples),
+        'p50_ms': round(percentile(samples, 0.50), 2),
+        'p95_ms': round(percentile(samples, 0.95), 2),
+        'p99_ms': round(percentile(samples, 0.99), 2),
+        'per_sec': round(len(samples) / elapsed, 1) if elapsed else None,
+    }
+
+
+def asgi_load(path, headers, concurrency, iterations):
+    # One event loop serving every client concurrently through Django's ASGI handler and async_views.py.
+    # Runs in a forked child, so re-importing the URLconf doesn't leak into the parent.
+    with override_settings(ASYNC_READ_VIEWS=True):
+        importlib.reload(importlib.import_module('adminpanel.urls'))
+        importlib.reload(importlib.import_module('core.urls'))
+        clear_url_caches()
+        try:
+            return asyncio.run(_asgi_load(path, headers, concurrency, iterations))
+        finally:
+            connections.close_all()
+
+
+@register('asgi')
+def asgi_suite(options):
+    """Authenticated reads under concurrent load: sync views under WSGI threads vs async views under ASGI."""
+    user, _ = User.objects.get_or_create(username=BENCHMARK_EMAIL, defaults={'email': BENCHMARK_EMAIL})
+    headers = {'Authorization': f'Bearer {MyTokenObtainPairSerializer.get_token(user).access_token}'}
+
+    results = []
+    # Without the response cache every request reaches the database. The test clients send Host: testserver.
+    with override_settings(API_CACHE_TIMEOUT=0, ALLOWED_HOSTS=['testserver']):
+        for name, path, divisor in CASES:
+            iterations = max(1, options['iterations'] // divisor)
+            for concurrency in options['threads']:
+                for server, load in (('wsgi', wsgi_load), ('asgi', asgi_load)):
+                    measurement = run_isolated(load, path, headers, concurrency, iterations)
+                    stats = measurement.pop('result')
+                    results.append({
+                        'benchmark': f'{name}_{server}',
+                        **stats,
+                        'peak_rss_mb': measurement['peak_rss_mb'],
+                        'rss_growth_mb': measurement['rss_growth_mb'],
+                    })
+    return results
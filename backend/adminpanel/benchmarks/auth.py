@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from adminpanel.authentication import ClaimsJWTAuthentication
+from adminpanel.models import Department
+from adminpanel.serializers import MyTokenObtainPairSerializer
+from adminpanel.views import DepartmentRetrieveUpdateDestroyView, MyTokenObtainPairView
+
+from . import register, time_calls, time_concurrent
+from .api import factory
+
+BENCHMARK_EMAIL = 'token-benchmark@benchmark.example.com'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+@register('token')
+def token_suite(options):
+    """JWT issuance through /api/token/, password hashing included."""
+    user, created = User.objects.get_or_create(username=BENCHMARK_EMAIL, defaults={'email': BENCHMARK_EMAIL})
+    if created or not user.check_password(BENCHMARK_PASSWORD):
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save()
+
+    # Unthrottled, so the suite measures issuance rather than the rate limits
+    view = MyTokenObtainPairView.as_view(throttle_classes=[])
+    body = {'email': BENCHMARK_EMAIL, 'username': BENCHMARK_EMAIL, 'password': BENCHMARK_PASSWORD}
+
+    def issue():
+        response = view(factory.post('/api/token/', body, format='json'))
+        assert response.status_code == 200, response.data
+
+    with override_settings(TOKEN_REUSE_SECONDS=0):
+        results = [{'benchmark': 'token_obtain', **time_calls(issue, options['iterations'])}]
+    # Repeat logins from one client within TOKEN_REUSE_SECONDS skip the hasher
+    with override_settings(TOKEN_REUSE_KEY=settings.TOKEN_REUSE_KEY or 'benchmark-token-reuse-key'):
+        results.append({'benchmark': 'token_obtain_reused', **time_calls(issue, options['iterations'])})
+    return results
+
+
+@register('authentication')
+def authentication_suite(options):
+    """Authenticated cached reads under concurrent load: a user query per request vs token claims."""
+    user, _ = User.objects.get_or_create(username=BENCHMARK_EMAIL, defaults={'email': BENCHMARK_EMAIL})
+    department = Department.objects.get_or_create(name='Benchmark', defaults={'location': 'Benchmark'})[0].pk
+    header = f'Bearer {MyTokenObtainPairSerializer.get_token(user).access_token}'
+    path = f'/api/departments/{department}/'
+
+    results = []
+    for name, authentication in (('jwt_user_query', JWTAuthentication), ('jwt_claims', ClaimsJWTAuthentication)):
+        # The response cache answers the view itself, so authentication dominates each request
+        view = DepartmentRetrieveUpdateDestroyView.as_view(authentication_classes=[authentication])
+
+        def read():
+            response = view(factory.get(path, HTTP_AUTHORIZATION=header), pk=department)
+            assert response.status_code == 200, response.data
+
+        read()
+        with CaptureQueriesContext(connection) as queries:
+            read()
+        for threads in options['threads']:
+            stats = time_concurrent(read, threads, options['iterations'])
+            results.append({'benchmark': name, 'queries_per_request': len(queries), **stats})
+    return results
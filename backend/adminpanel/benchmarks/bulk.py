@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+
+from adminpanel.models import Department, Employee, Position
+from adminpanel.views import EmployeeBulkView, EmployeeListCreateView, EmployeeRetrieveUpdateDestroyView
+
+from . import register
+from .api import call_view
+
+ROWS = 2000  # Employees written per case
+EMAIL_DOMAIN = 'bulk-benchmark.example.com'
+
+
+def employee_payloads(prefix, department, position):
+    return [{
+        'first_name': 'Bench',
+        'last_name': f'{prefix}{number}',
+        'email': f'{prefix}{number}@{EMAIL_DOMAIN}',
+        'phone_number': f"{'1' if prefix == 'single' else '2'}{number:09d}",
+        'date_of_joining': '2024-01-01',
+        'salary': '50000.00',
+        'department': department,
+        'position': position,
+    } for number in range(ROWS)]
+
+
+def timed(name, func):
+    started = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - started
+    return {'benchmark': name, 'rows': ROWS, 'seconds': round(seconds, 3), 'rows_per_sec': round(ROWS / seconds)}
+
+
+def batches(items):
+    size = settings.EMPLOYEE_BULK_MAX_BATCH
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+@register('bulk')
+def bulk_suite(options):
+    """Single-row endpoints vs the bulk endpoint for creates, updates and deletes."""
+    department = Department.objects.get_or_create(name='Benchmark', defaults={'location': 'Benchmark'})[0].pk
+    position = Position.objects.get_or_create(title='Benchmark')[0].pk
+    Employee.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+
+    list_view = EmployeeListCreateView.as_view()
+    detail_view = EmployeeRetrieveUpdateDestroyView.as_view()
+    bulk_view = EmployeeBulkView.as_view()
+    path = '/api/employees/bulk/'
+    results = []
+
+    singles = employee_payloads('single', department, position)
+    results.append(timed('create_single', lambda: [
+        call_view(list_view, '/api/employees/', method='post', data=item) for item in singles
+    ]))
+    results.append(timed('create_bulk', lambda: [
+        call_view(bulk_view, path, method='post', data=batch)
+        for batch in batches(employee_payloads('bulk', department, position))
+    ]))
+
+    single_ids = list(Employee.objects.filter(email__startswith='single').values_list('id', flat=True))
+    bulk_ids = list(Employee.objects.filter(email__startswith='bulk').values_list('id', flat=True))
+    results.append(timed('update_single', lambda: [
+        call_view(detail_view, f'/api/employees/{pk}/', method='patch', data={'salary': '51000.00'}, pk=pk)
+        for pk in single_ids
+    ]))
+    results.append(timed('update_bulk', lambda: [
+        call_view(bulk_view, path, method='patch', data=batch)
+        for batch in batches([{'id': pk, 'salary': '51000.00'} for pk in bulk_ids])
+    ]))
+
+    results.append(timed('delete_single', lambda: [
+        call_view(detail_view, f'/api/employees/{pk}/', method='delete', pk=pk) for pk in single_ids
+    ]))
+    results.append(timed('delete_bulk', lambda: [
+        call_view(bulk_view, path, method='delete', data=batch) for batch in batches(bulk_ids)
+    ]))
+    return results
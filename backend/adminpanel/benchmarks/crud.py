@@ -0,0 +1,54 @@
+import itertools
+
+from adminpanel.models import Department, Employee, Position
+from adminpanel.views import EmployeeListCreateView, EmployeeRetrieveUpdateDestroyView
+
+from . import register, time_calls
+from .api import call_view
+
+EMAIL_DOMAIN = 'crud-benchmark.example.com'
+
+
+@register('crud')
+def crud_suite(options):
+    """Single-employee create, retrieve, update and delete through the API views."""
+    department = Department.objects.get_or_create(name='Benchmark', defaults={'location': 'Benchmark'})[0].pk
+    position = Position.objects.get_or_create(title='Benchmark')[0].pk
+    Employee.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+
+    list_view = EmployeeListCreateView.as_view()
+    detail_view = EmployeeRetrieveUpdateDestroyView.as_view()
+    numbers = itertools.count()
+    created = []
+
+    def create():
+        number = next(numbers)
+        response = call_view(list_view, '/api/employees/', method='post', data={
+            'first_name': 'Crud',
+            'last_name': f'Bench{number}',
+            'email': f'crud{number}@{EMAIL_DOMAIN}',
+            'phone_number': f'3{number:09d}',
+            'date_of_joining': '2024-01-01',
+            'salary': '50000.00',
+            'department': department,
+            'position': position,
+        })
+        created.append(response.data['id'])
+
+    def detail(method, data=None):
+        pk = created[next(numbers) % len(created)]
+        return lambda: call_view(detail_view, f'/api/employees/{pk}/', method=method, data=data, pk=pk)
+
+    iterations = options['iterations']
+    results = [{'benchmark': 'create', **time_calls(create, iterations)}]
+    results.append({'benchmark': 'retrieve', **time_calls(lambda: detail('get')(), iterations)})
+    results.append({'benchmark': 'partial_update', **time_calls(lambda: detail('patch', {'salary': '51000.00'})(), iterations)})
+
+    def delete():
+        pk = created.pop()
+        call_view(detail_view, f'/api/employees/{pk}/', method='delete', pk=pk)
+
+    # Warm-up calls count too, so there is always an employee left to delete
+    results.append({'benchmark': 'delete', **time_calls(delete, min(iterations, len(created) - 2))})
+    Employee.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+    return results
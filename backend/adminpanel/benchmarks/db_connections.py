@@ -0,0 +1,51 @@
+import threading
+
+from django.db import connections
+from django.db.utils import load_backend
+
+from . import register, time_concurrent
+
+MODES = (
+    ('connect_per_request', {'CONN_MAX_AGE': 0, 'POOL': {'MAX_SIZE': 0}}),
+    ('persistent', {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True, 'POOL': {'MAX_SIZE': 0}}),
+    ('pooled', {'CONN_MAX_AGE': 0, 'POOL': {'MAX_SIZE': None}}),  # One connection per client thread
+)
+
+
+def request_cycle(backend, settings_dict, alias, opened):
+    # Each thread is a worker with its own DatabaseWrapper, as under a threaded WSGI server
+    local = threading.local()
+
+    def request():
+        if not hasattr(local, 'wrapper'):
+            local.wrapper = backend.DatabaseWrapper(dict(settings_dict), alias)
+            local.wrapper.inc_thread_sharing()  # So the suite can close it afterwards
+            opened.append(local.wrapper)
+        with local.wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        local.wrapper.close_if_unusable_or_obsolete()  # What request_finished does
+    return request
+
+
+@register('connections')
+def connections_suite(options):
+    """One query per request against the configured database: new connections vs persistent vs pooled."""
+    configured = connections['default'].settings_dict
+    # The configured backend, with core/db_pool.py's timing and pooling
+    backend = load_backend('core.db_backends.' + configured['ENGINE'].rsplit('.', 1)[1])
+
+    results = []
+    for threads in options['threads']:
+        for name, overrides in MODES:
+            settings_dict = {**configured, **overrides}
+            if overrides['POOL']['MAX_SIZE'] is None:
+                settings_dict['POOL'] = {**configured.get('POOL', {}), 'MAX_SIZE': threads}
+            opened = []
+            stats = time_concurrent(
+                request_cycle(backend, settings_dict, f'benchmark_{name}_{threads}', opened), threads, options['iterations'],
+            )
+            for wrapper in opened:
+                wrapper.close()
+            results.append({'benchmark': name, **stats})
+    return results
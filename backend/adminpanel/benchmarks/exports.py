@@ -0,0 +1,74 @@
+import openpyxl
+
+from adminpanel.exports import employee_export_rows, stream_csv, write_xlsx
+from adminpanel.models import Employee
+
+from . import register, run_isolated
+
+
+def legacy_xlsx(limit, path):
+    # The pre-streaming implementation: model instances into an in-memory workbook
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Employees'
+    sheet.append([
+        'ID', 'First Name', 'Last Name', 'Email', 'Phone Number',
+        'Date of Birth', 'Date of Joining', 'Salary',
+        'Department', 'Position'
+    ])
+    for emp in Employee.objects.select_related('department', 'position').order_by('id')[:limit]:
+        sheet.append([
+            emp.id,
+            emp.first_name,
+            emp.last_name,
+            emp.email,
+            emp.phone_number,
+            emp.date_of_birth.strftime('%Y-%m-%d') if emp.date_of_birth else '',
+            emp.date_of_joining.strftime('%Y-%m-%d') if emp.date_of_joining else '',
+            emp.salary,
+            emp.department.name if emp.department else '',
+            emp.position.title if emp.position else '',
+        ])
+    workbook.save(path)
+    return sheet.max_row - 1
+
+
+def streaming_xlsx(limit, path):
+    rows = 0
+
+    def counted(iterable):
+        nonlocal rows
+        for row in iterable:
+            rows += 1
+            yield row
+
+    write_xlsx(counted(employee_export_rows(Employee.objects.order_by('id')[:limit])), path)
+    return rows
+
+
+def streaming_csv(limit, path):
+    rows = Employee.objects.order_by('id')[:limit].count()
+    with open(path, 'w', encoding='utf-8') as file:
+        for piece in stream_csv(employee_export_rows(Employee.objects.order_by('id')[:limit])):
+            file.write(piece)
+    return rows
+
+
+@register('exports')
+def exports_suite(options):
+    available = Employee.objects.count()
+    results = []
+    for limit in options['rows']:
+        for name, func in (('csv_streaming', streaming_csv), ('xlsx_legacy', legacy_xlsx), ('xlsx_streaming', streaming_xlsx)):
+            measurement = run_isolated(func, limit, options['output_file'])
+            rows = measurement.pop('result')
+            results.append({
+                'benchmark': name,
+                'rows_requested': limit,
+                'rows': rows,
+                'rows_per_sec': round(rows / measurement['seconds']) if measurement['seconds'] else None,
+                **measurement,
+            })
+    if available < max(options['rows']):
+        results.append({'note': f'Only {available} employees in the database; seed more for larger runs.'})
+    return results
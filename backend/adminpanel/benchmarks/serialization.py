@@ -0,0 +1,48 @@
+from rest_framework.renderers import JSONRenderer
+
+from adminpanel.models import Employee
+from adminpanel.renderers import FastJSONRenderer
+from adminpanel.row_serializers import EmployeeRowSerializer
+from adminpanel.serializers import EmployeeSerializer
+
+from . import register, time_calls
+
+PAGE_SIZES = (50, 500)
+
+
+def model_serializer_page(limit):
+    # The previous list path: model instances through EmployeeSerializer, stdlib json
+    employees = Employee.objects.select_related('department', 'position').order_by('id')[:limit]
+    return JSONRenderer().render(EmployeeSerializer(employees, many=True).data)
+
+
+def row_serializer_page(limit, nested=False):
+    serializer = EmployeeRowSerializer(nested=nested)
+    rows = serializer.values(Employee.objects.order_by('id'))[:limit]
+    return FastJSONRenderer().render(serializer.to_representation(rows))
+
+
+@register('serialization')
+def serialization_suite(options):
+    """Fetch, serialize and render one list page: EmployeeSerializer vs the .values() field plan."""
+    results = []
+    for limit in PAGE_SIZES:
+        rows = len(Employee.objects.order_by('id')[:limit])
+        cases = (
+            ('model_serializer', lambda: model_serializer_page(limit)),
+            ('row_serializer', lambda: row_serializer_page(limit)),
+            ('row_serializer_nested', lambda: row_serializer_page(limit, nested=True)),
+        )
+        baseline = None
+        for name, func in cases:
+            stats = time_calls(func, options['iterations'])
+            baseline = baseline or stats['p50_ms']
+            results.append({
+                'benchmark': name,
+                'rows_requested': limit,
+                'rows': rows,
+                **stats,
+                'rows_per_sec': round(rows * stats['per_sec']) if stats['per_sec'] else None,
+                'speedup': round(baseline / stats['p50_ms'], 2) if stats['p50_ms'] else None,
+            })
+    return results
@@ -0,0 +1,195 @@
+"""
+Batch create / update / delete of employees for the bulk API endpoint.
+
+Items are validated with EmployeeBulkSerializer (foreign keys come from the
+reference cache), email and phone clashes are checked with one IN query per
+field for the whole batch, and the valid items are written with bulk_create /
+bulk_update / a single DELETE inside one transaction. Each item gets a result
+entry carrying its position in the request body.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from .analytics import batched_updates, employee_summary_row, record_change
+from .models import Employee, employees_matching, unique_key
+from .search import index_employees
+from .serializers import EmployeeBulkSerializer
+from .versioning import bump_version
+
+WRITE_BATCH_SIZE = 1000  # Rows per INSERT / UPDATE statement
+UNIQUE_FIELDS = ('email', 'phone_number')
+
+
+def _validate(serializer, item):
+    """(validated_data, None) or (None, errors) for one item."""
+    # One serializer instance is reused for the whole batch: building its fields
+    # per item costs more than validating the item
+    try:
+        return serializer.run_validation(item), None
+    except ValidationError as e:
+        return None, as_serializer_error(e)
+
+
+def _error(index, errors):
+    return {'index': index, 'status': 'error', 'errors': errors}
+
+
+def _unique_clashes(valid):
+    """index -> errors for emails/phone numbers owned by another employee or repeated in the batch."""
+    clashes = {}
+    for field in UNIQUE_FIELDS:
+        wanted = [(index, pk, values[field]) for index, pk, values in valid if field in values]
+        if not wanted:
+            continue
+        # Keyed as the unique index compares values, so a case variant is a clash too
+        owners = {
+            unique_key(value): pk
+            for value, pk in employees_matching(field, {value for _, _, value in wanted}).values_list(field, 'id')
+        }
+        label = Employee._meta.get_field(field).verbose_name
+        seen = set()
+        for index, pk, value in wanted:
+            key = unique_key(value)
+            if owners.get(key, pk) != pk or key in seen:
+                clashes.setdefault(index, {})[field] = [f'employee with this {label} already exists.']
+            seen.add(key)
+    return clashes
+
+
+def _drop_clashes(valid, results):
+    for index, errors in _unique_clashes(valid).items():
+        results[index] = _error(index, errors)
+    return [entry for entry in valid if results[entry[0]] is None]
+
+
+def _integrity_failure(valid, results, error):
+    # The whole transaction was rolled back, so none of the valid items were written
+    for index, _, _ in valid:
+        results[index] = _error(index, {'non_field_errors': [str(error)]})
+    return results
+
+
+def _after_write(ids):
+    # Bulk writes skip post_save, which keeps the data version and search index current
+    bump_version(Employee)
+    index_employees(Employee.objects.filter(id__in=ids))
+
+
+def _item_id(item):
+    pk = item.get('id') if isinstance(item, dict) else item
+    return pk if isinstance(pk, int) and not isinstance(pk, bool) else None
+
+
+def bulk_create_employees(items):
+    results = [None] * len(items)
+    valid = []
+    serializer = EmployeeBulkSerializer()
+    for index, item in enumerate(items):
+        values, errors = _validate(serializer, item)
+        if errors:
+            results[index] = _error(index, errors)
+        else:
+            valid.append((index, None, values))
+
+    valid = _drop_clashes(valid, results)
+    if not valid:
+        return results
+
+    employees = [Employee(**values) for _, _, values in valid]
+    try:
+        with transaction.atomic(), batched_updates():
+            Employee.objects.bulk_create(employees, batch_size=WRITE_BATCH_SIZE)
+            for employee in employees:
+                record_change(after=employee_summary_row(employee))
+    except IntegrityError as e:
+        return _integrity_failure(valid, results, e)
+
+    # MySQL can't return ids from a multi-row INSERT; fetch them by the unique email
+    if any(employee.pk is None for employee in employees):
+        ids = dict(Employee.objects.filter(email__in=[e.email for e in employees]).values_list('email', 'id'))
+        for employee in employees:
+            employee.pk = ids[employee.email]
+
+    for (index, _, _), employee in zip(valid, employees):
+        results[index] = {'index': index, 'status': 'created', 'id': employee.pk}
+    _after_write([employee.pk for employee in employees])
+    return results
+
+
+def bulk_update_employees(items):
+    """Partial updates; each item needs the employee's "id"."""
+    results = [None] * len(items)
+    instances = Employee.objects.in_bulk([pk for pk in map(_item_id, items) if pk is not None])
+    valid = []
+    seen = set()
+    serializer = EmployeeBulkSerializer(partial=True)
+    for index, item in enumerate(items):
+        pk = _item_id(item)
+        if pk is None:
+            results[index] = _error(index, {'id': ['A valid integer is required.']})
+        elif pk in seen:
+            results[index] = _error(index, {'id': ['Appears more than once in this batch.']})
+        elif pk not in instances:
+            results[index] = _error(index, {'id': ['Not found.']})
+        else:
+            seen.add(pk)
+            serializer.instance = instances[pk]
+            values, errors = _validate(serializer, item)
+            if errors:
+                results[index] = _error(index, errors)
+            else:
+                valid.append((index, pk, values))
+
+    valid = _drop_clashes(valid, results)
+    if not valid:
+        return results
+
+    # bulk_update doesn't apply auto_now, so stamp updated_at ourselves
+    updated_at = timezone.now()
+    fields = {'updated_at'}
+    employees = []
+    summary_rows_before = []
+    for _, pk, values in valid:
+        employee = instances[pk]
+        summary_rows_before.append(employee_summary_row(employee))
+        for field, value in values.items():
+            setattr(employee, field, value)
+        employee.updated_at = updated_at
+        fields.update(values)
+        employees.append(employee)
+
+    try:
+        with transaction.atomic(), batched_updates():
+            Employee.objects.bulk_update(employees, sorted(fields), batch_size=WRITE_BATCH_SIZE)
+            for before, employee in zip(summary_rows_before, employees):
+                record_change(before, employee_summary_row(employee))
+    except IntegrityError as e:
+        return _integrity_failure(valid, results, e)
+
+    for index, pk, _ in valid:
+        results[index] = {'index': index, 'status': 'updated', 'id': pk}
+    _after_write([pk for _, pk, _ in valid])
+    return results
+
+
+def bulk_delete_employees(items):
+    """Items are employee ids, or objects with an "id"."""
+    results = [None] * len(items)
+    pks = [_item_id(item) for item in items]
+    existing = set(Employee.objects.filter(id__in=[pk for pk in pks if pk is not None]).values_list('id', flat=True))
+
+    # The post_delete signals queue their summary changes; they are applied once
+    with transaction.atomic(), batched_updates():
+        Employee.objects.filter(id__in=existing).delete()
+
+    for index, pk in enumerate(pks):
+        if pk is None:
+            results[index] = _error(index, {'id': ['A valid integer is required.']})
+        elif pk in existing:
+            results[index] = {'index': index, 'status': 'deleted', 'id': pk}
+            existing.discard(pk)  # A repeated id is only deleted once
+        else:
+            results[index] = _error(index, {'id': ['Not found.']})
+    return results
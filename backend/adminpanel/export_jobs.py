@@ -0,0 +1,183 @@
+"""
+Background export jobs.
+
+A job renders a filtered employee export to EXPORT_ROOT on a local thread pool.
+Artifacts are named after a fingerprint of (format, filter params, data version),
+so a user asking again for unchanged data is answered from disk without touching
+the employee table. Jobs belong to the user who started them and are only reused
+for that user.
+
+A pending or running job records the process that queued or runs it (worker) and
+a heartbeat refreshed as it makes progress. One whose process is gone from this
+host, or whose heartbeat is older than EXPORT_JOB_TIMEOUT, is orphaned (the
+process was restarted or killed) and is marked failed when it is next looked up.
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .exports import employee_export_rows, stream_csv, write_xlsx
+from .models import Department, Employee, ExportJob, Position
+from .versioning import get_versions
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_EVERY = 10000  # Rows between progress updates on the job row
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EXPORT_JOB_WORKERS,
+                thread_name_prefix='export-job',
+            )
+    return _executor
+
+
+def normalize_params(query_params):
+    # Sorted so the same filter set always fingerprints the same way
+    return {key: sorted(query_params.getlist(key)) for key in sorted(query_params)}
+
+
+def export_fingerprint(file_format, params):
+    # Department/position names are part of the export, so their versions count too
+    versions = get_versions(Employee, Department, Position)
+    payload = json.dumps([file_format, params, versions], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def artifact_path(fingerprint, file_format):
+    return os.path.join(settings.EXPORT_ROOT, f'{fingerprint}.{file_format}')
+
+
+def current_worker():
+    # Computed per call: a forking server gives each worker process its own pid
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _worker_alive(worker):
+    """False only for a process on this host that no longer exists; other hosts go by the heartbeat."""
+    host, _, pid = worker.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit() or os.name != 'posix':
+        return True
+    try:
+        os.kill(int(pid), 0)  # Signal 0 only checks that the process exists
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def fail_if_orphaned(job):
+    """Mark an unfinished job whose worker is gone as failed; True if it was."""
+    if job.status not in (ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING):
+        return False
+    stale_before = timezone.now() - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT)
+    if job.heartbeat_at >= stale_before and _worker_alive(job.worker):
+        return False
+    job.status, job.error, job.finished_at = ExportJob.STATUS_FAILED, 'The export worker stopped.', timezone.now()
+    # Only if it is still in the state we read, so a job finishing meanwhile keeps its result
+    ExportJob.objects.filter(pk=job.pk, status__in=(ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING)).update(
+        status=job.status, error=job.error, finished_at=job.finished_at,
+    )
+    return True
+
+
+def find_reusable_job(fingerprint, user):
+    """user's finished job whose file is still on disk, or one still in flight, for the same fingerprint."""
+    jobs = ExportJob.objects.filter(fingerprint=fingerprint, created_by_id=user.pk).exclude(status=ExportJob.STATUS_FAILED)
+    for job in jobs:
+        if job.status == ExportJob.STATUS_DONE:
+            if os.path.exists(job.file_path):
+                return job
+        elif not fail_if_orphaned(job):
+            return job
+    return None
+
+
+def start_export_job(job, queryset):
+    """Queue the export; queryset is the already-filtered (still lazy) employee queryset."""
+    get_executor().submit(run_export_job, job.pk, queryset)
+
+
+class _Progress:
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.written = 0
+
+    def track(self, rows):
+        for row in rows:
+            yield row
+            self.written += 1
+            if self.written % PROGRESS_EVERY == 0:
+                ExportJob.objects.filter(pk=self.job_id).update(rows_written=self.written, heartbeat_at=timezone.now())
+
+
+def run_export_job(job_id, queryset):
+    partial_path = None
+    try:
+        # Claimed only while still pending: a job marked orphaned while queued stays failed
+        claimed = ExportJob.objects.filter(pk=job_id, status=ExportJob.STATUS_PENDING).update(
+            status=ExportJob.STATUS_RUNNING, worker=current_worker(), heartbeat_at=timezone.now(),
+        )
+        if not claimed:
+            return
+        job = ExportJob.objects.get(pk=job_id)
+        ExportJob.objects.filter(pk=job_id).update(total_rows=queryset.count())
+
+        os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+        path = artifact_path(job.fingerprint, job.file_format)
+        partial_path = f'{path}.{job.pk}.part'
+        progress = _Progress(job_id)
+        rows = progress.track(employee_export_rows(queryset))
+
+        if job.file_format == ExportJob.FORMAT_CSV:
+            with open(partial_path, 'w', newline='', encoding='utf-8') as output:
+                for chunk in stream_csv(rows):
+                    output.write(chunk)
+        else:
+            write_xlsx(rows, partial_path)
+
+        # Publish atomically so readers never see a half-written artifact
+        os.replace(partial_path, path)
+        ExportJob.objects.filter(pk=job_id).update(
+            status=ExportJob.STATUS_DONE,
+            file_path=path,
+            rows_written=progress.written,
+            finished_at=timezone.now(),
+        )
+    except Exception as e:
+        logger.exception("Export job %s failed", job_id)
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)
+        ExportJob.objects.filter(pk=job_id).update(
+            status=ExportJob.STATUS_FAILED, error=str(e), finished_at=timezone.now(),
+        )
+    finally:
+        connection.close()  # Worker threads don't go through the request cycle that closes it
+
+
+def purge_export_jobs(older_than):
+    """Delete jobs created before older_than together with their artifacts."""
+    removed = 0
+    for job in ExportJob.objects.filter(created_at__lt=older_than):
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        job.delete()
+        removed += 1
+    return removed
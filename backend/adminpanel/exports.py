@@ -0,0 +1,114 @@
+import csv
+import io
+from itertools import islice
+
+import openpyxl
+from asgiref.sync import sync_to_async
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+
+# Column layout shared by every employee export format
+EXPORT_HEADERS = [
+    'ID', 'First Name', 'Last Name', 'Email', 'Phone Number',
+    'Date of Birth', 'Date of Joining', 'Salary',
+    'Department', 'Position'
+]
+
+EXPORT_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'phone_number',
+    'date_of_birth', 'date_of_joining', 'salary',
+    'department__name', 'position__title',
+)
+
+# Fixed XLSX column widths (characters), in EXPORT_HEADERS order
+XLSX_COLUMN_WIDTHS = (10, 18, 18, 32, 16, 14, 16, 14, 22, 22)
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+SALARY_COLUMN = EXPORT_FIELDS.index('salary')
+
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched from the DB per round-trip
+CSV_FLUSH_BYTES = 64 * 1024  # Size of each chunk handed to the client
+
+
+def employee_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Plain tuples in EXPORT_FIELDS order, fetched in chunks without building model instances."""
+    return queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+async def employee_export_arows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """employee_export_rows() for async code: each chunk is fetched in a thread, as QuerySet.aiterator() does."""
+    # values_list().aiterator() runs the query on the event loop in Django 5.2,
+    # because ValuesListIterable.__iter__() isn't a generator
+    rows = employee_export_rows(queryset, chunk_size)
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while True:
+        chunk = await next_chunk()
+        for row in chunk:
+            yield row
+        if len(chunk) < chunk_size:
+            break
+
+
+class _CSVChunker:
+    """Buffers CSV rows and hands them out in ~flush_bytes chunks."""
+
+    def __init__(self, headers, flush_bytes):
+        self.flush_bytes = flush_bytes
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(headers)
+
+    def write(self, row):
+        """A chunk once enough rows have been buffered, otherwise None."""
+        self.writer.writerow(row)
+        if self.buffer.tell() >= self.flush_bytes:
+            return self.flush()
+        return None
+
+    def flush(self):
+        chunk = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return chunk
+
+
+def stream_csv(rows, headers=EXPORT_HEADERS, flush_bytes=CSV_FLUSH_BYTES):
+    """Yield CSV text in ~flush_bytes chunks so memory stays flat however many rows there are."""
+    chunker = _CSVChunker(headers, flush_bytes)
+    for row in rows:
+        chunk = chunker.write(row)
+        if chunk:
+            yield chunk
+    yield chunker.flush()
+
+
+async def astream_csv(rows, headers=EXPORT_HEADERS, flush_bytes=CSV_FLUSH_BYTES):
+    """stream_csv() over an async iterator of rows, e.g. employee_export_arows()."""
+    chunker = _CSVChunker(headers, flush_bytes)
+    async for row in rows:
+        chunk = chunker.write(row)
+        if chunk:
+            yield chunk
+    yield chunker.flush()
+
+
+def write_xlsx(rows, target, headers=EXPORT_HEADERS):
+    """
+    Write rows into target (a path or binary file object) with a write-only workbook.
+
+    openpyxl spools write-only rows to a temporary file instead of keeping a cell
+    tree in memory. Dates and salaries are written as native date/number cells.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Employees')
+    for index, width in enumerate(XLSX_COLUMN_WIDTHS, start=1):
+        sheet.column_dimensions[get_column_letter(index)].width = width
+
+    sheet.append(headers)
+    for row in rows:
+        row = list(row)
+        salary = WriteOnlyCell(sheet, value=row[SALARY_COLUMN])
+        salary.number_format = '#,##0.00'
+        row[SALARY_COLUMN] = salary
+        sheet.append(row)
+
+    workbook.save(target)
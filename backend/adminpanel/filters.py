@@ -0,0 +1,69 @@
+from django_filters import rest_framework as django_filters
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+from .models import Employee
+
+
+class EmployeeFilter(django_filters.FilterSet):
+    # Every filter/ordering combination offered here is backed by an index on Employee
+    class Meta:
+        model = Employee
+        fields = {
+            'department': ['exact'],
+            'position': ['exact'],
+            'date_of_joining': ['exact', 'gte', 'lte'],
+            'salary': ['gte', 'lte'],
+        }
+
+
+# The orderings an index serves together with each filter (see Employee.Meta.indexes):
+# an equality filter leads a composite index that continues with the ordering field,
+# while a range filter needs the ordering on its own column
+EMPLOYEE_FILTER_ORDERINGS = {
+    'department': {'id', 'date_of_joining', 'salary'},
+    'position': {'id', 'date_of_joining', 'salary'},
+    'date_of_joining': {'id', 'date_of_joining'},
+    'date_of_joining__gte': {'date_of_joining'},
+    'date_of_joining__lte': {'date_of_joining'},
+    'salary__gte': {'salary'},
+    'salary__lte': {'salary'},
+}
+
+
+class IndexedOrderingFilter(filters.OrderingFilter):
+    """
+    Accepts a single field from the view's ordering_fields and rejects anything else
+    with a 400 instead of silently falling back, since those sorts have no index and
+    turn into full-table filesorts. So is an ordering that the view's filter_orderings
+    don't allow with a filter in use. id is appended in the same direction as a stable
+    tiebreaker, which every index ends in (explicitly, or as InnoDB's primary key).
+    """
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if not params:
+            return self.get_default_ordering(view)
+
+        fields = [param.strip() for param in params.split(',') if param.strip()]
+        allowed = self.get_valid_fields(queryset, view, {'request': request})
+        allowed = {name for name, _ in allowed}
+        if len(fields) != 1 or fields[0].lstrip('-') not in allowed:
+            raise ValidationError({self.ordering_param: [
+                f"Order by one of: {', '.join(sorted(allowed))} (prefix with '-' for descending)."
+            ]})
+
+        field = fields[0]
+        self.check_filters(request, view, field.lstrip('-'))
+        if field.lstrip('-') == 'id':
+            return [field]
+        return [field, '-id' if field.startswith('-') else 'id']
+
+    def check_filters(self, request, view, field):
+        filter_orderings = getattr(view, 'filter_orderings', {})
+        for name, orderings in filter_orderings.items():
+            if request.query_params.get(name) and field not in orderings:
+                raise ValidationError({self.ordering_param: [
+                    f"Ordering by {field} is not supported with the {name} filter; "
+                    f"order by one of: {', '.join(sorted(orderings))}."
+                ]})
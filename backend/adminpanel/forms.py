@@ -1,5 +1,6 @@
 from django import forms
 from .models import Department, Position, Employee
+from .refdata import CachedModelChoiceField, departments, positions
 
 class DepartmentForm(forms.ModelForm):
     class Meta:
@@ -18,6 +19,10 @@ class PositionForm(forms.ModelForm):
         }
 
 class EmployeeForm(forms.ModelForm):
+    # Choices and validation come from the in-process reference cache
+    department = CachedModelChoiceField(departments, widget=forms.Select(attrs={'class': 'form-control'}))
+    position = CachedModelChoiceField(positions, widget=forms.Select(attrs={'class': 'form-control'}))
+
     class Meta:
         model = Employee
         fields = ['first_name', 'last_name', 'email', 'phone_number', 'date_of_birth', 'date_of_joining', 'salary', 'department', 'position']
@@ -29,7 +34,5 @@ class EmployeeForm(forms.ModelForm):
             'date_of_birth': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'date_of_joining': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'salary': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Enter Salary'}),
-            'department': forms.Select(attrs={'class': 'form-control'}),
-            'position': forms.Select(attrs={'class': 'form-control'}),
         }
 
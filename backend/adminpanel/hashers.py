@@ -0,0 +1,12 @@
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from core.metrics import instrument
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2PasswordHasher that reports its time in the request metrics (Server-Timing: password_hash)."""
+
+    def encode(self, password, salt, iterations=None):
+        # verify() and the dummy hash for unknown users both go through encode()
+        with instrument('password_hash'):
+            return super().encode(password, salt, iterations)
@@ -0,0 +1,329 @@
+"""
+Set-based employee CSV import pipeline used by the import_employees command.
+
+Stages:
+  1. read_chunks() streams the CSV in fixed-size chunks of (line_number, row) pairs.
+  2. clean_chunk() parses and validates a chunk; it is pure Python with no DB access,
+     so chunks can be cleaned in a process pool.
+  3. EmployeeImporter.import_chunk() resolves emails/phones against the DB with
+     batched IN queries, bulk-creates missing departments/positions, then
+     bulk-inserts the employees in one transaction per chunk.
+
+In upsert mode rows are matched on email; a content hash of each incoming row is
+compared with the stored row, and only rows whose hash differs are written back
+with bulk_update, so re-importing an unchanged file writes nothing.
+"""
+import csv
+import hashlib
+import json
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import refdata
+from .analytics import batched_updates, record_change, summary_row
+from .models import Department, Employee, Position, employees_matching, unique_key
+from .search import index_employees
+
+CHUNK_SIZE = 5000  # Rows per parse/insert batch
+LOOKUP_BATCH_SIZE = 1000  # Values per IN (...) lookup
+
+MODE_CREATE = 'create'
+MODE_UPSERT = 'upsert'
+
+# Employee columns written by the import; their values make up the content hash
+CONTENT_FIELDS = [
+    'first_name', 'last_name', 'phone_number', 'date_of_birth', 'date_of_joining',
+    'salary', 'department_id', 'position_id',
+]
+
+REQUIRED_FIELDS = ['first_name', 'last_name', 'email', 'phone_number', 'date_of_joining', 'department', 'position']
+
+# CSV column -> the CharField it is stored in, whose max_length it must fit
+TEXT_FIELDS = {
+    'first_name': Employee._meta.get_field('first_name'),
+    'last_name': Employee._meta.get_field('last_name'),
+    'email': Employee._meta.get_field('email'),
+    'phone_number': Employee._meta.get_field('phone_number'),
+    'department': Department._meta.get_field('name'),
+    'position': Position._meta.get_field('title'),
+}
+SALARY_FIELD = Employee._meta.get_field('salary')
+
+
+class RowError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def read_chunks(csv_file, chunk_size=CHUNK_SIZE):
+    """Yield lists of (line_number, row dict) without loading the whole file."""
+    with open(csv_file, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file)
+        chunk = []
+        for row in reader:
+            chunk.append((reader.line_num, row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _parse_date(value, field):
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RowError('invalid_date', f"Invalid {field}: {value!r}")
+    return parsed
+
+
+def _parse_salary(value):
+    # Must fit the column: finite, and at most max_digits once rounded to its decimal places
+    try:
+        salary = Decimal(value) if value else Decimal('0')
+        if not salary.is_finite():
+            raise InvalidOperation
+        salary = salary.quantize(Decimal(1).scaleb(-SALARY_FIELD.decimal_places))
+    except InvalidOperation:
+        raise RowError('invalid_salary', f"Invalid salary: {value!r}")
+    if len(salary.as_tuple().digits) > SALARY_FIELD.max_digits:
+        raise RowError('invalid_salary', f"Salary out of range: {value!r}")
+    return salary
+
+
+def clean_row(row):
+    """Validated field values for one CSV row, or RowError."""
+    values = {key: (value or '').strip() for key, value in row.items() if key}
+
+    missing = [field for field in REQUIRED_FIELDS if not values.get(field)]
+    if missing:
+        raise RowError('missing_fields', f"Missing required fields: {', '.join(missing)}")
+
+    for field, model_field in TEXT_FIELDS.items():
+        if len(values[field]) > model_field.max_length:
+            raise RowError('invalid_field', f"{field} is longer than {model_field.max_length} characters")
+
+    return {
+        'first_name': values['first_name'],
+        'last_name': values['last_name'],
+        'email': values['email'],
+        'phone_number': values['phone_number'],
+        'date_of_birth': _parse_date(values['date_of_birth'], 'date_of_birth') if values.get('date_of_birth') else None,
+        'date_of_joining': _parse_date(values['date_of_joining'], 'date_of_joining'),
+        'salary': _parse_salary(values.get('salary')),
+        'department': values['department'],
+        'position': values['position'],
+    }
+
+
+
+def clean_chunk(chunk):
+    """
+    Returns (cleaned, errors): cleaned is a list of (line_number, values) and errors
+    a list of (line_number, code, message). Module-level so it can run in a process pool.
+    """
+    cleaned = []
+    errors = []
+    for line_number, row in chunk:
+        try:
+            cleaned.append((line_number, clean_row(row)))
+        except RowError as e:
+            errors.append((line_number, e.code, str(e)))
+    return cleaned, errors
+
+
+class RejectLog:
+    """Counts rejected rows per reason code and, given a path, streams them to a CSV or JSONL file."""
+
+    def __init__(self, path=None):
+        self.counts = Counter()
+        self._file = None
+        if path:
+            self._file = open(path, 'w', encoding='utf-8', newline='')
+            self._jsonl = path.endswith('.jsonl')
+            if not self._jsonl:
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(['line_number', 'reason', 'message'])
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def add(self, errors):
+        for line_number, code, message in errors:
+            self.counts[code] += 1
+            if self._file is None:
+                continue
+            if self._jsonl:
+                self._file.write(json.dumps({'line_number': line_number, 'reason': code, 'message': message}) + '\n')
+            else:
+                self._writer.writerow([line_number, code, message])
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def content_hash(values):
+    """Hash of the CONTENT_FIELDS values, in a form that matches for DB rows and parsed CSV rows."""
+    payload = '\x1f'.join(str(values[field]) for field in CONTENT_FIELDS)
+    return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+
+def _summary_row(values):
+    return summary_row(values['department_id'], values['position_id'], values['date_of_joining'], values['salary'])
+
+
+def _batched(values, size=LOOKUP_BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class EmployeeImporter:
+    def __init__(self, mode=MODE_CREATE):
+        self.mode = mode
+        self.departments = refdata.departments.ids_by_name()
+        self.positions = refdata.positions.ids_by_name()
+        self.seen_emails = set()  # Across the whole file, to catch in-file duplicates
+        self.seen_phones = set()
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.reference_data_created = False
+
+    @property
+    def changed(self):
+        return bool(self.created or self.updated or self.reference_data_created)
+
+    def _existing_rows(self, emails):
+        """unique_key(email) -> (id, content hash, analytics summary row) for the employees already in the DB."""
+        existing = {}
+        for batch in _batched(emails):
+            rows = employees_matching('email', batch).values('id', 'email', *CONTENT_FIELDS)
+            for row in rows:
+                existing[unique_key(row['email'])] = (row['id'], content_hash(row), _summary_row(row))
+        return existing
+
+    def _phone_owners(self, phones):
+        """unique_key(phone number) -> unique_key(email) of the employee holding it."""
+        owners = {}
+        for batch in _batched(phones):
+            for phone, email in employees_matching('phone_number', batch).values_list('phone_number', 'email'):
+                owners[unique_key(phone)] = unique_key(email)
+        return owners
+
+    def _ensure_reference_data(self, rows):
+        """Bulk-create any departments/positions the chunk needs but the DB doesn't have yet."""
+        new_departments = {values['department'] for _, values in rows} - self.departments.keys()
+        if new_departments:
+            Department.objects.bulk_create(
+                [Department(name=name, location="Unknown") for name in new_departments],
+                ignore_conflicts=True,
+            )
+            self.departments.update(Department.objects.filter(name__in=new_departments).values_list('name', 'id'))
+            self.reference_data_created = True
+
+        new_positions = {values['position'] for _, values in rows} - self.positions.keys()
+        if new_positions:
+            Position.objects.bulk_create(
+                [Position(title=title) for title in new_positions],
+                ignore_conflicts=True,
+            )
+            self.positions.update(Position.objects.filter(title__in=new_positions).values_list('title', 'id'))
+            self.reference_data_created = True
+
+    def _employee(self, values, pk=None):
+        return Employee(
+            id=pk,
+            first_name=values['first_name'],
+            last_name=values['last_name'],
+            email=values['email'],
+            phone_number=values['phone_number'],
+            date_of_birth=values['date_of_birth'],
+            date_of_joining=values['date_of_joining'],
+            salary=values['salary'],
+            department_id=values['department_id'],
+            position_id=values['position_id'],
+        )
+
+    def import_chunk(self, cleaned):
+        """Write one cleaned chunk; returns a list of (line_number, code, message) rejections."""
+        errors = []
+        existing = self._existing_rows({values['email'] for _, values in cleaned})
+        phone_owners = self._phone_owners({values['phone_number'] for _, values in cleaned})
+
+        rows = []
+        for line_number, values in cleaned:
+            email, phone = values['email'], values['phone_number']
+            # Compared as the unique indexes compare them, so a case variant counts as a duplicate
+            email_key, phone_key = unique_key(email), unique_key(phone)
+            if email_key in existing and self.mode == MODE_CREATE:
+                errors.append((line_number, 'duplicate_email_db', f"Duplicate email in DB: {email}"))
+            elif email_key in self.seen_emails:
+                errors.append((line_number, 'duplicate_email_file', f"Duplicate email in file: {email}"))
+            elif phone_owners.get(phone_key, email_key) != email_key:
+                errors.append((line_number, 'duplicate_phone_db', f"Duplicate phone number in DB: {phone}"))
+            elif phone_key in self.seen_phones:
+                errors.append((line_number, 'duplicate_phone_file', f"Duplicate phone number in file: {phone}"))
+            else:
+                self.seen_emails.add(email_key)
+                self.seen_phones.add(phone_key)
+                rows.append((line_number, values))
+
+        if not rows:
+            return errors
+
+        self._ensure_reference_data(rows)
+        to_create = []
+        to_update = []
+        summary_changes = []  # (before, after) analytics summary rows
+        for _, values in rows:
+            values['department_id'] = self.departments[values['department']]
+            values['position_id'] = self.positions[values['position']]
+            current = existing.get(unique_key(values['email']))
+            if current is None:
+                to_create.append(self._employee(values))
+                summary_changes.append((None, _summary_row(values)))
+            elif current[1] != content_hash(values):
+                to_update.append(self._employee(values, pk=current[0]))
+                summary_changes.append((current[2], _summary_row(values)))
+            else:
+                self.unchanged += 1
+
+        if not to_create and not to_update:
+            return errors
+
+        # bulk_update doesn't apply auto_now, so stamp updated_at ourselves
+        updated_at = timezone.now()
+        for employee in to_update:
+            employee.updated_at = updated_at
+
+        try:
+            with transaction.atomic(), batched_updates():
+                if to_create:
+                    Employee.objects.bulk_create(to_create)
+                if to_update:
+                    Employee.objects.bulk_update(to_update, CONTENT_FIELDS + ['updated_at'], batch_size=1000)
+                for before, after in summary_changes:
+                    record_change(before, after)
+        except IntegrityError as e:
+            # A concurrent writer got there first; the whole batch was rolled back
+            errors.extend((line_number, 'integrity_error', str(e)) for line_number, _ in rows)
+        else:
+            self.created += len(to_create)
+            self.updated += len(to_update)
+            # bulk writes skip the post_save signal that maintains the search index
+            index_employees(Employee.objects.filter(
+                Q(email__in=[employee.email for employee in to_create]) | Q(id__in=[employee.pk for employee in to_update])
+            ))
+
+        return errors
@@ -0,0 +1,85 @@
+import json
+import os
+import platform
+import tempfile
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from adminpanel.benchmarks import SUITES, compare_results
+from adminpanel.models import Employee
+
+
+class Command(BaseCommand):
+    help = (
+        'Run benchmark suites against the configured database. Use '
+        '--settings=core.benchmark_settings for a throwaway SQLite database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='+', choices=sorted(SUITES) + ['all'], help='Benchmark suites to run')
+        parser.add_argument('--employees', type=int,
+                            help='Seed the database up to this many employees first (e.g. 10000, 250000, 1000000)')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for generated employees')
+        parser.add_argument('--rows', type=int, nargs='+', default=[30000, 250000, 1000000],
+                            help='Row counts to benchmark (export suites)')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed calls per case (API suites)')
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 8],
+                            help='Concurrent client threads (authentication, asgi and connections suites)')
+        parser.add_argument('--import-file', help='CSV for the import suite (default: archive/cleaned_employee_records.csv)')
+        parser.add_argument('--json', metavar='PATH', help="Write the results as JSON to PATH ('-' for stdout)")
+        parser.add_argument('--compare', metavar='BASELINE', help='Fail if a metric regressed against this JSON file')
+        parser.add_argument('--threshold', type=float, default=10.0, help='Allowed regression in percent for --compare')
+
+    def seed(self, options):
+        missing = options['employees'] - Employee.objects.count()
+        if missing > 0:
+            self.stderr.write(f"… seeding {missing:,} employees")
+            call_command('generate_employees', missing, seed=options['seed'], stdout=self.stderr)
+
+    def handle(self, *args, **options):
+        if options['employees']:
+            self.seed(options)
+
+        names = sorted(SUITES) if 'all' in options['suites'] else options['suites']
+        results = []
+        with tempfile.TemporaryDirectory() as workdir:
+            options['output_file'] = os.path.join(workdir, 'benchmark.out')
+            for name in names:
+                self.stderr.write(f"… running {name}")
+                results.extend({'suite': name, **result} for result in SUITES[name](options))
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'employees': Employee.objects.count(),
+                'iterations': options['iterations'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+        else:
+            for result in results:
+                self.stdout.write('  '.join(f'{key}={value}' for key, value in result.items()))
+            if options['json']:
+                with open(options['json'], 'w', encoding='utf-8') as file:
+                    json.dump(report, file, indent=2, default=str)
+                self.stdout.write(self.style.SUCCESS(f"✅ Results written to {options['json']}"))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            regressions = compare_results(baseline['results'], results, options['threshold'])
+            for line in regressions:
+                self.stderr.write(self.style.ERROR(f"❌ {line}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} metric(s) regressed by more than {options['threshold']}%")
+            self.stderr.write(self.style.SUCCESS(f"✅ No regressions beyond {options['threshold']}% against {options['compare']}"))
@@ -0,0 +1,175 @@
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from adminpanel.analytics import rebuild_summaries
+from adminpanel.models import Department, Employee, Position
+from adminpanel.search import index_employees
+from adminpanel.versioning import bump_version
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Ananya', 'Arjun', 'Daniel', 'Diya', 'Emma', 'Ethan', 'Isha', 'Kabir',
+    'Lily', 'Logan', 'Lucas', 'Mason', 'Meera', 'Mia', 'Noah', 'Olivia', 'Priya', 'Rohan',
+    'Sara', 'Sophia', 'Vihaan', 'Zoya',
+]
+LAST_NAMES = [
+    'Anderson', 'Brown', 'Das', 'Davis', 'Garcia', 'Gupta', 'Hernandez', 'Iyer', 'Jones', 'Khan',
+    'Martinez', 'Mishra', 'Moore', 'Nair', 'Patel', 'Rao', 'Reddy', 'Sahoo', 'Singh', 'Smith',
+    'Taylor', 'Thomas', 'Wilson',
+]
+POSITION_FAMILIES = [
+    'Accountant', 'Analyst', 'Designer', 'Developer', 'Engineer', 'Executive', 'Manager',
+    'Recruiter', 'Sales Associate', 'Support Specialist',
+]
+POSITION_LEVELS = ['I', 'II', 'III', 'Senior', 'Lead', 'Principal']
+
+EMAIL_DOMAIN = 'loadtest.example.com'
+TODAY = date.today()
+
+
+def zipf_cum_weights(count, skew):
+    """Cumulative weights where item k gets 1 / (k + 1) ** skew; skew 0 is uniform."""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def generate_batch(seed, start, size, department_ids, department_weights, position_ids, position_weights):
+    """
+    Rows start .. start + size - 1 as plain tuples. Seeded per batch, so the output
+    doesn't depend on how batches are spread over workers.
+    """
+    rng = random.Random(seed * 1_000_003 + start)
+    first_names = rng.choices(FIRST_NAMES, k=size)
+    last_names = rng.choices(LAST_NAMES, k=size)
+    departments = rng.choices(department_ids, cum_weights=department_weights, k=size)
+    positions = rng.choices(position_ids, cum_weights=position_weights, k=size)
+
+    # Values come out already in their DB literal form (ISO dates, decimal strings)
+    rows = []
+    for offset in range(size):
+        number = start + offset
+        first_name, last_name = first_names[offset], last_names[offset]
+        rows.append((
+            first_name,
+            last_name,
+            # The row number keeps emails and phone numbers unique without a lookup set
+            f'{first_name.lower()}.{last_name.lower()}.{number}@{EMAIL_DOMAIN}',
+            f'99{number:011d}',
+            (TODAY - timedelta(days=rng.randint(22 * 365, 60 * 365))).isoformat(),
+            (TODAY - timedelta(days=rng.randint(30, 3650))).isoformat(),
+            str(Decimal(rng.randint(3_000_000, 20_000_000)).scaleb(-2)),
+            departments[offset],
+            positions[offset],
+        ))
+    return rows
+
+
+INSERT_FIELDS = [
+    'first_name', 'last_name', 'email', 'phone_number', 'date_of_birth', 'date_of_joining',
+    'salary', 'department_id', 'position_id', 'created_at', 'updated_at',
+]
+
+
+def insert_sql():
+    columns = ', '.join(connection.ops.quote_name(Employee._meta.get_field(name).column) for name in INSERT_FIELDS)
+    placeholders = ', '.join(['%s'] * len(INSERT_FIELDS))
+    return f'INSERT INTO {connection.ops.quote_name(Employee._meta.db_table)} ({columns}) VALUES ({placeholders})'
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic employees for load testing (deterministic for a given seed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Number of employees to create')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per generated batch / bulk insert')
+        parser.add_argument('--workers', type=int, default=2, help='Generator processes (0 = in-process)')
+        parser.add_argument('--departments', type=int, default=50, help='Size of the department pool')
+        parser.add_argument('--positions', type=int, default=60, help='Size of the position pool')
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help='Zipf exponent for department/position sizes (0 = uniform)')
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help="Don't index the new rows for search (run rebuild_search_index later)")
+        parser.add_argument('--skip-analytics', action='store_true',
+                            help="Don't rebuild the analytics summaries (run rebuild_analytics later)")
+
+    def reference_ids(self, options):
+        department_names = [f'Department {number:03d}' for number in range(1, options['departments'] + 1)]
+        Department.objects.bulk_create(
+            [Department(name=name, location='Load Test') for name in department_names], ignore_conflicts=True
+        )
+        titles = [f'{family} {level}' for level in POSITION_LEVELS for family in POSITION_FAMILIES]
+        titles = titles[:options['positions']]
+        Position.objects.bulk_create([Position(title=title) for title in titles], ignore_conflicts=True)
+
+        # Keep pool order stable so the skew always favours the same departments/positions
+        departments = dict(Department.objects.filter(name__in=department_names).values_list('name', 'id'))
+        positions = dict(Position.objects.filter(title__in=titles).values_list('title', 'id'))
+        return [departments[name] for name in department_names], [positions[title] for title in titles]
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        department_ids, position_ids = self.reference_ids(options)
+        pools = (
+            department_ids, zipf_cum_weights(len(department_ids), options['skew']),
+            position_ids, zipf_cum_weights(len(position_ids), options['skew']),
+        )
+
+        # Numbering continues after the current max id so repeated runs don't collide
+        first_number = (Employee.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        batch_size = options['batch_size']
+        starts = range(first_number, first_number + options['count'], batch_size)
+        sizes = [min(batch_size, first_number + options['count'] - start) for start in starts]
+
+        # Rows go straight to executemany: bulk_create's per-value SQL compilation
+        # costs several times more than generating the data
+        sql = insert_sql()
+        stamp = connection.ops.adapt_datetimefield_value(timezone.now())
+        created = 0
+        for rows in self.generate(options, starts, sizes, pools):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, [row + (stamp, stamp) for row in rows])
+            created += len(rows)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"… {created:,} / {options['count']:,} employees ({created / elapsed:,.0f} rows/sec)")
+
+        # Raw inserts skip model signals, so bump the data versions, index and summarise by hand.
+        # Generated rows spread over almost one summary cell each, so one rebuild at the end
+        # is far cheaper than applying a delta per batch.
+        bump_version(Employee, Department, Position)
+        if not options['skip_search_index']:
+            self.stdout.write("… indexing new employees for search")
+            index_employees(Employee.objects.filter(id__gte=first_number))
+        if not options['skip_analytics']:
+            self.stdout.write("… rebuilding the analytics summaries")
+            rebuild_summaries()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Generated {created:,} employees in {elapsed:.1f}s ({created / elapsed if elapsed else 0:,.0f} rows/sec)"
+        ))
+
+    def generate(self, options, starts, sizes, pools):
+        seed, workers = options['seed'], options['workers']
+        if workers <= 0:
+            for start, size in zip(starts, sizes):
+                yield generate_batch(seed, start, size, *pools)
+            return
+
+        # Keep a couple of batches per worker in flight so generation overlaps the inserts
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for start, size in zip(starts, sizes):
+                pending.append(pool.submit(generate_batch, seed, start, size, *pools))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -1,17 +1,45 @@
-import csv
 import os
-from sqlite3 import IntegrityError
-from django.core.management.base import BaseCommand
-from adminpanel.models import Employee, Department, Position
-from django.utils.dateparse import parse_date
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adminpanel.importing import (
+    CHUNK_SIZE, MODE_CREATE, MODE_UPSERT, EmployeeImporter, RejectLog, clean_chunk, read_chunks
+)
+from adminpanel.models import Department, Employee, Position
+from adminpanel.versioning import bump_version
+
+
+def clean_chunks_in_pool(chunks, workers):
+    """Clean chunks in a process pool, in file order, with at most 2 chunks per worker in flight."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(clean_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
-BATCH_SIZE = 5000  # Number of records per bulk insert
 
 class Command(BaseCommand):
     help = 'Import employee records from a CSV file (optimized for large datasets)'
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the cleaned CSV file')
+        parser.add_argument('--batch-size', type=int, default=CHUNK_SIZE, help='Rows per parse/insert batch')
+        parser.add_argument('--mode', choices=[MODE_CREATE, MODE_UPSERT], default=MODE_CREATE,
+                            help='create: reject emails already in the DB; upsert: update changed rows matched on email')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Parse and validate chunks in a pool of N processes (0 = in-process)')
+        parser.add_argument('--reject-file', type=str,
+                            help='Write rejected rows (line number, reason, message) to this .csv or .jsonl file')
+        parser.add_argument('--max-errors', type=int,
+                            help='Abort once more than this many rows have been rejected')
+        parser.add_argument('--progress-every', type=float, default=5.0,
+                            help='Seconds between progress lines')
 
     def handle(self, *args, **options):
         csv_file = options['csv_file']
@@ -20,91 +48,53 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"❌ File not found: {csv_file}"))
             return
 
-        created_count = 0
-        skipped_rows = 0
-        employees_to_create = []
-        seen_emails = set()  # ✅ Track duplicate emails in the file
-
-        # Preload departments and positions to avoid duplicate queries
-        departments = {dept.name: dept for dept in Department.objects.all()}
-        positions = {pos.title: pos for pos in Position.objects.all()}
-
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-
-            for row in reader:
-                try:
-                    required_fields = ['first_name', 'last_name', 'email', 'phone_number', 'department', 'position']
-                    if not all(row.get(field) for field in required_fields):
-                        raise ValueError('Missing required fields')
-
-                    # Clean and extract values
-                    first_name = row['first_name'].strip()
-                    last_name = row['last_name'].strip()
-                    email = row['email'].strip()
-                    phone_number = row['phone_number'].strip()
-                    dob_str = row.get('date_of_birth', '').strip()
-                    doj_str = row.get('date_of_joining', '').strip()
-                    date_of_birth = parse_date(dob_str) if dob_str else None
-                    date_of_joining = parse_date(doj_str) if doj_str else None
-                    salary = float(row['salary']) if row.get('salary') else 0.0
-
-                    # Skip if email already exists in DB
-                    if Employee.objects.filter(email=email).exists():
-                        raise ValueError(f"Duplicate email in DB: {email}")
-
-                    # ✅ Skip if email already seen in current file
-                    if email in seen_emails:
-                        raise ValueError(f"Duplicate email in file: {email}")
-                    seen_emails.add(email)
-
-                    # Department (create if not exist)
-                    dept_name = row['department'].strip()
-                    if dept_name not in departments:
-                        departments[dept_name] = Department.objects.create(name=dept_name, location="Unknown")
-                    department = departments[dept_name]
-
-                    # Position (create if not exist)
-                    pos_title = row['position'].strip()
-                    if pos_title not in positions:
-                        positions[pos_title] = Position.objects.create(title=pos_title)
-                    position = positions[pos_title]
-
-                    # Create an Employee instance
-                    employee = Employee(
-                        first_name=first_name,
-                        last_name=last_name,
-                        email=email,
-                        phone_number=phone_number,
-                        date_of_birth=date_of_birth,
-                        date_of_joining=date_of_joining,
-                        salary=salary,
-                        department=department,
-                        position=position
+        started = time.perf_counter()
+        importer = EmployeeImporter(mode=options['mode'])
+        rejects = RejectLog(options['reject_file'])
+        total_rows = 0
+        last_progress = started
+
+        chunks = read_chunks(csv_file, options['batch_size'])
+        if options['workers'] > 0:
+            cleaned_chunks = clean_chunks_in_pool(chunks, options['workers'])
+        else:
+            cleaned_chunks = map(clean_chunk, chunks)
+
+        try:
+            for cleaned, errors in cleaned_chunks:
+                total_rows += len(cleaned) + len(errors)
+                if cleaned:
+                    errors.extend(importer.import_chunk(cleaned))
+                rejects.add(sorted(errors))
+
+                if options['max_errors'] is not None and rejects.total > options['max_errors']:
+                    raise CommandError(
+                        f"❌ Aborted after {rejects.total} rejected rows (--max-errors {options['max_errors']}); "
+                        f"{importer.created} created and {importer.updated} updated rows were kept."
                     )
-                    employees_to_create.append(employee)
 
-                    if len(employees_to_create) >= BATCH_SIZE:
-                        Employee.objects.bulk_create(employees_to_create)
-                        created_count += len(employees_to_create)
-                        self.stdout.write(self.style.SUCCESS(f"✅ Inserted {created_count} records..."))
-                        employees_to_create = []
-
-                except Exception as e:
-                    skipped_rows += 1
-                    self.stdout.write(self.style.WARNING(
-                        f"⚠️ Skipped row due to error: {e}\n"
-                        f"🔍 Row keys: {list(row.keys())}\n"
-                        f"📝 Raw row: {row}"
-                    ))
-
-        # Final batch insert
-        if employees_to_create:
-            try:
-                Employee.objects.bulk_create(employees_to_create)
-                created_count += len(employees_to_create)
-            except IntegrityError as e:
-                self.stdout.write(self.style.ERROR(f"❌ Final batch failed due to: {e}"))
-
-        self.stdout.write(self.style.SUCCESS(f"✅ Done! Total: {created_count} employees imported."))
-        self.stdout.write(self.style.WARNING(f"⚠️ Total Skipped Rows: {skipped_rows}"))
+                now = time.perf_counter()
+                if now - last_progress >= options['progress_every']:
+                    last_progress = now
+                    self.stdout.write(
+                        f"… {total_rows:,} rows read, {importer.created:,} created, {importer.updated:,} updated, "
+                        f"{rejects.total:,} rejected ({total_rows / (now - started):,.0f} rows/sec)"
+                    )
+        finally:
+            rejects.close()
+            # bulk_create/bulk_update skip model signals, so bump the data versions by hand
+            if importer.changed:
+                bump_version(Employee, Department, Position)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ Done! Total: {importer.created} employees imported."))
+        if options['mode'] == MODE_UPSERT:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Updated: {importer.updated}, unchanged: {importer.unchanged}"
+            ))
+        self.stdout.write(self.style.WARNING(f"⚠️ Total Skipped Rows: {rejects.total}"))
+        for code, count in rejects.counts.most_common():
+            self.stdout.write(self.style.WARNING(f"   {code}: {count}"))
+        if options['reject_file'] and rejects.total:
+            self.stdout.write(f"📝 Rejected rows written to {options['reject_file']}")
+        self.stdout.write(f"⏱️ Processed {total_rows} rows in {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:,.0f} rows/sec)")
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from adminpanel.export_jobs import purge_export_jobs
+
+
+class Command(BaseCommand):
+    help = 'Delete old export jobs and their files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Remove jobs older than this many days')
+
+    def handle(self, *args, **options):
+        removed = purge_export_jobs(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f"✅ Removed {removed} export jobs."))
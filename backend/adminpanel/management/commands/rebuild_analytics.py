@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from adminpanel.analytics import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the workforce analytics summary tables from the employee table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        cells, buckets = rebuild_summaries(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rebuilt {cells} summary cells and {buckets} salary buckets in {time.perf_counter() - started:.1f}s"
+        ))
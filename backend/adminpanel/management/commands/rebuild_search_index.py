@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from adminpanel.models import Employee, EmployeeSearchToken
+from adminpanel.search import index_employees
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the employee search token index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        EmployeeSearchToken.objects.all().delete()
+        indexed = index_employees(Employee.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Indexed {indexed} employees in {time.perf_counter() - started:.1f}s"
+        ))
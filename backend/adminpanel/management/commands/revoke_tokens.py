@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from adminpanel.authentication import revoke_tokens
+
+
+class Command(BaseCommand):
+    help = 'Revoke every JWT issued so far to the given users (by email)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('emails', nargs='+', help='Email addresses of the users to sign out')
+
+    def handle(self, *args, **options):
+        users = dict(get_user_model().objects.filter(email__in=options['emails']).values_list('email', 'pk'))
+        missing = sorted(set(options['emails']) - set(users))
+        if missing:
+            raise CommandError(f"❌ No user with email: {', '.join(missing)}")
+        for pk in users.values():
+            revoke_tokens(pk)
+        self.stdout.write(self.style.SUCCESS(f"✅ Revoked the tokens of {len(users)} users."))
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:51
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of adminpanel.search.employee_tokens() as of this migration, so later
+# changes to the tokenizer don't change what it does
+FIELD_NAME, FIELD_EMAIL, FIELD_PHONE = 1, 2, 3
+TOKEN_MAX_LENGTH = 100
+WORD_SPLIT = re.compile(r'[\s.,_+\-@]+')
+NON_DIGITS = re.compile(r'\D')
+
+
+def employee_tokens(first_name, last_name, email, phone_number):
+    tokens = set()
+    for name in (first_name, last_name):
+        name = name.lower().strip()
+        if name:
+            tokens.add((name[:TOKEN_MAX_LENGTH], FIELD_NAME))
+        tokens.update((word, FIELD_NAME) for word in WORD_SPLIT.split(name) if word)
+
+    email = email.lower()
+    tokens.add((email[:TOKEN_MAX_LENGTH], FIELD_EMAIL))
+    local_part = email.split('@', 1)[0]
+    tokens.update((word, FIELD_EMAIL) for word in WORD_SPLIT.split(local_part) if word)
+
+    digits = NON_DIGITS.sub('', phone_number)
+    if digits:
+        tokens.add((digits, FIELD_PHONE))
+    return tokens
+
+
+def index_existing_employees(apps, schema_editor):
+    # What rebuild_search_index does, with the historical models, so existing employees are searchable
+    Employee = apps.get_model('adminpanel', 'Employee')
+    EmployeeSearchToken = apps.get_model('adminpanel', 'EmployeeSearchToken')
+    rows = Employee.objects.order_by().values_list('id', 'first_name', 'last_name', 'email', 'phone_number')
+    tokens = []
+    for employee_id, *values in rows.iterator(chunk_size=5000):
+        tokens.extend(
+            EmployeeSearchToken(employee_id=employee_id, token=token, field=field)
+            for token, field in employee_tokens(*values)
+        )
+        if len(tokens) >= 5000:
+            EmployeeSearchToken.objects.bulk_create(tokens)
+            tokens = []
+    EmployeeSearchToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0004_employee_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100)),
+                ('field', models.PositiveSmallIntegerField(choices=[(1, 'Name'), (2, 'Email'), (3, 'Phone')])),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='adminpanel.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'employee'], name='search_token_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_employees, migrations.RunPython.noop),
+    ]
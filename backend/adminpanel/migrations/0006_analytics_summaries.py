@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:00
+
+import math
+
+import django.db.models.deletion
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+
+# Frozen copy of adminpanel.analytics.salary_bucket() as of this migration, so later
+# changes to the bucketing don't change what it does
+LOG_GROWTH = math.log(1.02)
+
+
+def salary_bucket(salary):
+    salary = float(salary)
+    if salary < 1:
+        return 0
+    return int(math.log(salary) / LOG_GROWTH) + 1
+
+
+def summarise_existing_employees(apps, schema_editor):
+    # What rebuild_analytics does, with the historical models, so the summaries start out complete
+    Employee = apps.get_model('adminpanel', 'Employee')
+    WorkforceSummary = apps.get_model('adminpanel', 'WorkforceSummary')
+    SalaryHistogram = apps.get_model('adminpanel', 'SalaryHistogram')
+    cells = (
+        Employee.objects.order_by()
+        .annotate(hire_month=TruncMonth('date_of_joining'))
+        .values('department_id', 'position_id', 'hire_month')
+        .annotate(headcount=Count('id'), salary_sum=Sum('salary'), salary_min=Min('salary'), salary_max=Max('salary'))
+    )
+    WorkforceSummary.objects.bulk_create((WorkforceSummary(**cell) for cell in cells.iterator()), batch_size=5000)
+
+    buckets = Counter(
+        (department_id, position_id, salary_bucket(salary))
+        for department_id, position_id, salary in Employee.objects.order_by().values_list(
+            'department_id', 'position_id', 'salary',
+        ).iterator(chunk_size=5000)
+    )
+    SalaryHistogram.objects.bulk_create([
+        SalaryHistogram(department_id=department_id, position_id=position_id, bucket=bucket, headcount=headcount)
+        for (department_id, position_id, bucket), headcount in buckets.items()
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0005_employeesearchtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalaryHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('headcount', models.PositiveIntegerField(default=0)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='adminpanel.department')),
+                ('position', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='adminpanel.position')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('department', 'position', 'bucket'), name='salary_histogram_cell')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkforceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hire_month', models.DateField()),
+                ('headcount', models.PositiveIntegerField(default=0)),
+                ('salary_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('salary_min', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('salary_max', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='adminpanel.department')),
+                ('position', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='adminpanel.position')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('department', 'position', 'hire_month'), name='workforce_summary_cell')],
+            },
+        ),
+        migrations.RunPython(summarise_existing_employees, migrations.RunPython.noop),
+    ]
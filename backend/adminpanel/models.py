@@ -1,4 +1,9 @@
-from django.db import models
+import uuid
+
+from django.conf import settings
+from django.db import connections, models
+from django.db.models.functions import Lower
+from django.utils import timezone
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True)  # Prevent duplicate departments
@@ -43,6 +48,133 @@ class Employee(models.Model):
     class Meta:
         app_label = 'adminpanel'
         ordering = ['-date_of_joining']  # Most recent employees first
+        # Match the filter + ordering combinations the API accepts (see adminpanel/filters.py)
+        indexes = [
+            models.Index(fields=['department', 'date_of_joining'], name='employee_dept_joining_idx'),
+            models.Index(fields=['department', 'salary'], name='employee_dept_salary_idx'),
+            models.Index(fields=['position', 'date_of_joining'], name='employee_pos_joining_idx'),
+            models.Index(fields=['position', 'salary'], name='employee_pos_salary_idx'),
+            models.Index(fields=['salary'], name='employee_salary_idx'),
+            models.Index(fields=['last_name', 'id'], name='employee_name_idx'),  # With the id tiebreaker
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored values, so a save knows what it changes without reading them again (see signals.py)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
+def unique_key(value):
+    """An employee email or phone number as the unique indexes compare it: MySQL's default collation ignores case."""
+    return value.casefold()
+
+
+def employees_matching(field, values):
+    """Employees whose unique `field` equals one of `values` ignoring case, as the unique index would see it."""
+    queryset = Employee.objects.all()
+    if connections[queryset.db].vendor == 'mysql':
+        return queryset.filter(**{f'{field}__in': values})  # The collation ignores case, and the index is used
+    return queryset.annotate(unique_value=Lower(field)).filter(unique_value__in={value.lower() for value in values})
+
+
+class EmployeeSearchToken(models.Model):
+    # One row per searchable token of an employee (see adminpanel/search.py)
+    FIELD_NAME = 1
+    FIELD_EMAIL = 2
+    FIELD_PHONE = 3
+    FIELD_CHOICES = [(FIELD_NAME, 'Name'), (FIELD_EMAIL, 'Email'), (FIELD_PHONE, 'Phone')]
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=100)
+    field = models.PositiveSmallIntegerField(choices=FIELD_CHOICES)
+
+    class Meta:
+        app_label = 'adminpanel'
+        indexes = [
+            models.Index(fields=['token', 'employee'], name='search_token_idx'),
+        ]
+
+    def __str__(self):
+        return self.token
+
+
+class ExportJob(models.Model):
+    FORMAT_CSV = 'csv'
+    FORMAT_XLSX = 'xlsx'
+    FORMAT_CHOICES = [(FORMAT_CSV, 'CSV'), (FORMAT_XLSX, 'Excel')]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    params = models.JSONField(default=dict, blank=True)  # Filter/search/ordering query params
+    fingerprint = models.CharField(max_length=64, db_index=True)  # Format + params + data version
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    rows_written = models.PositiveIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(blank=True, null=True)
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    worker = models.CharField(max_length=100, blank=True)  # host:pid of the process queueing/running the job
+    heartbeat_at = models.DateTimeField(default=timezone.now)  # Refreshed as the job makes progress
+
+    class Meta:
+        app_label = 'adminpanel'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.file_format} export {self.id} ({self.status})"
+
+
+class WorkforceSummary(models.Model):
+    # Headcount and salary totals per department, position and month of joining,
+    # kept up to date on every employee write (see adminpanel/analytics.py)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='+')
+    position = models.ForeignKey(Position, on_delete=models.CASCADE, related_name='+')
+    hire_month = models.DateField()  # First day of the month
+    headcount = models.PositiveIntegerField(default=0)
+    salary_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    salary_min = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    salary_max = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        app_label = 'adminpanel'
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'position', 'hire_month'], name='workforce_summary_cell'),
+        ]
+
+    def __str__(self):
+        return f"{self.department_id}/{self.position_id}/{self.hire_month:%Y-%m}: {self.headcount}"
+
+
+class SalaryHistogram(models.Model):
+    # Employee counts per department, position and logarithmic salary bucket; percentiles are read from it
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='+')
+    position = models.ForeignKey(Position, on_delete=models.CASCADE, related_name='+')
+    bucket = models.PositiveSmallIntegerField()
+    headcount = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        app_label = 'adminpanel'
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'position', 'bucket'], name='salary_histogram_cell'),
+        ]
+
+    def __str__(self):
+        return f"{self.department_id}/{self.position_id}/{self.bucket}: {self.headcount}"
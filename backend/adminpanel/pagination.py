@@ -0,0 +1,249 @@
+"""
+List pagination for the adminpanel API.
+
+ListPagination keeps the page-number behaviour by default and switches to keyset
+(cursor) pagination when the client sends ?pagination=keyset or a ?cursor=.
+Keyset pages filter on the last row's ordering values instead of using OFFSET,
+so page 4000 costs the same as page 1. Counts are cached per data version.
+"""
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .versioning import aget_versions, get_versions
+
+COUNT_CACHE_TIMEOUT = 60 * 60  # Keys include the data version, so this only bounds cache growth
+
+
+def _count_key(sql, versions):
+    return 'adminpanel:count:' + hashlib.md5(f'{sql}|{versions}'.encode()).hexdigest()
+
+
+def cached_count(queryset):
+    """COUNT(*) of the queryset, cached until its model's data version changes."""
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:  # e.g. queryset.none()
+        return 0
+    key = _count_key(sql, get_versions(queryset.model))
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+async def acached_count(queryset):
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return 0
+    key = _count_key(sql, await aget_versions(queryset.model))
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def approximate_count(queryset):
+    """Table-statistics row estimate for unfiltered MySQL querysets; cached exact count otherwise."""
+    connection = connections[queryset.db]
+    if connection.vendor == 'mysql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] is not None:
+            return row[0]
+    return cached_count(queryset)
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'  # "true" for a cached exact count, "approx" for an estimate
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def get_keys(self, queryset):
+        """(attname, descending) pairs for the active ordering, with id appended as the tiebreaker."""
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        keys = []
+        for name in ordering:
+            if not isinstance(name, str):
+                raise ValidationError({'ordering': ["Keyset pagination needs an explicit ordering for ranked search results."]})
+            descending = name.startswith('-')
+            try:
+                field = queryset.model._meta.get_field(name.lstrip('-'))
+            except FieldDoesNotExist:
+                raise ValidationError({'ordering': [f"Keyset pagination can't order by '{name.lstrip('-')}'."]})
+            if field.null:
+                raise ValidationError({'ordering': [f"Keyset pagination can't order by nullable field '{field.name}'."]})
+            keys.append((field.attname, descending))
+        if not any(name in ('id', 'pk') for name, _ in keys):
+            keys.append(('id', keys[-1][1] if keys else False))
+        return [('id', descending) if name == 'pk' else (name, descending) for name, descending in keys]
+
+    def encode_cursor(self, values):
+        payload = json.dumps(values, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise ValidationError({self.cursor_query_param: ['Invalid cursor.']})
+        try:
+            return [self.key_value(name, value) for (name, _), value in zip(self.keys, values)]
+        except (ValueError, TypeError, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: ['Invalid cursor.']})
+
+    def key_value(self, name, value):
+        # Cursors come from the client, so each value has to be a valid value of its key's field
+        if value is None:
+            raise ValueError(name)
+        field = self.model._meta.get_field(name)
+        return field.get_prep_value(field.to_python(value))
+
+    def after(self, values):
+        """Rows strictly after `values` in key order: (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ..."""
+        condition = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            step = Q(**{key: value for (key, _), value in zip(self.keys[:index], values[:index])})
+            step &= Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+            condition |= step
+        return condition
+
+    def ordered(self, queryset, request):
+        self.request = request
+        self.model = queryset.model
+        self.keys = self.get_keys(queryset)
+        return queryset.order_by(*[('-' if descending else '') + name for name, descending in self.keys])
+
+    def count_mode(self, request):
+        return request.query_params.get(self.count_query_param, '').lower()
+
+    def page_queryset(self, queryset, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor)))
+        return queryset[:self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.ordered(queryset, request)
+        with_count = self.count_mode(request)
+        if with_count == 'approx':
+            self.count = approximate_count(queryset)
+        elif with_count in ('1', 'true', 'yes'):
+            self.count = cached_count(queryset)
+        else:
+            self.count = None
+        return self.page_rows(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.ordered(queryset, request)
+        with_count = self.count_mode(request)
+        if with_count == 'approx':
+            self.count = await sync_to_async(approximate_count)(queryset)  # Raw information_schema query
+        elif with_count in ('1', 'true', 'yes'):
+            self.count = await acached_count(queryset)
+        else:
+            self.count = None
+        return self.page_rows([row async for row in self.page_queryset(queryset, request)])
+
+    def page_rows(self, rows):
+        self.next_values = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            last = rows[-1]
+            # Rows are model instances, or dicts when the view reads .values()
+            self.next_values = [last[name] if isinstance(last, dict) else getattr(last, name) for name, _ in self.keys]
+        return rows
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['results'] = data
+        return Response(response)
+
+
+class ListPagination(PageNumberPagination):
+    """Page numbers by default; keyset pages with ?pagination=keyset or ?cursor=..."""
+    django_paginator_class = CachedCountPaginator
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    mode_query_param = 'pagination'
+
+    def use_keyset(self, request):
+        return request.query_params.get(self.mode_query_param) == 'keyset' or KeysetPagination.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            page_size = self.get_page_size(request)
+            if page_size is None:
+                return None
+            self.keyset = KeysetPagination(page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() with the count and the page fetched through the async ORM."""
+        if self.use_keyset(request):
+            page_size = self.get_page_size(request)
+            if page_size is None:
+                return None
+            self.keyset = KeysetPagination(page_size)
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+
+        self.keyset = None
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await acached_count(queryset)  # Fills the cached_property, so page() doesn't query
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [row async for row in self.page.object_list]
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
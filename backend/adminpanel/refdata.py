@@ -0,0 +1,133 @@
+"""
+Process-local cache of the department and position tables.
+
+Both tables are small and rarely written, but every employee form, serializer
+validation and import preloads or looks them up. Each ReferenceTable keeps an
+id -> object and name -> id map in memory and reloads it when the model's data
+version (see versioning.py) moves. Writes in this process invalidate it
+straight away through signals; writes in other processes are picked up at the
+next version check, at most VERSION_CHECK_INTERVAL seconds later.
+"""
+import copy
+import threading
+import time
+
+from django import forms
+from rest_framework import serializers
+
+from .models import Department, Position
+from .versioning import get_versions
+
+VERSION_CHECK_INTERVAL = 1.0  # Seconds between version lookups in the shared cache
+
+
+class ReferenceTable:
+    def __init__(self, model, name_field):
+        self.model = model
+        self.name_field = name_field
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0
+        self._by_id = {}
+        self._ids_by_name = {}
+
+    def _maps(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at > VERSION_CHECK_INTERVAL:
+                version = get_versions(self.model)[0]
+                if version != self._version:
+                    objects = list(self.model.objects.all())  # Model ordering, as the select widgets show it
+                    self._by_id = {obj.pk: obj for obj in objects}
+                    self._ids_by_name = {getattr(obj, self.name_field): obj.pk for obj in objects}
+                    self._version = version
+                self._checked_at = now
+            return self._by_id, self._ids_by_name
+
+    def __deepcopy__(self, memo):
+        # Shared by every form/serializer field that copies its declared fields
+        return self
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = 0
+            self._version = None
+
+    def get(self, pk):
+        """A private copy of the object with this pk, or None."""
+        obj = self._maps()[0].get(pk)
+        return copy.copy(obj) if obj is not None else None
+
+    def all(self):
+        return [copy.copy(obj) for obj in self._maps()[0].values()]
+
+    def __len__(self):
+        return len(self._maps()[0])
+
+    def ids_by_name(self):
+        return dict(self._maps()[1])
+
+
+departments = ReferenceTable(Department, 'name')
+positions = ReferenceTable(Position, 'title')
+
+TABLES = {Department: departments, Position: positions}
+
+
+def _coerce_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that validates against a ReferenceTable instead of querying."""
+
+    def __init__(self, table, **kwargs):
+        self.table = table
+        kwargs.setdefault('queryset', table.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.table.get(_coerce_pk(data))
+        if obj is None:
+            if _coerce_pk(data) is None:
+                self.fail('incorrect_type', data_type=type(data).__name__)
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class CachedChoiceIterator(forms.models.ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.table.all():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.table) + (self.field.empty_label is not None)
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField whose choices and validation come from a ReferenceTable."""
+    iterator = CachedChoiceIterator
+
+    def __init__(self, table, **kwargs):
+        self.table = table
+        kwargs.setdefault('queryset', table.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.table.model):
+            value = value.pk
+        obj = self.table.get(_coerce_pk(value))
+        if obj is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return obj
@@ -0,0 +1,55 @@
+"""
+Response caching for read endpoints.
+
+Cached entries are keyed by host, path, query params and the data versions of
+the models a view reads (see versioning.py). Any write bumps the version, so a
+stale entry is never looked up again. Its ETag is derived from the same key, so
+an If-None-Match revalidation is answered with a 304 without touching the
+cache or the database.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+from rest_framework import status
+from rest_framework.response import Response
+
+from .versioning import get_versions
+
+
+def response_cache_key(request, versions):
+    """Shared by the sync views and their async variants (async_views.py), so they share entries too."""
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    raw = f'{request.get_host()}|{request.path}?{query}|{versions}'
+    return 'adminpanel:response:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def response_cache_headers(key):
+    return {'ETag': f'"{key.rsplit(":", 1)[1]}"', 'Cache-Control': 'private, no-cache'}
+
+
+class CachedResponseMixin:
+    cache_models = ()  # Models whose writes invalidate this view's responses
+
+    def get_response_cache_key(self, request):
+        return response_cache_key(request, get_versions(*self.cache_models))
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        headers = response_cache_headers(key)
+        etag = headers['ETag']
+
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, headers=headers)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+            for header, value in headers.items():
+                response[header] = value
+        return response
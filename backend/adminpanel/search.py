@@ -0,0 +1,277 @@
+"""
+Employee search index.
+
+Each employee is broken into lowercase tokens (name parts, the email and its
+local-part pieces, phone digits) stored in EmployeeSearchToken with an index on
+the token. A search term then becomes index range scans:
+
+  * prefix matches: token >= 'term' AND token < 'tern', with an exact token
+    ranked ahead of its longer completions;
+  * fuzzy matches on names: name tokens sharing enough trigrams with the term,
+    found through an in-process trigram map of the (small) name vocabulary.
+
+Every word of the query has to match, like DRF's SearchFilter. With an explicit
+ordering every match is returned, through a semi-join per word in the list query
+itself. Otherwise results are ranked (exact > prefix > fuzzy, summed across words)
+and the best MAX_RANKED_RESULTS returned. The ranking reads at most MAX_CANDIDATES
+employees per word, in index order, so exact tokens come first, and scores them in
+one grouped query. Its cost is bounded however common the words are, and it is
+exact whenever some word has fewer matches than that. The index is kept in sync by
+signals (see signals.py); bulk writers call index_rows() or index_employees() and
+`manage.py rebuild_search_index` rebuilds it from scratch.
+"""
+import operator
+import re
+import threading
+import time
+from collections import defaultdict
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Max, OuterRef, Q, Subquery, Value, When
+from rest_framework.filters import BaseFilterBackend
+
+from .models import EmployeeSearchToken
+
+FUZZY_MIN_SIMILARITY = 0.3
+FUZZY_MAX_TOKENS = 20  # Similar vocabulary tokens looked up per word
+VOCABULARY_TTL = 300  # Seconds before the fuzzy-match vocabulary is reloaded
+
+EXACT_SCORE, PREFIX_SCORE = 3.0, 2.0
+MAX_RANKED_RESULTS = 1000  # Best matches a ranked search returns; with an explicit ordering all are returned
+MAX_CANDIDATES = 5000  # Employees per query word that a ranked search scores
+
+WORD_SPLIT = re.compile(r'[\s.,_+\-@]+')  # Splits names and email local parts into tokens
+NON_DIGITS = re.compile(r'\D')
+TOKEN_MAX_LENGTH = EmployeeSearchToken._meta.get_field('token').max_length
+
+
+def employee_tokens(first_name, last_name, email, phone_number):
+    """(token, field) pairs indexed for one employee."""
+    tokens = set()
+    for name in (first_name, last_name):
+        name = name.lower().strip()
+        if name:
+            tokens.add((name[:TOKEN_MAX_LENGTH], EmployeeSearchToken.FIELD_NAME))
+        tokens.update((word, EmployeeSearchToken.FIELD_NAME) for word in WORD_SPLIT.split(name) if word)
+
+    email = email.lower()
+    tokens.add((email[:TOKEN_MAX_LENGTH], EmployeeSearchToken.FIELD_EMAIL))
+    local_part = email.split('@', 1)[0]
+    tokens.update((word, EmployeeSearchToken.FIELD_EMAIL) for word in WORD_SPLIT.split(local_part) if word)
+
+    digits = NON_DIGITS.sub('', phone_number)
+    if digits:
+        tokens.add((digits, EmployeeSearchToken.FIELD_PHONE))
+    return tokens
+
+
+def index_employees(queryset, batch_size=5000):
+    """(Re)build the tokens of every employee in queryset."""
+    rows = queryset.order_by().values_list('id', 'first_name', 'last_name', 'email', 'phone_number')
+    indexed = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            indexed += _index_batch(batch)
+            batch = []
+    if batch:
+        indexed += _index_batch(batch)
+    return indexed
+
+
+def _index_batch(rows, new=()):
+    tokens = [
+        EmployeeSearchToken(employee_id=employee_id, token=token, field=field)
+        for employee_id, *values in rows
+        for token, field in employee_tokens(*values)
+    ]
+    indexed = [row[0] for row in rows if row[0] not in new]  # New employees have no tokens to replace
+    # Part of the caller's transaction if there is one, with no savepoint of its own
+    with transaction.atomic(savepoint=False):
+        if indexed:
+            EmployeeSearchToken.objects.filter(employee_id__in=indexed).delete()
+        EmployeeSearchToken.objects.bulk_create(tokens, batch_size=5000)
+    return len(rows)
+
+
+def index_rows(rows, new=()):
+    """
+    (Re)build the tokens of employees from their (id, first_name, last_name, email,
+    phone_number) rows, for writers that have just read them; ids in `new` have none yet.
+    """
+    return _index_batch(rows, new) if rows else 0
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+class NameVocabulary:
+    """Trigram map over the distinct name tokens, reloaded every VOCABULARY_TTL seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = 0
+        self._grams = {}  # token -> trigram set
+        self._by_gram = {}  # trigram -> tokens
+
+    def _load(self):
+        tokens = EmployeeSearchToken.objects.filter(field=EmployeeSearchToken.FIELD_NAME)
+        grams = {token: trigrams(token) for token in tokens.values_list('token', flat=True).distinct()}
+        by_gram = defaultdict(list)
+        for token, token_grams in grams.items():
+            for gram in token_grams:
+                by_gram[gram].append(token)
+        self._grams, self._by_gram = grams, dict(by_gram)
+        self._loaded_at = time.monotonic()
+
+    def similar(self, word):
+        """[(token, similarity)] for vocabulary tokens close to word, best first."""
+        with self._lock:
+            if time.monotonic() - self._loaded_at > VOCABULARY_TTL:
+                self._load()
+            grams, by_gram = self._grams, self._by_gram
+
+        word_grams = trigrams(word)
+        shared = defaultdict(int)
+        for gram in word_grams:
+            for token in by_gram.get(gram, ()):
+                shared[token] += 1
+        matches = []
+        for token, common in shared.items():
+            similarity = common / len(word_grams | grams[token])
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                matches.append((token, similarity))
+        matches.sort(key=lambda match: -match[1])
+        return matches[:FUZZY_MAX_TOKENS]
+
+
+vocabulary = NameVocabulary()
+
+
+def _after_prefix(word):
+    # The smallest string greater than every string starting with word
+    return word[:-1] + chr(ord(word[-1]) + 1)
+
+
+def _prefix(word):
+    # A range rather than istartswith: an index range scan on every backend (SQLite's LIKE
+    # ignores case, so it can't use the index), and tokens are stored lowercase anyway
+    return Q(token__gte=word, token__lt=_after_prefix(word))
+
+
+def _similar(word):
+    """{token: similarity} of the other name tokens close to word, for fuzzy matching."""
+    if len(word) < 3 or word.isdigit():
+        return {}
+    similar = dict(vocabulary.similar(word))
+    similar.pop(word, None)
+    return similar
+
+
+def _word_match(word):
+    """(condition, score) over token rows for one query word: which rows match it, and how well."""
+    condition = _prefix(word)
+    whens = [When(token=word, then=Value(EXACT_SCORE)), When(condition, then=Value(PREFIX_SCORE))]
+    similar = _similar(word)
+    if similar:
+        condition |= Q(token__in=similar, field=EmployeeSearchToken.FIELD_NAME)
+        whens += [
+            When(token=token, field=EmployeeSearchToken.FIELD_NAME, then=Value(similarity))
+            for token, similarity in similar.items()
+        ]
+    return condition, Case(*whens, output_field=FloatField())
+
+
+def _candidates(queryset, word):
+    """Up to MAX_CANDIDATES ids of employees in queryset matching word, best match first."""
+    tokens = EmployeeSearchToken.objects.all()
+    if queryset.query.where:  # The view's other filters
+        tokens = tokens.filter(employee__in=queryset.order_by().values('pk'))
+    # In index order the exact token comes first, then its completions
+    ids = list(
+        tokens.filter(_prefix(word)).order_by('token', 'employee_id')
+        .values_list('employee_id', flat=True)[:MAX_CANDIDATES]
+    )
+    similar = _similar(word)
+    if similar and len(ids) < MAX_CANDIDATES:
+        fuzzy = tokens.filter(token__in=similar, field=EmployeeSearchToken.FIELD_NAME)
+        ids += fuzzy.values_list('employee_id', flat=True)[:MAX_CANDIDATES - len(ids)]
+    return ids
+
+
+def _scored(tokens, words):
+    """tokens matching any of words grouped per employee, with rank: each word's best score,
+    summed, for employees matching all of them."""
+    matches = [_word_match(word) for word in words]
+    scores = {
+        f'word_{index}': Max(Case(When(condition, then=score), output_field=FloatField()))
+        for index, (condition, score) in enumerate(matches)
+    }
+    return (
+        tokens.filter(reduce(operator.or_, (condition for condition, _ in matches)))
+        .values('employee_id').annotate(**scores)
+        .filter(**{f'{name}__isnull': False for name in scores})
+        .annotate(rank=sum((F(name) for name in scores), Value(0.0)))
+    )
+
+
+def _ranking(queryset, words):
+    """Ids of the best MAX_RANKED_RESULTS employees of queryset matching every word."""
+    candidates = set()
+    for word in words:
+        candidates.update(_candidates(queryset, word))
+    if not candidates:
+        return []
+    ranked = _scored(EmployeeSearchToken.objects.filter(employee_id__in=candidates), words)
+    return list(ranked.order_by('-rank', 'employee_id').values_list('employee_id', flat=True)[:MAX_RANKED_RESULTS])
+
+
+def search_employees(queryset, term, ranked=True):
+    """
+    queryset narrowed to the employees matching every word of term. Ranked, it holds
+    the best MAX_RANKED_RESULTS of them, best first; unranked, every match.
+    """
+    # Only whitespace separates query words, so "anne-marie" or "jo.smith@ex" still prefix-match whole tokens
+    words = term.lower().split()
+    if not words:
+        return queryset
+    if not ranked:
+        for word in words:
+            # A semi-join per word on the token index, evaluated with the view's other filters
+            condition, _ = _word_match(word)
+            queryset = queryset.filter(pk__in=EmployeeSearchToken.objects.filter(condition).values('employee_id'))
+        return queryset
+
+    # The rank again, per listed employee over its own token rows: the same SQL however many results
+    rank = _scored(EmployeeSearchToken.objects.filter(employee=OuterRef('pk')), words).values('rank')
+    # An expression rather than a field name, which keyset pagination rejects with a clear message
+    return (
+        queryset.filter(pk__in=_ranking(queryset, words))
+        .annotate(search_rank=Subquery(rank, output_field=FloatField()))
+        .order_by(F('search_rank').desc(), 'pk')
+    )
+
+
+class EmployeeSearchFilter(BaseFilterBackend):
+    """Drop-in replacement for SearchFilter on employees, backed by the token index."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        # Ranked order unless the client asked for an explicit ordering
+        return search_employees(queryset, term, ranked=not request.query_params.get('ordering'))
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Prefix/fuzzy search on name, email and phone number',
+            'schema': {'type': 'string'},
+        }]
@@ -1,21 +1,72 @@
 from rest_framework import serializers
-from .models import Department, Position, Employee
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework.validators import UniqueValidator
+from .models import Department, Position, Employee, ExportJob
+from .refdata import CachedPrimaryKeyRelatedField, departments, positions
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .authentication import add_claims, check_token_version, remember_token_pair, reusable_token_pair
+from core.metrics import instrument
 
-class DepartmentSerializer(serializers.ModelSerializer):
+
+class TimedListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        with instrument('serialize'):
+            return super().to_representation(data)
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """Reports its serialization time in the request metrics (Server-Timing: serialize)."""
+
+    def to_representation(self, instance):
+        if self.parent is not None:  # Timed once by the enclosing list serializer
+            return super().to_representation(instance)
+        with instrument('serialize'):
+            return super().to_representation(instance)
+
+class DepartmentSerializer(TimedModelSerializer):
     class Meta:
         model = Department
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
 
-class PositionSerializer(serializers.ModelSerializer):
+class PositionSerializer(TimedModelSerializer):
     class Meta:
         model = Position
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
+
+class EmployeeSerializer(TimedModelSerializer):
+    # Validated against the in-process reference cache, not a query per field
+    department = CachedPrimaryKeyRelatedField(departments)
+    position = CachedPrimaryKeyRelatedField(positions)
 
-class EmployeeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Employee
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
+
+class EmployeeBulkSerializer(EmployeeSerializer):
+    """EmployeeSerializer without the per-row uniqueness queries; bulk.py checks the whole batch at once."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in ('email', 'phone_number'):
+            fields[name].validators = [v for v in fields[name].validators if not isinstance(v, UniqueValidator)]
+        return fields
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'file_format', 'params', 'status', 'rows_written', 'total_rows',
+                  'progress', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        if obj.status == ExportJob.STATUS_DONE:
+            return 1.0
+        if not obj.total_rows:
+            return 0.0
+        return round(obj.rows_written / obj.total_rows, 4)
 
 # ✅ Custom token serializer using email
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -25,10 +76,23 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         # ✅ Map 'email' to 'username' so SimpleJWT can authenticate properly
         attrs['username'] = attrs.get('email')  
-        return super().validate(attrs)
+        # A repeat login from the same client within seconds gets its pair back without hashing
+        request = self.context.get('request')
+        tokens = reusable_token_pair(request, attrs['email'], attrs['password'])
+        if tokens is None:
+            tokens = super().validate(attrs)
+            remember_token_pair(request, attrs['email'], attrs['password'], self.user, tokens)
+        return tokens
 
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
-        token['email'] = user.email  # optional extra info in token
-        return token
\ No newline at end of file
+        # email, is_staff and the token version; read requests are authenticated from these alone
+        return add_claims(token, user)
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses refresh tokens revoked through the user's token version."""
+
+    def validate(self, attrs):
+        check_token_version(self.token_class(attrs['refresh']))
+        return super().validate(attrs)
\ No newline at end of file
@@ -0,0 +1,122 @@
+import threading
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .analytics import SUMMARY_FIELDS, batched_updates, employee_summary_row, record_change, summary_row
+from .authentication import revoke_tokens
+from .models import Department, Employee, Position
+from .refdata import TABLES
+from .search import index_rows
+from .versioning import bump_version
+
+INDEXED_FIELDS = ('first_name', 'last_name', 'email', 'phone_number')
+
+_local = threading.local()
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+def bump_data_version(sender, **kwargs):
+    bump_version(sender)
+    if sender in TABLES:
+        TABLES[sender].invalidate()
+
+
+class EmployeeWrites:
+    """
+    The employees written in one transaction and their summary rows from before it.
+    On commit their summaries, search tokens and data version are brought up to
+    date once, from the rows as committed, so a rolled-back savepoint changes nothing.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.before = {}  # pk -> summary row before the transaction; None for new employees
+
+    def add(self, pk, before):
+        self.before.setdefault(pk, before)
+
+    def registered(self):
+        # Gone from the commit hooks once its transaction was rolled back
+        return any(hook == self.flush for _, hook, _ in connections[self.using].run_on_commit)
+
+    def flush(self):
+        if _pending().get(self.using) is self:
+            del _pending()[self.using]
+        rows = Employee.objects.using(self.using).filter(pk__in=self.before).values_list(
+            'pk', *INDEXED_FIELDS, *SUMMARY_FIELDS,
+        )
+        current = {row[0]: row for row in rows}
+        with transaction.atomic(using=self.using), batched_updates():
+            for pk, before in self.before.items():
+                row = current.get(pk)
+                record_change(before, summary_row(*row[-len(SUMMARY_FIELDS):]) if row else None)
+            # Deleted employees lost their tokens through the FK cascade
+            index_rows(
+                [row[:len(INDEXED_FIELDS) + 1] for row in current.values()],
+                new={pk for pk, before in self.before.items() if before is None},
+            )
+        bump_version(Employee)
+
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = {}  # Database alias -> EmployeeWrites of its open transaction
+    return _local.pending
+
+
+def employee_written(instance, before):
+    """Queue an employee write for its transaction's EmployeeWrites; without a transaction it is applied now."""
+    using = instance._state.db or router.db_for_write(Employee)
+    writes = _pending().get(using)
+    if writes is not None and writes.registered():
+        writes.add(instance.pk, before)
+        return
+    writes = _pending()[using] = EmployeeWrites(using)
+    writes.add(instance.pk, before)
+    transaction.on_commit(writes.flush, using=using)  # Runs at once outside a transaction
+
+
+def _loaded_summary_row(instance):
+    # As read from the database (Employee.from_db) or last saved, if all of it was loaded
+    loaded = getattr(instance, '_loaded_values', {})
+    if all(field in loaded for field in SUMMARY_FIELDS):
+        return summary_row(*(loaded[field] for field in SUMMARY_FIELDS))
+    return None
+
+
+@receiver(pre_save, sender=Employee)
+def remember_summary_row(sender, instance, **kwargs):
+    # The stored values, so the commit can move the employee out of its old summary cells
+    instance._summary_row_before = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._summary_row_before = _loaded_summary_row(instance)
+        if instance._summary_row_before is None:
+            stored = Employee.objects.filter(pk=instance.pk).values_list(*SUMMARY_FIELDS).first()
+            instance._summary_row_before = summary_row(*stored) if stored else None
+
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, created, **kwargs):
+    employee_written(instance, None if created else instance._summary_row_before)
+    instance._loaded_values = {field.attname: getattr(instance, field.attname) for field in sender._meta.concrete_fields}
+
+
+@receiver(post_delete, sender=Employee)
+def employee_deleted(sender, instance, **kwargs):
+    employee_written(instance, _loaded_summary_row(instance) or employee_summary_row(instance))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def revoke_user_tokens(sender, instance, update_fields=None, **kwargs):
+    # Tokens copy email/is_staff and imply is_active, so any account change revokes them.
+    # Logins only touch last_login and are left alone.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    revoke_tokens(instance.pk)
@@ -1,3 +1,1283 @@
-from django.test import TestCase
+"""
+Query budgets for every URL in adminpanel/urls.py and core/urls.py.
 
-# Create your tests here.
+Each case declares the most queries its request may run with cold caches at the
+given page size. A request over budget fails with the offending SQL and the
+project frames that issued each query. QueryScalingTests checks that the counts
+don't grow between 10 and 10k employees, which is how an N+1 shows up.
+
+The other test cases cover behaviour: imports, caching, bulk writes, tokens,
+the async views, connection pooling and replica routing.
+"""
+import base64
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import tempfile
+import traceback
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipIf
+
+import openpyxl
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.utils import IntegrityError, OperationalError
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core import db_router
+from core.db_pool import ConnectionPool, PooledDatabaseMixin
+from core.metrics import RouteStats
+
+from . import export_jobs, refdata, search, views
+from .analytics import rebuild_summaries
+from .async_views import ASYNC_VIEWS
+from .bulk import bulk_delete_employees, bulk_update_employees
+from .exports import EXPORT_FIELDS, EXPORT_HEADERS, employee_export_rows, write_xlsx
+from .models import Department, Employee, ExportJob, Position, SalaryHistogram, WorkforceSummary
+from .renderers import FastJSONRenderer
+from .row_serializers import EmployeeRowSerializer
+from .search import employee_tokens, search_employees, vocabulary
+from .serializers import EmployeeSerializer, MyTokenObtainPairSerializer
+from .versioning import bump_version
+
+try:
+    import clean_employee_data
+except ImportError:  # pandas/NumPy are only needed by the standalone cleaning script
+    clean_employee_data = None
+
+PAGE_SIZE = 50
+
+# One request and the most queries it may run. kwargs/data may be callables taking the test case.
+Budget = namedtuple('Budget', 'name method url_name kwargs data max_queries')
+
+
+def budget(name, method, url_name, max_queries, kwargs=None, data=None):
+    return Budget(name, method, url_name, kwargs, data, max_queries)
+
+
+def _resolve(value, test):
+    return value(test) if callable(value) else value
+
+
+def project_frames(limit=4):
+    """The innermost project frames (outside this file) of the current stack, formatted."""
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename and frame.filename != __file__
+    ]
+    return [f"{os.path.relpath(frame.filename, base)}:{frame.lineno} in {frame.name}" for frame in frames[-limit:]]
+
+
+class QueryBudgetContext(CaptureQueriesContext):
+    """CaptureQueriesContext that also records which project code issued each query."""
+
+    def __init__(self, connection=connection):
+        super().__init__(connection)
+        self.origins = []
+
+    def __enter__(self):
+        super().__enter__()
+        self._wrapper = self.connection.execute_wrapper(self._record_origin)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        return super().__exit__(*exc_info)
+
+    def _record_origin(self, execute, sql, params, many, context):
+        self.origins.append(project_frames())
+        return execute(sql, params, many, context)
+
+    def report(self):
+        lines = []
+        for number, (query, origin) in enumerate(zip(self.captured_queries, self.origins), start=1):
+            lines.append(f"{number}. {query['sql']}")
+            lines.extend(f"     ↳ {frame}" for frame in origin or ['(no project frame)'])
+        return '\n'.join(lines)
+
+
+def reset_process_caches():
+    """Start every request from cold caches, so budgets don't depend on test order."""
+    cache.clear()
+    refdata.departments.invalidate()
+    refdata.positions.invalidate()
+    vocabulary._loaded_at = 0
+
+
+def seed_employees(count):
+    call_command('generate_employees', count, workers=0, departments=5, positions=5, stdout=open(os.devnull, 'w'))
+
+
+def budget_cases():
+    employee = lambda test: {'pk': test.employee.pk}
+    return [
+        # adminpanel/urls.py
+        budget('department_list', 'get', 'department-list-create', 2, data={'page_size': PAGE_SIZE}),
+        budget('department_create', 'post', 'department-list-create', 3, data={'name': 'Budget Dept'}),
+        budget('department_detail', 'get', 'department-detail', 1, kwargs=lambda t: {'pk': t.department.pk}),
+        budget('position_list', 'get', 'position-list-create', 2, data={'page_size': PAGE_SIZE}),
+        budget('position_detail', 'get', 'position-detail', 1, kwargs=lambda t: {'pk': t.position.pk}),
+        budget('employee_list', 'get', 'employee-list-create', 2, data={'page_size': PAGE_SIZE}),
+        budget('employee_list_max_page', 'get', 'employee-list-create', 2, data={'page_size': 500}),
+        budget('employee_list_nested', 'get', 'employee-list-create', 2, data={'nested': 'true', 'page_size': PAGE_SIZE}),
+        budget('employee_list_keyset', 'get', 'employee-list-create', 1,
+               data={'pagination': 'keyset', 'ordering': '-salary', 'page_size': PAGE_SIZE}),
+        budget('employee_list_filtered', 'get', 'employee-list-create', 3,
+               data=lambda t: {'department': t.department.pk, 'ordering': '-date_of_joining', 'page_size': PAGE_SIZE}),
+        budget('employee_search', 'get', 'employee-list-create', 5,
+               data=lambda t: {'search': t.employee.first_name, 'page_size': PAGE_SIZE}),
+        budget('employee_create', 'post', 'employee-list-create', 14, data=lambda t: t.new_employee()),
+        budget('employee_detail', 'get', 'employee-detail', 1, kwargs=employee),
+        budget('employee_update', 'patch', 'employee-detail', 14, kwargs=employee, data={'salary': '12345.00'}),
+        budget('employee_delete', 'delete', 'employee-detail', 11, kwargs=employee),
+        budget('employee_bulk_create', 'post', 'employee-bulk', 15,
+               data=lambda t: [t.new_employee(number) for number in range(PAGE_SIZE)]),
+        budget('employee_export_csv', 'get', 'employee-export-csv', 1),
+        budget('employee_export_excel', 'get', 'employees_export_excel', 1),
+        budget('export_job_create', 'post', 'employee-export-job-create', 3, data={'file_format': 'csv'}),
+        budget('export_job_detail', 'get', 'employee-export-job-detail', 1, kwargs=lambda t: {'pk': t.export_job.pk}),
+        budget('export_job_download', 'get', 'employee-export-job-download', 1,
+               kwargs=lambda t: {'pk': t.export_job.pk}),
+        budget('analytics_salaries', 'get', 'analytics-salaries', 2, data={'group_by': 'department,position'}),
+        budget('analytics_hires', 'get', 'analytics-hires', 1, data={'group_by': 'department'}),
+        # core/urls.py
+        budget('home', 'get', 'home', 4),
+        budget('home_employees', 'get', 'home-employees', 2, data=lambda t: {'after': t.employee.pk + 1}),
+        budget('token_obtain', 'post', 'token_obtain_pair', 1,
+               data={'email': 'budget@example.com', 'username': 'budget@example.com', 'password': 'budget-pass'}),
+        budget('token_refresh', 'post', 'token_refresh', 1, data=lambda t: {'refresh': str(t.refresh)}),
+        budget('metrics', 'get', 'metrics', 2),  # The staff session and its user
+        budget('admin_employee_changelist', 'get', 'admin:adminpanel_employee_changelist', 7),
+    ]
+
+
+class QueryBudgetMixin:
+    """Runs a Budget as a real request (JWT and session auth included) and measures its queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('budget@example.com', 'budget@example.com', 'budget-pass')
+
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_root, ignore_errors=True)
+        self.client = APIClient()
+        self.client.force_login(self.user)  # For the admin
+        self.new_numbers = iter(range(10 ** 6))
+        self.load_fixtures()
+
+    def load_fixtures(self):
+        self.department = Department.objects.order_by('id').first()
+        self.position = Position.objects.order_by('id').first()
+        self.employee = Employee.objects.order_by('id').first()
+        path = os.path.join(self.export_root, 'budget.csv')
+        with open(path, 'w') as file:
+            file.write('id\n')
+        self.export_job = ExportJob.objects.create(
+            file_format=ExportJob.FORMAT_CSV, fingerprint='budget', status=ExportJob.STATUS_DONE, file_path=path,
+            created_by=self.user,
+        )
+
+    def new_employee(self, number=None):
+        number = next(self.new_numbers) if number is None else number
+        return {
+            'first_name': 'Budget', 'last_name': f'Case{number}', 'email': f'budget{number}@example.com',
+            'phone_number': f'55{number:08d}', 'date_of_joining': '2024-01-01', 'salary': '1000.00',
+            'department': self.department.pk, 'position': self.position.pk,
+        }
+
+    def measure(self, case):
+        reset_process_caches()
+        # Issued after the cache is cleared, which resets the token versions
+        self.refresh = MyTokenObtainPairSerializer.get_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        url = reverse(case.url_name, kwargs=_resolve(case.kwargs, self))
+        data = _resolve(case.data, self)
+        # A zero API_CACHE_TIMEOUT keeps the response cache from answering repeat requests
+        with override_settings(API_CACHE_TIMEOUT=0, EXPORT_ROOT=self.export_root), \
+                mock.patch('adminpanel.views.start_export_job'), \
+                QueryBudgetContext() as context, \
+                self.captureOnCommitCallbacks(execute=True):  # Commit hooks are part of the request's cost
+            if case.method == 'get':
+                response = self.client.get(url, data)
+            else:
+                response = getattr(self.client, case.method)(url, data, format='json')
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)  # Streaming bodies query as they are consumed
+        self.assertLess(response.status_code, 400, f"{case.name}: {response.status_code} {getattr(response, 'data', '')}")
+        return context
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seed_employees(10)
+
+    def test_query_budgets(self):
+        for case in budget_cases():
+            with self.subTest(case.name):
+                context = self.measure(case)
+                if len(context) > case.max_queries:
+                    self.fail(
+                        f"{case.name} ({case.method.upper()} {case.url_name}) ran {len(context)} queries, "
+                        f"budget is {case.max_queries}:\n{context.report()}"
+                    )
+
+
+class QueryScalingTests(QueryBudgetMixin, TestCase):
+    """Read endpoints must run the same number of queries for 10 and 10,000 employees."""
+
+    def read_cases(self):
+        return [case for case in budget_cases() if case.method == 'get']
+
+    def test_query_counts_flat_as_data_grows(self):
+        seed_employees(10)
+        self.load_fixtures()
+        small = {case.name: len(self.measure(case)) for case in self.read_cases()}
+
+        seed_employees(10000 - 10)
+        self.load_fixtures()
+        for case in self.read_cases():
+            with self.subTest(case.name):
+                context = self.measure(case)
+                if len(context) != small[case.name]:
+                    self.fail(
+                        f"{case.name} ran {small[case.name]} queries with 10 employees but {len(context)} "
+                        f"with 10,000:\n{context.report()}"
+                    )
+
+
+class EmployeeRowSerializerTests(TestCase):
+    """The list endpoint's field plan must render exactly what EmployeeSerializer does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_employees(20)
+        Employee.objects.filter(pk=Employee.objects.order_by('id').first().pk).update(salary=5, date_of_birth=None)
+
+    def test_matches_model_serializer(self):
+        employees = Employee.objects.order_by('id')
+        expected = JSONRenderer().render(EmployeeSerializer(employees, many=True).data)
+        serializer = EmployeeRowSerializer()
+        self.assertEqual(FastJSONRenderer().render(serializer.to_representation(serializer.values(employees))), expected)
+
+    def test_nested(self):
+        serializer = EmployeeRowSerializer(nested=True)
+        employee = Employee.objects.select_related('department', 'position').order_by('id').first()
+        row = serializer.to_representation(serializer.values(Employee.objects.filter(pk=employee.pk)))[0]
+        self.assertEqual(row['department'], {'id': employee.department_id, 'name': employee.department.name})
+        self.assertEqual(row['position'], {'id': employee.position_id, 'title': employee.position.title})
+
+
+class TokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tokens@example.com', 'tokens@example.com', 'tokens-pass')
+        cls.department = Department.objects.create(name='Tokens')
+
+    def setUp(self):
+        cache.clear()
+        self.refresh = MyTokenObtainPairSerializer.get_token(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def test_reads_skip_the_user_query(self):
+        with self.assertNumQueries(1):  # The department itself
+            self.assertEqual(self.client.get(reverse('department-detail', kwargs={'pk': self.department.pk})).status_code, 200)
+
+    def test_account_changes_revoke_tokens(self):
+        self.user.first_name = 'Changed'
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('department-list-create')).status_code, 401)
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_logins_keep_tokens(self):
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(reverse('department-list-create')).status_code, 200)
+
+    def login(self, **extra):
+        body = {'email': 'tokens@example.com', 'username': 'tokens@example.com', 'password': 'tokens-pass'}
+        return APIClient().post(reverse('token_obtain_pair'), body, format='json', **extra)
+
+    @override_settings(TOKEN_REUSE_KEY='test-token-reuse-key')
+    def test_repeat_login_reuses_pair(self):
+        first = self.login()
+        with self.assertNumQueries(0):
+            second = self.login()
+        self.assertEqual(second.json(), first.json())
+        self.assertNotEqual(self.login(HTTP_USER_AGENT='other client').json(), first.json())
+
+    @override_settings(TOKEN_REUSE_KEY='')
+    def test_no_reuse_without_its_key(self):
+        first = self.login()
+        with self.assertNumQueries(1):  # The user, and the password hashed again
+            second = self.login()
+        self.assertNotEqual(second.json(), first.json())
+
+    def test_logins_throttled_per_email(self):
+        for _ in range(10):
+            self.assertEqual(self.login().status_code, 200)
+        response = self.login(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_refreshes_throttled_apart_from_logins(self):
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'token_client': '2/min', 'token_refresh': '3/min'}
+        refresh = lambda: APIClient().post(reverse('token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        with mock.patch('rest_framework.throttling.SimpleRateThrottle.THROTTLE_RATES', rates):
+            for _ in range(3):
+                self.assertEqual(refresh().status_code, 200)
+            self.assertEqual(refresh().status_code, 429)
+            self.assertEqual(self.login().status_code, 200)  # Refreshing used none of the login budget
+            self.assertEqual(self.login().status_code, 200)
+            self.assertEqual(self.login().status_code, 429)
+
+
+@override_settings(API_CACHE_TIMEOUT=0)
+class AsyncReadViewTests(TestCase):
+    """The ASGI read views in async_views.py must answer exactly as the sync DRF views do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('async@example.com', 'async@example.com', 'async-pass')
+        seed_employees(15)
+
+    def setUp(self):
+        cache.clear()
+        self.authorization = f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}'
+
+    def responses(self, view_class, path, **kwargs):
+        sync_response = view_class.as_view()(APIRequestFactory().get(path, HTTP_AUTHORIZATION=self.authorization), **kwargs)
+        request = AsyncRequestFactory().get(path, headers={'Authorization': self.authorization})
+        async_response = async_to_sync(ASYNC_VIEWS[view_class].as_view())(request, **kwargs)
+        return sync_response, async_response
+
+    def content(self, response):
+        if response.streaming and response.is_async:
+            async def consume():
+                return b''.join([chunk async for chunk in response.streaming_content])
+            return async_to_sync(consume)()
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.render().content if hasattr(response, 'render') else response.content
+
+    def test_matches_sync_views(self):
+        employee = Employee.objects.order_by('id').first()
+        department = employee.department_id
+        cases = [
+            (views.EmployeeListCreateView, '/api/employees/?page_size=5&ordering=-salary', {}),
+            (views.EmployeeListCreateView, '/api/employees/?page_size=5&page=2&nested=true', {}),
+            (views.EmployeeListCreateView, '/api/employees/?pagination=keyset&page_size=5&with_count=true', {}),
+            (views.EmployeeListCreateView, f'/api/employees/?department={department}&search={employee.first_name}', {}),
+            (views.EmployeeListCreateView, '/api/employees/?department=0', {}),
+            (views.EmployeeListCreateView, '/api/employees/?page=99', {}),
+            (views.EmployeeRetrieveUpdateDestroyView, f'/api/employees/{employee.pk}/', {'pk': employee.pk}),
+            (views.EmployeeRetrieveUpdateDestroyView, '/api/employees/0/', {'pk': 0}),
+            (views.DepartmentListCreateView, '/api/departments/', {}),
+            (views.PositionRetrieveUpdateDestroyView, f'/api/positions/{employee.position_id}/', {'pk': employee.position_id}),
+            (views.EmployeeExportCSVView, f'/api/employees/export/csv/?department={department}', {}),
+        ]
+        for view_class, path, kwargs in cases:
+            with self.subTest(path):
+                sync_response, async_response = self.responses(view_class, path, **kwargs)
+                self.assertEqual(async_response.status_code, sync_response.status_code)
+                self.assertEqual(self.content(async_response), self.content(sync_response))
+
+    def test_requires_token(self):
+        request = AsyncRequestFactory().get('/api/employees/')
+        response = async_to_sync(ASYNC_VIEWS[views.EmployeeListCreateView].as_view())(request)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+
+class ConnectionPoolTests(TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool('test', max_size=2, timeout=0.05, check_idle=0)
+
+    def connect(self):
+        return sqlite3.connect(':memory:', check_same_thread=False)
+
+    def test_reuses_released_connections(self):
+        first = self.pool.acquire(self.connect)
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(self.connect), first)
+        self.assertEqual(self.pool.stats()['opened'], 1)
+
+    def test_waits_then_times_out_when_exhausted(self):
+        self.pool.acquire(self.connect)
+        self.pool.acquire(self.connect)
+        with self.assertRaises(OperationalError):
+            self.pool.acquire(self.connect)
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+
+    def test_replaces_broken_and_unclean_connections(self):
+        broken = self.pool.acquire(self.connect)
+        self.pool.release(broken)
+        broken.close()
+        replacement = self.pool.acquire(self.connect)
+        self.assertIsNot(replacement, broken)
+        self.pool.release(replacement, reusable=False)  # e.g. closed inside a transaction
+        stats = self.pool.stats()
+        self.assertEqual((stats['size'], stats['opened'], stats['discarded']), (0, 2, 2))
+
+    def close_wrapper(self, usable=True, **state):
+        # PooledDatabaseMixin._close() on a DatabaseWrapper in the given state; True if it was pooled again
+        pool = ConnectionPool('test', max_size=1, timeout=0.05, check_idle=0)
+        raw = pool.acquire(self.connect)
+        state = {'autocommit': True, 'in_atomic_block': False, 'errors_occurred': False, **state}
+        wrapper = SimpleNamespace(connection=raw, is_usable=lambda: usable, **state)
+        with mock.patch('core.db_pool.get_pool', return_value=pool):
+            PooledDatabaseMixin._close(wrapper)
+        return pool.stats()['idle'] == 1
+
+    def test_closing_keeps_only_clean_connections(self):
+        self.assertTrue(self.close_wrapper())
+        self.assertFalse(self.close_wrapper(autocommit=False))
+        self.assertFalse(self.close_wrapper(in_atomic_block=True))
+        self.assertTrue(self.close_wrapper(errors_occurred=True))  # Still answers, as Django would keep it
+        self.assertFalse(self.close_wrapper(errors_occurred=True, usable=False))
+
+
+@override_settings(REPLICA_DATABASES=['replica_1'])
+class ReplicaRoutingTests(TestCase):
+    """replica_1 is an empty database here, so what a response contains shows which database served it."""
+    databases = {'default', 'replica_1'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('replica@example.com', 'replica@example.com', 'replica-pass')
+        department = Department.objects.create(name='Primary')
+        position = Position.objects.create(title='Primary')
+        Employee.objects.create(
+            first_name='Pri', last_name='Mary', email='primary@example.com', phone_number='5550000000',
+            date_of_joining='2024-01-01', salary='1000.00', department=department, position=position,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = self.api_client()
+
+    def api_client(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}')
+        return client
+
+    def departments(self, client):
+        return [row['name'] for row in client.get(reverse('department-list-create')).json()['results']]
+
+    def exported_rows(self, client):
+        return b''.join(client.get(reverse('employee-export-csv')).streaming_content).count(b'\n') - 1
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.departments(self.client), [])
+        self.assertEqual(self.exported_rows(self.client), 0)
+
+    def test_writes_keep_reads_on_primary(self):
+        response = self.client.post(reverse('department-list-create'), {'name': 'Written'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        # The writer stays on the primary; everyone reads recently written models from it
+        self.assertEqual(self.exported_rows(self.client), 1)
+        self.assertEqual(self.departments(self.api_client()), ['Primary', 'Written'])
+        self.assertEqual(self.exported_rows(self.api_client()), 0)
+
+    def test_new_tokens_read_from_primary(self):
+        body = {'email': 'replica@example.com', 'username': 'replica@example.com', 'password': 'replica-pass'}
+        tokens = APIClient().post(reverse('token_obtain_pair'), body, format='json').json()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        # Exports aren't response-cached, so they show which database each client reads
+        self.assertEqual(self.exported_rows(client), 1)
+        self.assertEqual(self.exported_rows(self.api_client()), 0)  # Other clients aren't affected
+
+    def test_raw_writes_pin_the_request(self):
+        db_router.install_write_tracker(connections['default'])
+        self.addCleanup(connections['default'].execute_wrappers.remove, db_router.note_writes)
+        state = db_router.RoutingState(replica_allowed=True)
+        state.replica = 'replica_1'
+        with db_router.routing(state), connections['default'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(state.read_alias(), 'replica_1')
+            cursor.execute('UPDATE adminpanel_department SET name = name WHERE id = 0')
+            self.assertIsNone(state.read_alias())
+            self.assertTrue(state.wrote)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        with mock.patch.dict(db_router._unreachable_until), \
+                mock.patch.object(connections['replica_1'], 'ensure_connection', side_effect=OperationalError):
+            self.assertEqual(self.departments(self.client), ['Primary'])
+            self.assertEqual(self.departments(self.client), ['Primary'])
+            self.assertEqual(connections['replica_1'].ensure_connection.call_count, 1)  # Skipped while unreachable
+
+
+class ImportEmployeesTests(TestCase):
+    FIELDS = ['first_name', 'last_name', 'email', 'phone_number', 'date_of_birth', 'date_of_joining', 'salary',
+              'department', 'position']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def row(self, number, **values):
+        return {
+            'first_name': 'Import', 'last_name': f'Row{number}', 'email': f'import{number}@example.com',
+            'phone_number': f'77{number:08d}', 'date_of_birth': '1990-01-01', 'date_of_joining': '2024-01-01',
+            'salary': '1000.00', 'department': 'Imports', 'position': 'Importer', **values,
+        }
+
+    def run_import(self, rows, **options):
+        path = os.path.join(self.directory, 'employees.csv')
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, self.FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        stdout = io.StringIO()
+        call_command('import_employees', path, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_upsert_updates_changed_rows_only(self):
+        self.run_import([self.row(1), self.row(2)])
+        unchanged_at = Employee.objects.get(email='import1@example.com').updated_at
+
+        output = self.run_import([self.row(1), self.row(2, salary='2500'), self.row(3)], mode='upsert')
+        self.assertIn('Total: 1 employees imported', output)
+        self.assertIn('Updated: 1, unchanged: 1', output)
+        self.assertEqual(Employee.objects.get(email='import2@example.com').salary, Decimal('2500.00'))
+        self.assertEqual(Employee.objects.get(email='import1@example.com').updated_at, unchanged_at)
+        self.assertEqual(Employee.objects.count(), 3)
+
+    def test_rejects_counted_per_reason(self):
+        self.run_import([self.row(1)])
+        reject_file = os.path.join(self.directory, 'rejects.jsonl')
+        output = self.run_import([
+            self.row(1),  # Already imported
+            self.row(2),
+            self.row(3, email='import2@example.com'),
+            self.row(4, phone_number='7700000002'),
+            self.row(5, last_name=''),
+            self.row(6, date_of_joining='2024-13-01'),
+            self.row(7, salary='lots'),
+        ], reject_file=reject_file)
+
+        self.assertIn('Total: 1 employees imported', output)
+        self.assertIn('Total Skipped Rows: 6', output)
+        with open(reject_file) as file:
+            reasons = {entry['line_number']: entry['reason'] for entry in map(json.loads, file)}
+        self.assertEqual(reasons, {
+            2: 'duplicate_email_db', 4: 'duplicate_email_file', 5: 'duplicate_phone_file',
+            6: 'missing_fields', 7: 'invalid_date', 8: 'invalid_salary',
+        })
+
+    def test_rejects_values_the_columns_cannot_hold(self):
+        reject_file = os.path.join(self.directory, 'rejects.jsonl')
+        output = self.run_import([
+            self.row(1),
+            self.row(2, salary='Infinity'),
+            self.row(3, salary='NaN'),
+            self.row(4, salary='1e20'),
+            self.row(5, email=f"{'x' * 250}@example.com"),
+        ], reject_file=reject_file)
+
+        self.assertIn('Total: 1 employees imported', output)
+        with open(reject_file) as file:
+            reasons = {entry['line_number']: entry['reason'] for entry in map(json.loads, file)}
+        self.assertEqual(reasons, {3: 'invalid_salary', 4: 'invalid_salary', 5: 'invalid_salary', 6: 'invalid_field'})
+
+    def test_case_variant_emails_are_duplicates(self):
+        self.run_import([self.row(1)])
+        reject_file = os.path.join(self.directory, 'rejects.jsonl')
+        output = self.run_import([self.row(2, email='IMPORT1@example.com'), self.row(3)], reject_file=reject_file)
+        self.assertIn('Total: 1 employees imported', output)
+        with open(reject_file) as file:
+            self.assertEqual([entry['reason'] for entry in map(json.loads, file)], ['duplicate_email_db'])
+
+        output = self.run_import([self.row(1, email='Import1@Example.com', salary='3000')], mode='upsert')
+        self.assertIn('Updated: 1, unchanged: 0', output)
+        self.assertEqual(Employee.objects.get(email='import1@example.com').salary, Decimal('3000.00'))
+
+
+class KeysetCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cursor@example.com', 'cursor@example.com', 'cursor-pass')
+        seed_employees(5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}')
+
+    def page(self, **params):
+        return self.client.get(reverse('employee-list-create'), {'pagination': 'keyset', 'page_size': 2, **params})
+
+    def test_pages_follow_cursor(self):
+        response = self.page(ordering='-date_of_joining')
+        ids = [row['id'] for row in response.json()['results']]
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'])
+            ids.extend(row['id'] for row in response.json()['results'])
+        expected = Employee.objects.order_by('-date_of_joining', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_malformed_cursor_is_rejected(self):
+        for values, ordering in (
+            (['abc'], 'id'), ([{'a': 1}], 'id'), ([None], 'id'), (['not a date', 1], 'date_of_joining'), ('x', 'id'),
+        ):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+            with self.subTest(values):
+                response = self.page(cursor=cursor, ordering=ordering)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'cursor': ['Invalid cursor.']})
+
+
+class IndexedOrderingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('ordering@example.com', 'ordering@example.com', 'ordering-pass')
+        seed_employees(5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}')
+
+    def page(self, **params):
+        return self.client.get(reverse('employee-list-create'), params)
+
+    def test_ties_are_broken_by_id(self):
+        Employee.objects.update(last_name='Same')
+        ids = sorted(Employee.objects.values_list('id', flat=True))
+        for ordering, expected in (('last_name', ids), ('-last_name', ids[::-1])):
+            with self.subTest(ordering):
+                response = self.page(ordering=ordering)
+                self.assertEqual([row['id'] for row in response.json()['results']], expected)
+
+    def test_rejects_orderings_no_index_serves_with_a_filter(self):
+        employee = Employee.objects.first()
+        for params in (
+            {'salary__gte': '1000', 'ordering': 'last_name'},
+            {'salary__gte': '1000', 'ordering': '-date_of_joining'},
+            {'department': employee.department_id, 'ordering': 'last_name'},
+        ):
+            with self.subTest(params):
+                response = self.page(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('is not supported with the', response.json()['ordering'][0])
+        for params in ({'salary__gte': '1000', 'ordering': '-salary'}, {'department': employee.department_id, 'ordering': 'salary'}):
+            with self.subTest(params):
+                self.assertEqual(self.page(**params).status_code, 200)
+
+
+class WriteXlsxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_employees(5)
+
+    def test_writes_headers_and_native_cells(self):
+        output = io.BytesIO()
+        write_xlsx(employee_export_rows(Employee.objects.order_by('id')), output)
+        output.seek(0)
+        sheet = openpyxl.load_workbook(output)['Employees']
+        rows = list(sheet.iter_rows())
+        self.assertEqual([cell.value for cell in rows[0]], EXPORT_HEADERS)
+
+        employees = Employee.objects.order_by('id').values_list(*EXPORT_FIELDS)
+        self.assertEqual(len(rows) - 1, len(employees))
+        column = {field: index for index, field in enumerate(EXPORT_FIELDS)}
+        for row, employee in zip(rows[1:], employees):
+            values = [cell.value for cell in row]
+            self.assertEqual(values[column['id']], employee[column['id']])
+            for field in ('date_of_birth', 'date_of_joining'):
+                expected = employee[column[field]]
+                # Dates come back as datetimes at midnight; a missing birth date stays empty
+                self.assertEqual(values[column[field]], expected and datetime.combine(expected, datetime.min.time()))
+                self.assertTrue(expected is None or row[column[field]].is_date)
+            salary = row[column['salary']]
+            self.assertIsInstance(salary.value, (int, float))
+            self.assertEqual(Decimal(str(salary.value)), employee[column['salary']])
+            self.assertEqual(salary.number_format, '#,##0.00')
+            self.assertEqual(values[column['department__name']], employee[column['department__name']])
+
+
+class ExportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('export@example.com', 'export@example.com', 'export-pass')
+        cls.other_user = User.objects.create_user('other@example.com', 'other@example.com', 'other-pass')
+        seed_employees(5)
+
+    def setUp(self):
+        cache.clear()
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root, ignore_errors=True)
+        settings_override = override_settings(EXPORT_ROOT=export_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = self.api_client(self.user)
+
+    def api_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {MyTokenObtainPairSerializer.get_token(user).access_token}')
+        return client
+
+    def create(self, client=None, file_format='csv'):
+        # The job runs inline; closing the connection would end the test's transaction
+        with mock.patch.object(export_jobs, 'get_executor') as executor, mock.patch.object(export_jobs, 'connection'):
+            executor.return_value.submit.side_effect = lambda function, *args: function(*args)
+            return (client or self.client).post(reverse('employee-export-job-create'), {'file_format': file_format}, format='json')
+
+    def download(self, job_id, **headers):
+        response = self.client.get(reverse('employee-export-job-download', kwargs={'pk': job_id}), headers=headers)
+        return response, b''.join(response.streaming_content) if response.status_code < 300 else b''
+
+    def test_create_poll_and_download(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], ExportJob.STATUS_PENDING)
+
+        job = self.client.get(reverse('employee-export-job-detail', kwargs={'pk': response.json()['id']})).json()
+        self.assertEqual((job['status'], job['rows_written'], job['progress']), (ExportJob.STATUS_DONE, 5, 1.0))
+
+        response, content = self.download(job['id'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(sorted(int(row[0]) for row in rows[1:]), sorted(Employee.objects.values_list('id', flat=True)))
+
+    def test_range_download(self):
+        job_id = self.create().json()['id']
+        _, content = self.download(job_id)
+        size = len(content)
+        for range_header, start, end in (('bytes=5-9', 5, 9), (f'bytes={size - 3}-', size - 3, size - 1)):
+            with self.subTest(range_header):
+                response, body = self.download(job_id, Range=range_header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(body, content[start:end + 1])
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+        response, _ = self.download(job_id, Range=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+    def test_finished_jobs_are_reused_by_the_same_user_only(self):
+        first = self.create().json()
+        again = self.create()
+        self.assertEqual((again.status_code, again.json()['id']), (200, first['id']))
+        other_client = self.api_client(self.other_user)
+        other = self.create(other_client).json()
+        self.assertNotEqual(other['id'], first['id'])
+        # Nor can another user read someone else's job
+        response = other_client.get(reverse('employee-export-job-detail', kwargs={'pk': first['id']}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_orphaned_jobs_are_failed(self):
+        fingerprint = export_jobs.export_fingerprint('csv', {})
+        stale = timezone.now() - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT + 1)
+        job = lambda **fields: ExportJob.objects.create(
+            file_format='csv', fingerprint=fingerprint, created_by=self.user, status=ExportJob.STATUS_RUNNING, **fields,
+        )
+        in_flight = job(worker=export_jobs.current_worker())
+        self.assertEqual(self.create().json()['id'], str(in_flight.pk))
+
+        in_flight.delete()
+        silent = job(worker='elsewhere:1', heartbeat_at=stale)
+        response = self.client.get(reverse('employee-export-job-detail', kwargs={'pk': silent.pk}))
+        self.assertEqual(response.json()['status'], ExportJob.STATUS_FAILED)
+
+        process = subprocess.Popen(['true'])
+        process.wait()  # Its pid now belongs to no process
+        gone = job(worker=f'{socket.gethostname()}:{process.pid}')
+        self.assertNotEqual(self.create().json()['id'], str(gone.pk))
+        gone.refresh_from_db()
+        self.assertEqual(gone.status, ExportJob.STATUS_FAILED)
+
+
+@skipIf(clean_employee_data is None, 'pandas is not installed')
+class CleanEmployeeDataTests(TestCase):
+    NAMES = ['Ann Lee', 'Ann Lee', 'Ann Lee1', 'José Núñez', 'Cher']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.input_file = os.path.join(self.directory, 'raw.csv')
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Employee_ID', 'Employee_Name', 'Department', 'Position', 'Salary', 'Joining_Date'])
+            for number, name in enumerate(self.NAMES, start=1):
+                writer.writerow([number, name, 'HR', 'Analyst', '50000.00', '2020-01-0%d' % number])
+
+    def clean(self, name, *options):
+        output_file = os.path.join(self.directory, name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            clean_employee_data.main([self.input_file, output_file, '--chunksize', '2', *options])
+        with open(output_file, newline='', encoding='utf-8') as file:
+            return file.read()
+
+    def test_cleans_into_the_import_layout(self):
+        output = self.clean('clean.csv', '--reference-date', '2026-01-01')
+        rows = list(csv.DictReader(io.StringIO(output)))
+        self.assertEqual(list(rows[0]), clean_employee_data.OUTPUT_COLUMNS)
+        # Suffixes carry across chunks and never produce another row's address
+        self.assertEqual([row['email'] for row in rows], [
+            'ann.lee@example.com', 'ann.lee1@example.com', 'ann.lee2@example.com',
+            'jose.nunez@example.com', 'cher@example.com',
+        ])
+        phones = [row['phone_number'] for row in rows]
+        self.assertEqual(len(set(phones)), len(phones))
+        self.assertTrue(all(len(phone) == 10 and phone.isdigit() for phone in phones))
+        for row in rows:
+            self.assertTrue('1966-01-01' <= row['date_of_birth'] <= '2004-01-01', row['date_of_birth'])
+
+    def test_output_depends_only_on_the_arguments(self):
+        first = self.clean('first.csv', '--reference-date', '2026-01-01')
+        self.assertEqual(self.clean('second.csv', '--reference-date', '2026-01-01'), first)
+        self.assertNotEqual(self.clean('later.csv', '--reference-date', '2030-01-01'), first)
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            self.clean('missing.csv')
+
+
+class HomeEmployeesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_employees(views.HOME_PAGE_SIZE + 10)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_follow_next(self):
+        response = self.client.get(reverse('home'))
+        ids = [employee['id'] for employee in response.context['employees']]
+        url = f"{reverse('home-employees')}?after={response.context['next_after']}"
+        while url:
+            page = self.client.get(url).json()
+            self.assertEqual(set(page), {'count', 'next', 'results'})
+            self.assertEqual(page['count'], Employee.objects.count())
+            ids.extend(employee['id'] for employee in page['results'])
+            url = page['next']
+        self.assertEqual(ids, list(Employee.objects.order_by('-id').values_list('id', flat=True)))
+        self.assertEqual(len(page['results']), 10)
+
+    def test_rejects_a_missing_after(self):
+        response = self.client.get(reverse('home-employees'))
+        self.assertEqual(response.status_code, 400)
+
+
+class EmployeeSearchTests(TestCase):
+    """
+    More matching token rows than the old per-word cap of 2000 read: unranked searches
+    must still find every match, ranked ones the best MAX_RANKED_RESULTS of them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('search@example.com', 'search@example.com', 'search-pass')
+        seed_employees(2500)
+
+    def setUp(self):
+        reset_process_caches()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}')
+
+    def prefix_matches(self, term, **filters):
+        # Employees with a token starting with every word of term, straight from employee_tokens()
+        words = term.lower().split()
+        employees = Employee.objects.filter(**filters).values_list('id', 'first_name', 'last_name', 'email', 'phone_number')
+        return {
+            employee_id for employee_id, *values in employees
+            if all(any(token.startswith(word) for token, _ in employee_tokens(*values)) for word in words)
+        }
+
+    def search(self, **params):
+        response = self.client.get(reverse('employee-list-create'), {'page_size': 500, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_finds_every_prefix_match(self):
+        employee = Employee.objects.order_by('id').first()
+        for term in ('a', 'j', f'{employee.first_name[:1]} {employee.last_name[:2]}'):
+            with self.subTest(term):
+                expected = self.prefix_matches(term)
+                self.assertGreater(len(expected), 0)
+                found = search_employees(Employee.objects.all(), term, ranked=False).values_list('id', flat=True)
+                self.assertEqual(set(found), expected)
+                self.assertEqual(self.search(search=term, ordering='id')['count'], len(expected))
+
+    def test_ranked_search_keeps_best_matches(self):
+        expected = self.prefix_matches('a')
+        self.assertEqual(self.search(search='a')['count'], min(len(expected), search.MAX_RANKED_RESULTS))
+        employee = Employee.objects.order_by('-id').first()
+        last_name = employee.last_name.lower()
+        exact = {
+            employee_id for employee_id, *values in Employee.objects.values_list('id', 'first_name', 'last_name', 'email', 'phone_number')
+            if any(token == last_name for token, _ in employee_tokens(*values))
+        }
+        with mock.patch.object(search, 'MAX_RANKED_RESULTS', 5), mock.patch.object(search, 'MAX_CANDIDATES', 20):
+            # Exact tokens are read first, so the lowest ids among them still win
+            ranked = search_employees(Employee.objects.all(), last_name)
+            self.assertEqual(list(ranked.values_list('id', flat=True)), sorted(exact)[:5])
+            # A common word over the candidate cap, with a rare one under it
+            term = f'{employee.first_name} {employee.email}'
+            ranked = search_employees(Employee.objects.all(), term)
+            self.assertEqual(set(ranked.values_list('id', flat=True)), self.prefix_matches(term))
+            self.assertGreater(len(self.prefix_matches(employee.first_name)), 20)
+
+    def test_other_filters_apply_to_matches(self):
+        employee = Employee.objects.order_by('id').first()
+        data = self.search(search='a', department=employee.department_id, ordering='id')
+        expected = self.prefix_matches('a', department=employee.department_id)
+        self.assertEqual(data['count'], len(expected))
+        self.assertEqual([row['id'] for row in data['results']], sorted(expected)[:500])
+
+    def test_exact_matches_rank_first(self):
+        employee = Employee.objects.order_by('id').first()
+        last_name = employee.last_name.lower()
+        employees = Employee.objects.values_list('id', 'first_name', 'last_name', 'email', 'phone_number')
+        exact = {
+            employee_id for employee_id, *values in employees
+            if any(token == last_name for token, _ in employee_tokens(*values))
+        }
+        results = [row['id'] for row in self.search(search=last_name)['results']]
+        self.assertEqual(set(results[:len(exact)]), exact)
+        self.assertGreaterEqual(len(results), len(exact))
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached@example.com', 'cached@example.com', 'cached-pass')
+        cls.department = Department.objects.create(name='Cached')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}')
+        self.url = reverse('department-list-create')
+
+    def names(self, response):
+        return [row['name'] for row in response.json()['results']]
+
+    def test_repeat_reads_come_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_writes_invalidate_cached_responses(self):
+        before = self.client.get(self.url)
+        response = self.client.patch(
+            reverse('department-detail', kwargs={'pk': self.department.pk}), {'name': 'Renamed'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+        after = self.client.get(self.url)
+        self.assertEqual(self.names(after), ['Renamed'])
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=before['ETag']).status_code, 200)
+
+    def test_related_writes_invalidate_nested_employees(self):
+        Employee.objects.create(
+            first_name='Cache', last_name='Nested', email='nested@example.com', phone_number='5550000001',
+            date_of_joining='2024-01-01', salary='1000.00', department=self.department,
+            position=Position.objects.create(title='Cached'),
+        )
+        url = reverse('employee-list-create')
+        self.assertEqual(self.client.get(url, {'nested': 'true'}).json()['results'][0]['department']['name'], 'Cached')
+        self.client.patch(
+            reverse('department-detail', kwargs={'pk': self.department.pk}), {'name': 'Renamed'}, format='json',
+        )
+        self.assertEqual(self.client.get(url, {'nested': 'true'}).json()['results'][0]['department']['name'], 'Renamed')
+
+
+class ReferenceTableTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Reference')
+
+    def setUp(self):
+        reset_process_caches()
+
+    def test_lookups_served_from_memory(self):
+        refdata.departments.ids_by_name()
+        with self.assertNumQueries(0):
+            self.assertEqual(refdata.departments.get(self.department.pk).name, 'Reference')
+            self.assertEqual(refdata.departments.ids_by_name(), {'Reference': self.department.pk})
+
+    def test_writes_in_this_process_show_at_once(self):
+        refdata.departments.ids_by_name()
+        created = Department.objects.create(name='Created')
+        self.assertEqual(refdata.departments.ids_by_name()['Created'], created.pk)
+
+    def test_other_processes_writes_show_after_version_check(self):
+        refdata.departments.ids_by_name()
+        # Another process: the row changes and the shared version moves, but no local signal fires
+        Department.objects.filter(pk=self.department.pk).update(name='Elsewhere')
+        bump_version(Department)
+        self.assertEqual(refdata.departments.get(self.department.pk).name, 'Reference')  # Within the check interval
+
+        with mock.patch.object(refdata, 'VERSION_CHECK_INTERVAL', 0):
+            self.assertEqual(refdata.departments.get(self.department.pk).name, 'Elsewhere')
+            with self.assertNumQueries(0):  # Version unchanged: no reload
+                self.assertEqual(refdata.departments.ids_by_name(), {'Elsewhere': self.department.pk})
+
+
+class EmployeeBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bulk@example.com', 'bulk@example.com', 'bulk-pass')
+        seed_employees(3)
+        cls.first, cls.second, cls.third = Employee.objects.order_by('id')
+
+    def setUp(self):
+        reset_process_caches()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}')
+        self.url = reverse('employee-bulk')
+
+    def item(self, number, **values):
+        return {
+            'first_name': 'Bulk', 'last_name': f'Item{number}', 'email': f'bulk{number}@example.com',
+            'phone_number': f'66{number:08d}', 'date_of_joining': '2024-01-01', 'salary': '1000.00',
+            'department': self.first.department_id, 'position': self.first.position_id, **values,
+        }
+
+    def test_create_reports_each_failed_item(self):
+        response = self.client.post(self.url, [
+            self.item(1),
+            self.item(2, email=self.first.email),
+            self.item(3, email='bulk1@example.com'),
+            self.item(4, phone_number='6600000001'),
+            self.item(5, first_name=''),
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created'], data['failed']), (1, 4))
+        created = Employee.objects.get(email='bulk1@example.com')
+        self.assertEqual(data['results'], [
+            {'index': 0, 'status': 'created', 'id': created.pk},
+            {'index': 1, 'status': 'error', 'errors': {'email': ['employee with this email already exists.']}},
+            {'index': 2, 'status': 'error', 'errors': {'email': ['employee with this email already exists.']}},
+            {'index': 3, 'status': 'error', 'errors': {'phone_number': ['employee with this phone number already exists.']}},
+            {'index': 4, 'status': 'error', 'errors': {'first_name': ['This field may not be blank.']}},
+        ])
+        self.assertEqual(Employee.objects.count(), 4)  # Only the valid item was written
+
+    def test_case_variant_emails_clash(self):
+        # MySQL's unique index ignores case, so these must fail per item rather than fail the insert
+        response = self.client.post(self.url, [
+            self.item(1),
+            self.item(2, email=self.first.email.upper()),
+            self.item(3, email='BULK1@example.com'),
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['created', 'error', 'error'])
+        self.assertEqual(Employee.objects.count(), 4)
+
+    def test_batch_of_failures_writes_nothing(self):
+        response = self.client.post(self.url, [self.item(1, salary='lots'), self.item(2, department=0)], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['failed'], 2)
+        self.assertEqual(Employee.objects.count(), 3)
+
+    def test_integrity_error_rolls_back_the_batch(self):
+        with mock.patch.object(Employee.objects, 'bulk_create', side_effect=IntegrityError('clash')):
+            response = self.client.post(self.url, [self.item(1), self.item(2)], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [result['errors'] for result in response.json()['results']], [{'non_field_errors': ['clash']}] * 2,
+        )
+        self.assertEqual(Employee.objects.count(), 3)
+
+    def test_update_checks_ids_and_clashes(self):
+        response = self.client.patch(self.url, [
+            {'id': self.first.pk, 'salary': '4321.00'},
+            {'id': self.first.pk, 'salary': '1.00'},
+            {'salary': '1.00'},
+            {'id': 0, 'salary': '1.00'},
+            {'id': self.second.pk, 'email': self.third.email},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'index': 0, 'status': 'updated', 'id': self.first.pk},
+            {'index': 1, 'status': 'error', 'errors': {'id': ['Appears more than once in this batch.']}},
+            {'index': 2, 'status': 'error', 'errors': {'id': ['A valid integer is required.']}},
+            {'index': 3, 'status': 'error', 'errors': {'id': ['Not found.']}},
+            {'index': 4, 'status': 'error', 'errors': {'email': ['employee with this email already exists.']}},
+        ])
+        self.assertEqual(Employee.objects.get(pk=self.first.pk).salary, Decimal('4321.00'))
+        self.assertEqual(Employee.objects.get(pk=self.second.pk).email, self.second.email)
+
+    def test_delete_reports_missing_and_repeated_ids(self):
+        response = self.client.delete(self.url, [self.first.pk, self.first.pk, 0, 'x'], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'index': 0, 'status': 'deleted', 'id': self.first.pk},
+            {'index': 1, 'status': 'error', 'errors': {'id': ['Not found.']}},
+            {'index': 2, 'status': 'error', 'errors': {'id': ['Not found.']}},
+            {'index': 3, 'status': 'error', 'errors': {'id': ['A valid integer is required.']}},
+        ])
+        self.assertEqual(list(Employee.objects.order_by('id').values_list('id', flat=True)), [self.second.pk, self.third.pk])
+
+    def ndjson(self, lines):
+        return self.client.generic('POST', self.url, '\n'.join(lines), content_type='application/x-ndjson')
+
+    def test_ndjson_body(self):
+        response = self.ndjson([json.dumps(self.item(1)), '', json.dumps(self.item(2))])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 2)
+
+        response = self.ndjson([json.dumps(self.item(3)), '{"first_name": '])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', response.json()['detail'])
+        self.assertFalse(Employee.objects.filter(email='bulk3@example.com').exists())
+
+
+class AnalyticsSummaryTests(TestCase):
+    """The incrementally maintained summaries must always equal a rebuild from scratch."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generate_employees', 300, workers=0, departments=3, positions=3, stdout=open(os.devnull, 'w'))
+
+    def summaries(self):
+        return (
+            sorted(WorkforceSummary.objects.values_list(
+                'department_id', 'position_id', 'hire_month', 'headcount', 'salary_sum', 'salary_min', 'salary_max',
+            )),
+            sorted(SalaryHistogram.objects.values_list('department_id', 'position_id', 'bucket', 'headcount')),
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.summaries()
+        rebuild_summaries()
+        self.assertEqual(incremental, self.summaries())
+
+    def test_batched_writes(self):
+        employees = list(Employee.objects.order_by('id')[:40])
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_update_employees([
+                {'id': employee.pk, 'salary': str(employee.salary * 2), 'date_of_joining': '2020-02-02'}
+                for employee in employees[:20]
+            ])
+            bulk_delete_employees([employee.pk for employee in employees[20:]])
+        self.assertMatchesRebuild()
+
+    def test_single_writes(self):
+        employees = list(Employee.objects.order_by('id')[:6])
+        other = Department.objects.exclude(pk=employees[0].department_id).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            employees[0].department = other
+            employees[0].save()
+            employees[1].salary = employees[1].salary * 3  # A new maximum for its cell
+            employees[1].save()
+            employees[2].salary = Decimal('1.00')  # A new minimum
+            employees[2].save()
+            employees[3].delete()
+            low = Employee.objects.order_by('salary').first()  # A cell's minimum leaves it
+            low.delete()
+        self.assertMatchesRebuild()
+
+    def test_writes_applied_once_on_commit(self):
+        employee = Employee.objects.order_by('id').first()
+        with self.captureOnCommitCallbacks() as callbacks:
+            employee.salary = employee.salary * 2
+            employee.save()
+            try:
+                with transaction.atomic():
+                    employee.salary = Decimal('1.00')
+                    employee.save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            employee.refresh_from_db()
+            employee.first_name = 'Committed'
+            employee.save()
+            before = self.summaries()
+        self.assertEqual(len(callbacks), 1)  # One flush for every write in the transaction
+        self.assertEqual(self.summaries(), before)  # Nothing applied before the commit
+
+        callbacks[0]()
+        self.assertMatchesRebuild()  # The rolled-back salary left no trace
+        self.assertEqual(set(search_employees(Employee.objects.all(), 'committed')), {employee})
+
+    def test_emptied_cells_are_removed(self):
+        employee = Employee.objects.order_by('id').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            Employee.objects.filter(
+                department_id=employee.department_id, position_id=employee.position_id,
+            ).exclude(pk=employee.pk).delete()
+            employee.delete()
+        self.assertFalse(WorkforceSummary.objects.filter(
+            department_id=employee.department_id, position_id=employee.position_id,
+        ).exists())
+        self.assertMatchesRebuild()
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff@example.com', 'staff@example.com', 'staff-pass', is_staff=True)
+        cls.user = User.objects.create_user('metrics@example.com', 'metrics@example.com', 'metrics-pass')
+        seed_employees(3)
+
+    def status(self, user=None, **headers):
+        client = APIClient()
+        if user is not None:
+            client.force_login(user)
+        return client.get(reverse('metrics'), headers=headers).status_code
+
+    def test_local_requests_need_credentials(self):
+        # The test client connects from 127.0.0.1, like every request behind a local proxy
+        self.assertEqual(self.status(), 403)
+        self.assertEqual(self.status(self.user), 403)
+        self.assertEqual(self.status(self.staff), 200)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_token(self):
+        self.assertEqual(self.status(**{'X-Metrics-Token': 'scrape-token'}), 200)
+        self.assertEqual(self.status(**{'X-Metrics-Token': 'wrong'}), 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_allowlist_opt_in(self):
+        self.assertEqual(self.status(), 200)
+
+    def test_streamed_bodies_are_measured(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}')
+        with mock.patch('core.middleware.route_stats', RouteStats()) as stats:
+            response = client.get(reverse('employee-export-csv'))
+            self.assertEqual(stats.snapshot(), {})  # Not recorded until the body has been sent
+            body = b''.join(response.streaming_content)
+
+        summary = stats.snapshot()['GET /api/employees/export/csv/']
+        self.assertGreaterEqual(summary['db_queries']['max'], 1)  # The export query runs while streaming
+        self.assertEqual(summary['response_bytes']['max'], len(body))
@@ -0,0 +1,34 @@
+"""
+Rate limits for the token endpoints, counted in the configured cache.
+
+Every /api/token/ call runs the password hasher, so clients that log in again
+instead of refreshing are limited per client address and per email. Refreshes
+are limited per client address on a budget of their own, so a client that
+refreshes often does not lock itself out of logging in (rates in
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']).
+"""
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenClientRateThrottle(SimpleRateThrottle):
+    scope = 'token_client'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class TokenRefreshRateThrottle(TokenClientRateThrottle):
+    scope = 'token_refresh'
+
+
+class TokenEmailRateThrottle(SimpleRateThrottle):
+    scope = 'token_email'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None  # Rejected by the serializer without hashing anything
+        ident = hashlib.md5(email.strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -1,24 +1,46 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     DepartmentListCreateView, DepartmentRetrieveUpdateDestroyView, EmployeeExportExcelView,
     PositionListCreateView, PositionRetrieveUpdateDestroyView,
-    EmployeeListCreateView, EmployeeRetrieveUpdateDestroyView, export_employees_csv
+    EmployeeListCreateView, EmployeeRetrieveUpdateDestroyView, EmployeeBulkView, EmployeeExportCSVView,
+    EmployeeExportJobCreateView, ExportJobDetailView, ExportJobDownloadView,
+    HiresAnalyticsView, SalaryAnalyticsView
 )
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
+from .async_views import ASYNC_VIEWS
+
+
+def api_view(view_class):
+    # Under ASGI (ASYNC_READ_VIEWS, set in core/asgi.py) reads go to the async variant in async_views.py
+    if settings.ASYNC_READ_VIEWS and view_class in ASYNC_VIEWS:
+        return ASYNC_VIEWS[view_class].as_view()
+    return view_class.as_view()
+
 
 urlpatterns = [
     # Department Endpoints
-    path('departments/', DepartmentListCreateView.as_view(), name='department-list-create'),
-    path('departments/<int:pk>/', DepartmentRetrieveUpdateDestroyView.as_view(), name='department-detail'),
+    path('departments/', api_view(DepartmentListCreateView), name='department-list-create'),
+    path('departments/<int:pk>/', api_view(DepartmentRetrieveUpdateDestroyView), name='department-detail'),
 
     # Position Endpoints
-    path('positions/', PositionListCreateView.as_view(), name='position-list-create'),
-    path('positions/<int:pk>/', PositionRetrieveUpdateDestroyView.as_view(), name='position-detail'),
+    path('positions/', api_view(PositionListCreateView), name='position-list-create'),
+    path('positions/<int:pk>/', api_view(PositionRetrieveUpdateDestroyView), name='position-detail'),
 
     # Employee Endpoints
-    path('employees/', EmployeeListCreateView.as_view(), name='employee-list-create'),
-    path('employees/<int:pk>/', EmployeeRetrieveUpdateDestroyView.as_view(), name='employee-detail'),
-    path('employees/export/csv/', export_employees_csv, name='employee-export-csv'),
+    path('employees/', api_view(EmployeeListCreateView), name='employee-list-create'),
+    path('employees/<int:pk>/', api_view(EmployeeRetrieveUpdateDestroyView), name='employee-detail'),
+    path('employees/bulk/', EmployeeBulkView.as_view(), name='employee-bulk'),
+    path('employees/export/csv/', api_view(EmployeeExportCSVView), name='employee-export-csv'),
     path('employees/export/excel/', EmployeeExportExcelView.as_view(), name='employees_export_excel'),
+
+    # Background Export Jobs
+    path('employees/export/jobs/', EmployeeExportJobCreateView.as_view(), name='employee-export-job-create'),
+    path('employees/export/jobs/<uuid:pk>/', ExportJobDetailView.as_view(), name='employee-export-job-detail'),
+    path('employees/export/jobs/<uuid:pk>/download/', ExportJobDownloadView.as_view(), name='employee-export-job-download'),
+
+    # Analytics Endpoints
+    path('analytics/salaries/', SalaryAnalyticsView.as_view(), name='analytics-salaries'),
+    path('analytics/hires/', HiresAnalyticsView.as_view(), name='analytics-hires'),
 ]
@@ -0,0 +1,73 @@
+"""
+Data-version stamps kept in the configured cache.
+
+Every write to a model bumps its counter (see signals.py); anything derived from
+the data (export artifacts, cached responses) folds the counters into its key so
+it goes stale automatically. Missing counters are seeded from the clock, so a
+flushed cache can never resurrect an old version number.
+
+With read replicas, a write also marks its models as recently written for
+REPLICA_LAG_SECONDS. Reading a marked model's version pins the request's reads
+to the primary (core/db_router.py), so what is derived under the new version
+never comes from a replica that hasn't caught up.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.db_router import pin_primary
+
+
+def _key(model):
+    return f'adminpanel:version:{model._meta.label_lower}'
+
+
+def _written_key(model):
+    return f'adminpanel:written:{model._meta.label_lower}'
+
+
+def _written_keys(models):
+    return [_written_key(model) for model in models] if settings.REPLICA_DATABASES else []
+
+
+def _pin_if_written(values, written_keys):
+    if any(key in values for key in written_keys):
+        pin_primary()
+
+
+def get_versions(*models):
+    """Current version of each model, in the order given."""
+    keys = [_key(model) for model in models]
+    written_keys = _written_keys(models)
+    versions = cache.get_many(keys + written_keys)
+    _pin_if_written(versions, written_keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(*models):
+    """get_versions() through the async cache API, for the async views."""
+    keys = [_key(model) for model in models]
+    written_keys = _written_keys(models)
+    versions = await cache.aget_many(keys + written_keys)
+    _pin_if_written(versions, written_keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*models):
+    for model in models:
+        key = _key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+    if settings.REPLICA_DATABASES:
+        cache.set_many({key: True for key in _written_keys(models)}, settings.REPLICA_LAG_SECONDS)
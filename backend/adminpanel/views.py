@@ -1,183 +1,437 @@
-import openpyxl
+import tempfile
+from datetime import datetime
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
-from django.views.generic import TemplateView
+from rest_framework.generics import GenericAPIView, ListCreateAPIView, RetrieveAPIView, RetrieveUpdateDestroyAPIView
+from django.views.generic import TemplateView, View
+from django.db.models import Count
 from django.shortcuts import render, redirect
-from .models import Department, Position, Employee
+from core.db_router import stick_to_primary
+from . import refdata
+from .models import Department, Position, Employee, ExportJob
 from .forms import DepartmentForm, PositionForm, EmployeeForm
-from .serializers import DepartmentSerializer, MyTokenObtainPairSerializer, PositionSerializer, EmployeeSerializer
-from rest_framework import filters
+from .analytics import DEFAULT_PERCENTILES, GROUP_FIELDS, hires_per_month, salary_stats
+from .bulk import bulk_create_employees, bulk_delete_employees, bulk_update_employees
+from .filters import EMPLOYEE_FILTER_ORDERINGS, EmployeeFilter, IndexedOrderingFilter
+from .pagination import ListPagination, approximate_count
+from .parsers import NDJSONParser
+from .response_cache import CachedResponseMixin
+from .row_serializers import EmployeeRowSerializer
+from .search import EmployeeSearchFilter
+from .throttles import TokenClientRateThrottle, TokenEmailRateThrottle, TokenRefreshRateThrottle
+from .serializers import (
+    DepartmentSerializer, ExportJobSerializer, MyTokenObtainPairSerializer, PositionSerializer, EmployeeSerializer,
+    VersionedTokenRefreshSerializer,
+)
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.views import APIView
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_yasg import openapi
 
-# For CSV export
-import csv
-from django.http import HttpResponse
-from rest_framework.decorators import api_view, permission_classes
+# For CSV / Excel export
+import os
+import re
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from .exports import XLSX_CONTENT_TYPE, employee_export_rows, stream_csv, write_xlsx
+from .export_jobs import (
+    current_worker, export_fingerprint, fail_if_orphaned, find_reusable_job, normalize_params, start_export_job,
+)
 
 # REST API Views
 
 # Department API Views
-class DepartmentListCreateView(ListCreateAPIView):
+class DepartmentListCreateView(CachedResponseMixin, ListCreateAPIView):
+    cache_models = (Department,)
+    pagination_class = ListPagination
     queryset = Department.objects.all().order_by('id')
     serializer_class = DepartmentSerializer
     permission_classes = [IsAuthenticated]
 
-class DepartmentRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
+class DepartmentRetrieveUpdateDestroyView(CachedResponseMixin, RetrieveUpdateDestroyAPIView):
+    cache_models = (Department,)
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [IsAuthenticated]
 
 # Position API Views
-class PositionListCreateView(ListCreateAPIView):
+class PositionListCreateView(CachedResponseMixin, ListCreateAPIView):
+    cache_models = (Position,)
+    pagination_class = ListPagination
     queryset = Position.objects.all().order_by('id')
     serializer_class = PositionSerializer
     permission_classes = [IsAuthenticated]
 
-class PositionRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
+class PositionRetrieveUpdateDestroyView(CachedResponseMixin, RetrieveUpdateDestroyAPIView):
+    cache_models = (Position,)
     queryset = Position.objects.all()
     serializer_class = PositionSerializer
     permission_classes = [IsAuthenticated]
 
 # Employee API Views
-class EmployeeListCreateView(ListCreateAPIView):
+class EmployeeQueryMixin:
+    # Filter/search/ordering surface shared by the employee list and export endpoints
+    filter_backends = [DjangoFilterBackend, EmployeeSearchFilter, IndexedOrderingFilter]
+    filterset_class = EmployeeFilter
+    ordering_fields = ['id', 'date_of_joining', 'salary', 'last_name']
+    filter_orderings = EMPLOYEE_FILTER_ORDERINGS
+
+class EmployeeListCreateView(CachedResponseMixin, EmployeeQueryMixin, ListCreateAPIView):
+    cache_models = (Employee, Department, Position)  # Nested rows embed department and position names
+    pagination_class = ListPagination
     queryset = Employee.objects.select_related('department', 'position').all().order_by('id')
     serializer_class = EmployeeSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['department', 'position', 'date_of_joining']
-    search_fields = ['first_name', 'last_name', 'email', 'phone_number']
-    ordering_fields = '__all__'
 
-    @swagger_auto_schema(operation_summary="List and create employees")
+    @swagger_auto_schema(
+        operation_summary="List and create employees",
+        manual_parameters=[openapi.Parameter(
+            'nested', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+            description="Return department and position as {id, name} / {id, title} objects",
+        )],
+    )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+    def get_row_serializer(self):
+        return EmployeeRowSerializer(nested=self.request.query_params.get('nested', '').lower() in ('1', 'true', 'yes'))
+
+    def list(self, request, *args, **kwargs):
+        # Reads .values() rows through a precompiled field plan instead of EmployeeSerializer
+        serializer = self.get_row_serializer()
+        employees = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(employees)
+        if page is None:
+            return Response(serializer.to_representation(employees))
+        return self.get_paginated_response(serializer.to_representation(page))
+
     @swagger_auto_schema(operation_summary="Create a new employee")
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
-class EmployeeRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
+class EmployeeRetrieveUpdateDestroyView(CachedResponseMixin, RetrieveUpdateDestroyAPIView):
+    cache_models = (Employee, Department, Position)
     queryset = Employee.objects.select_related('department', 'position').all()
     serializer_class = EmployeeSerializer
     permission_classes = [IsAuthenticated]
-    
-class EmployeeExportExcelView(APIView):
+
+class EmployeeBulkView(APIView):
+    """
+    Batch creates (POST), partial updates (PATCH, items carry "id") and deletes
+    (DELETE, a list of ids). The body is a JSON array or NDJSON; the response has
+    one result per item, in request order.
+    """
+    parser_classes = [JSONParser, NDJSONParser]
     permission_classes = [IsAuthenticated]
 
+    def get_items(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'detail': 'Expected a JSON array or an NDJSON body.'})
+        if not items:
+            raise ValidationError({'detail': 'No items given.'})
+        if len(items) > settings.EMPLOYEE_BULK_MAX_BATCH:
+            raise ValidationError({'detail': f'At most {settings.EMPLOYEE_BULK_MAX_BATCH} items per request.'})
+        return items
+
+    def respond(self, results, done_status):
+        failed = sum(result['status'] == 'error' for result in results)
+        return Response({
+            done_status: len(results) - failed,
+            'failed': failed,
+            'results': results,
+        }, status=status.HTTP_200_OK if failed < len(results) else status.HTTP_400_BAD_REQUEST)
+
+    @swagger_auto_schema(operation_summary="Create employees in bulk", request_body=EmployeeSerializer(many=True))
+    def post(self, request):
+        return self.respond(bulk_create_employees(self.get_items(request)), 'created')
+
+    @swagger_auto_schema(operation_summary="Partially update employees in bulk (each item needs an \"id\")",
+                         request_body=EmployeeSerializer(many=True))
+    def patch(self, request):
+        return self.respond(bulk_update_employees(self.get_items(request)), 'updated')
+
+    @swagger_auto_schema(operation_summary="Delete employees in bulk (body: list of ids)")
+    def delete(self, request):
+        return self.respond(bulk_delete_employees(self.get_items(request)), 'deleted')
+
+class EmployeeExportExcelView(EmployeeQueryMixin, GenericAPIView):
+    queryset = Employee.objects.all().order_by('id')
+    serializer_class = EmployeeSerializer  # Only used to describe the filters in the API docs
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(operation_summary="Export employees as XLSX (accepts the list filters)")
     def get(self, request):
-        employees = Employee.objects.select_related('department', 'position').all()
-
-        # Create a workbook and sheet
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        sheet.title = 'Employees'
-
-        # Define column headers
-        headers = [
-            'ID', 'First Name', 'Last Name', 'Email', 'Phone Number',
-            'Date of Birth', 'Date of Joining', 'Salary',
-            'Department', 'Position'
-        ]
-        sheet.append(headers)
-
-        # Add data rows
-        for emp in employees:
-            sheet.append([
-                emp.id,
-                emp.first_name,
-                emp.last_name,
-                emp.email,
-                emp.phone_number,
-                emp.date_of_birth.strftime('%Y-%m-%d') if emp.date_of_birth else '',
-                emp.date_of_joining.strftime('%Y-%m-%d') if emp.date_of_joining else '',
-                emp.salary,
-                emp.department.name if emp.department else '',
-                emp.position.title if emp.position else '',
-            ])
-
-        # Create response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        employees = self.filter_queryset(self.get_queryset())
+
+        # Build the workbook on disk, then stream it; the temp file is removed when the response closes it
+        workbook_file = tempfile.TemporaryFile()
+        write_xlsx(employee_export_rows(employees), workbook_file)
+        workbook_file.seek(0)
+
+        return FileResponse(
+            workbook_file,
+            as_attachment=True,
+            filename='employees.xlsx',
+            content_type=XLSX_CONTENT_TYPE,
         )
-        response['Content-Disposition'] = 'attachment; filename="employees.xlsx"'
-        workbook.save(response)
-        return response
+
+# Analytics API Views (served from the summary tables in adminpanel/analytics.py)
+class AnalyticsQueryMixin:
+    cache_models = (Employee, Department, Position)
+    permission_classes = [IsAuthenticated]
+
+    def query_params(self, request):
+        params = request.query_params
+        group_by = [group for group in params.get('group_by', '').split(',') if group]
+        if any(group not in GROUP_FIELDS for group in group_by) or len(set(group_by)) != len(group_by):
+            raise ValidationError({'group_by': [f"Comma-separated subset of: {', '.join(GROUP_FIELDS)}."]})
+        filters = {}
+        for name in ('department', 'position'):
+            if params.get(name):
+                try:
+                    filters[name] = int(params[name])
+                except ValueError:
+                    raise ValidationError({name: ['A valid integer is required.']})
+        return group_by, filters
+
+class SalaryAnalyticsView(CachedResponseMixin, AnalyticsQueryMixin, APIView):
+    @swagger_auto_schema(operation_summary="Headcount and salary statistics (?group_by=department,position)")
+    def get(self, request):
+        group_by, filters = self.query_params(request)
+        try:
+            percentiles = [float(value) for value in request.query_params.get('percentiles', '').split(',') if value]
+        except ValueError:
+            percentiles = [-1]
+        if any(not 0 < percentile <= 100 for percentile in percentiles):
+            raise ValidationError({'percentiles': ['Comma-separated numbers between 0 and 100.']})
+        return Response({'results': salary_stats(group_by, percentiles=percentiles or DEFAULT_PERCENTILES, **filters)})
+
+class HiresAnalyticsView(CachedResponseMixin, AnalyticsQueryMixin, APIView):
+    @swagger_auto_schema(operation_summary="Hires per month of joining (?group_by=department,position&from=YYYY-MM&to=YYYY-MM)")
+    def get(self, request):
+        group_by, filters = self.query_params(request)
+        months = {}
+        for name in ('from', 'to'):
+            value = request.query_params.get(name)
+            if value:
+                try:
+                    months[name] = datetime.strptime(value, '%Y-%m').date()
+                except ValueError:
+                    raise ValidationError({name: ['Use the YYYY-MM format.']})
+        return Response({'results': hires_per_month(group_by, start=months.get('from'), end=months.get('to'), **filters)})
 
 # Web Dashboard View
+HOME_PAGE_SIZE = 50  # Employees rendered per dashboard page; later pages load from HomeEmployeesView
+
+def employee_page(after=None):
+    """One dashboard page of employees, newest first, plus the id to continue after (or None)."""
+    employees = Employee.objects.order_by('-id')
+    if after is not None:
+        employees = employees.filter(id__lt=after)
+    rows = list(employees.values('id', 'first_name', 'last_name', 'position__title')[:HOME_PAGE_SIZE + 1])
+    if len(rows) > HOME_PAGE_SIZE:
+        return rows[:HOME_PAGE_SIZE], rows[HOME_PAGE_SIZE - 1]['id']
+    return rows, None
+
 class HomeView(TemplateView):
     template_name = 'adminpanel/home.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        employees, next_after = employee_page()
         context.update({
-            'departments': Department.objects.all(),
-            'positions': Position.objects.all(),
-            'employees': Employee.objects.select_related('department', 'position').all(),
-            'department_form': DepartmentForm(),
-            'position_form': PositionForm(),
-            'employee_form': EmployeeForm(),
+            # Counts come from one GROUP BY query instead of loading the employees
+            'departments': Department.objects.annotate(employee_count=Count('employee')).order_by('name'),
+            'positions': refdata.positions.all(),
+            'employees': employees,
+            'next_after': next_after,
         })
+        # A failed POST passes its bound form back in, so its errors are shown
+        context.setdefault('department_form', DepartmentForm())
+        context.setdefault('position_form', PositionForm())
+        context.setdefault('employee_form', EmployeeForm())
         return context
 
     def post(self, request, *args, **kwargs):
-        if 'add_department' in request.POST:
-            form = DepartmentForm(request.POST)
-            if form.is_valid():
-                form.save()
-                return redirect('home')
-
-        elif 'add_position' in request.POST:
-            form = PositionForm(request.POST)
-            if form.is_valid():
-                form.save()
-                return redirect('home')
-
-        elif 'add_employee' in request.POST:
-            form = EmployeeForm(request.POST)
-            if form.is_valid():
-                form.save()
-                return redirect('home')
+        forms = {
+            'add_department': ('department_form', DepartmentForm),
+            'add_position': ('position_form', PositionForm),
+            'add_employee': ('employee_form', EmployeeForm),
+        }
+        for action, (name, form_class) in forms.items():
+            if action in request.POST:
+                form = form_class(request.POST)
+                if form.is_valid():
+                    form.save()
+                    return redirect('home')
+                return self.render_to_response(self.get_context_data(**{name: form}))
 
         return self.get(request, *args, **kwargs)
 
+class HomeEmployeesView(View):
+    """Later dashboard pages as JSON: ?after=<id of the last employee shown>, in the API's count/next/results shape."""
+
+    def get(self, request):
+        try:
+            after = int(request.GET['after'])
+        except (KeyError, ValueError):
+            return JsonResponse({'error': 'after must be an employee id'}, status=400)
+        employees, next_after = employee_page(after)
+        return JsonResponse({
+            'count': approximate_count(Employee.objects.all()),
+            'next': None if next_after is None else replace_query_param(request.build_absolute_uri(), 'after', next_after),
+            'results': employees,
+        })
+
 # CSV Export API View
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def export_employees_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="employees.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID', 'First Name', 'Last Name', 'Email', 'Phone Number',
-        'Date of Birth', 'Date of Joining', 'Salary',
-        'Department', 'Position'
-    ])
-
-    employees = Employee.objects.select_related('department', 'position').all()
-
-    for emp in employees:
-        writer.writerow([
-            emp.id,
-            emp.first_name,
-            emp.last_name,
-            emp.email,
-            emp.phone_number,
-            emp.date_of_birth,
-            emp.date_of_joining,
-            emp.salary,
-            emp.department.name if emp.department else '',
-            emp.position.title if emp.position else '',
-        ])
+class EmployeeExportCSVView(EmployeeQueryMixin, GenericAPIView):
+    # No select_related: the export reads plain tuples with the names joined in
+    queryset = Employee.objects.all().order_by('id')
+    serializer_class = EmployeeSerializer  # Only used to describe the filters in the API docs
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(operation_summary="Stream employees as CSV (accepts the list filters)")
+    def get(self, request):
+        employees = self.filter_queryset(self.get_queryset())
+
+        response = StreamingHttpResponse(
+            stream_csv(employee_export_rows(employees)),
+            content_type='text/csv',
+        )
+        response['Content-Disposition'] = 'attachment; filename="employees.csv"'
+        return response
+
+# Export Job API Views
+EXPORT_CONTENT_TYPES = {
+    ExportJob.FORMAT_CSV: 'text/csv',
+    ExportJob.FORMAT_XLSX: XLSX_CONTENT_TYPE,
+}
+
+class EmployeeExportJobCreateView(EmployeeQueryMixin, GenericAPIView):
+    queryset = Employee.objects.all().order_by('id')
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Start a background employee export (accepts the list filters as query params)",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={'file_format': openapi.Schema(type=openapi.TYPE_STRING, enum=list(EXPORT_CONTENT_TYPES))},
+        ),
+    )
+    def post(self, request):
+        file_format = request.data.get('file_format', ExportJob.FORMAT_CSV)
+        if file_format not in EXPORT_CONTENT_TYPES:
+            raise ValidationError({'file_format': [f"Must be one of: {', '.join(EXPORT_CONTENT_TYPES)}."]})
+
+        # Filtering first so bad filter params are rejected before a job is recorded
+        employees = self.filter_queryset(self.get_queryset())
+        params = normalize_params(request.query_params)
+        fingerprint = export_fingerprint(file_format, params)
+
+        job = find_reusable_job(fingerprint, request.user)
+        if job is None:
+            job = ExportJob.objects.create(
+                file_format=file_format,
+                params=params,
+                fingerprint=fingerprint,
+                created_by_id=request.user.pk,
+                worker=current_worker(),  # Queued on this process's thread pool
+            )
+            start_export_job(job, employees)
+
+        response_status = status.HTTP_200_OK if job.status == ExportJob.STATUS_DONE else status.HTTP_202_ACCEPTED
+        return Response(self.get_serializer(job).data, status=response_status)
+
+class ExportJobMixin:
+    # Jobs are private to the user who started them
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(created_by_id=self.request.user.pk)
 
+    def get_object(self):
+        job = super().get_object()
+        fail_if_orphaned(job)  # So a poller sees the failure instead of waiting forever
+        return job
+
+class ExportJobDetailView(ExportJobMixin, RetrieveAPIView):
+    pass
+
+class ExportJobDownloadView(ExportJobMixin, GenericAPIView):
+
+    @swagger_auto_schema(operation_summary="Download a finished export (supports Range requests)")
+    def get(self, request, pk):
+        job = self.get_object()
+        if job.status != ExportJob.STATUS_DONE:
+            return Response({'detail': f"Export is {job.status}."}, status=status.HTTP_409_CONFLICT)
+        if not os.path.exists(job.file_path):
+            return Response({'detail': "Export file has been removed."}, status=status.HTTP_410_GONE)
+
+        return _file_download_response(
+            request, job.file_path, f'employees.{job.file_format}', EXPORT_CONTENT_TYPES[job.file_format]
+        )
+
+def _read_file_range(file, length, block_size=64 * 1024):
+    try:
+        while length > 0:
+            data = file.read(min(block_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+def _file_download_response(request, path, filename, content_type):
+    # Honour a single "bytes=start-[end]" range so interrupted downloads can resume
+    size = os.path.getsize(path)
+    match = re.fullmatch(r'bytes=(\d+)-(\d*)', request.headers.get('Range', ''))
+
+    if match:
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        if start > end:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        file = open(path, 'rb')
+        file.seek(start)
+        response = StreamingHttpResponse(
+            _read_file_range(file, end - start + 1),
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    else:
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
     return response
 
-class MyTokenObtainPairView(TokenObtainPairView):
+class PinNewTokenMixin:
+    # The new access token is a client the replica stickiness hasn't seen: keep its
+    # first reads on the primary, which has the login's writes
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            stick_to_primary(response.data['access'])
+        return response
+
+class MyTokenObtainPairView(PinNewTokenMixin, TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
+    throttle_classes = [TokenClientRateThrottle, TokenEmailRateThrottle]
 
-    def post(self, request):
-        return super().post(request)
+class MyTokenRefreshView(PinNewTokenMixin, TokenRefreshView):
+    serializer_class = VersionedTokenRefreshSerializer
+    throttle_classes = [TokenRefreshRateThrottle]
@@ -1,56 +1,120 @@
+"""
+Clean a raw HR export into the column layout expected by `manage.py import_employees`.
+
+    python clean_employee_data.py ../archive/employee_records.csv ../archive/cleaned_employee_records.csv \
+        --reference-date 2026-01-01
+
+The input is processed in chunks with vectorized pandas/NumPy operations, so memory
+stays bounded for multi-million-row files. Output is deterministic for a given seed,
+chunk size and reference date (which generated birth dates are counted back from).
+"""
+import argparse
+from datetime import date
+
+import numpy as np
 import pandas as pd
-import os
-from faker import Faker
 
-# Initialize Faker
-fake = Faker()
-Faker.seed(42)
+OUTPUT_COLUMNS = [
+    'first_name', 'last_name', 'email', 'phone_number', 'date_of_birth',
+    'date_of_joining', 'salary', 'department', 'position',
+]
+
+PHONE_SPACE = 10 ** 10  # 10-digit phone numbers
+MIN_AGE, MAX_AGE = 22, 60
+
+
+class Cleaner:
+    def __init__(self, reference_date, seed=42, email_domain='example.com'):
+        self.rng = np.random.default_rng(seed)
+        self.email_domain = email_domain
+        self.reference_date = np.datetime64(reference_date, 'D')
+        self.email_counts = pd.Series(dtype='int64')  # Occurrences of each email base so far
+        self.rows_done = 0
+
+        # Phone n is (multiplier * n + offset) mod 10^10. The multiplier is coprime
+        # with 10^10, so the mapping is a bijection and numbers never repeat; keeping
+        # it below 9e8 keeps the product inside int64 for up to 10^9 rows.
+        multiplier = int(self.rng.integers(10 ** 6, 9 * 10 ** 8))
+        while multiplier % 2 == 0 or multiplier % 5 == 0:
+            multiplier += 1
+        self.phone_multiplier = multiplier
+        self.phone_offset = int(self.rng.integers(0, PHONE_SPACE))
+
+    @staticmethod
+    def _email_part(names):
+        # ASCII letters only: no base ends in a digit, so base + occurrence suffix never
+        # equals another base ("ann.lee" + "1" can't collide with a name giving "ann.lee1")
+        ascii_names = names.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+        return ascii_names.str.lower().str.replace(r'[^a-z]', '', regex=True)
+
+    def _emails(self, first_names, last_names):
+        base = (self._email_part(first_names) + '.' + self._email_part(last_names)).str.strip('.')
+        base = base.where(base != '', 'employee')
+
+        # n-th occurrence of a base (counting earlier chunks) gets suffix n; the first gets none
+        occurrence = base.groupby(base).cumcount() + base.map(self.email_counts).fillna(0).astype('int64')
+        suffix = occurrence.astype(str).where(occurrence > 0, '')
+        self.email_counts = self.email_counts.add(base.value_counts(), fill_value=0).astype('int64')
 
-# File paths
-input_file = r"F:\Python Projects\Sabhyasha Retail Tech\archive\employee_records.csv"
-output_file = r"F:\Python Projects\Sabhyasha Retail Tech\archive\cleaned_employee_records.csv"
+        return base + suffix + '@' + self.email_domain
 
-# Load CSV
-df = pd.read_csv(input_file)
+    def _phone_numbers(self, count):
+        index = np.arange(self.rows_done, self.rows_done + count, dtype=np.int64)
+        numbers = (index * self.phone_multiplier + self.phone_offset) % PHONE_SPACE
+        return pd.Series(numbers, dtype='int64').astype(str).str.zfill(10)
 
-# Split names
-df[['first_name', 'last_name']] = df['Employee_Name'].str.split(' ', n=1, expand=True)
+    def _dates_of_birth(self, count):
+        oldest = self.reference_date - np.timedelta64(365 * MAX_AGE + MAX_AGE // 4, 'D')
+        span = (365 * (MAX_AGE - MIN_AGE)) + (MAX_AGE - MIN_AGE) // 4
+        return oldest + self.rng.integers(0, span, size=count).astype('timedelta64[D]')
 
-# Track used emails to ensure uniqueness
-used_emails = set()
-emails = []
+    def clean(self, chunk):
+        names = chunk['Employee_Name'].fillna('').str.strip().str.split(' ', n=1, expand=True)
+        first_names = names[0]
+        last_names = names[1].fillna('') if 1 in names else pd.Series('', index=chunk.index)
 
-for i, row in df.iterrows():
-    base_email = f"{row['first_name'].lower()}.{row['last_name'].lower()}@example.com"
-    email = base_email
-    counter = 1
+        cleaned = pd.DataFrame({
+            'first_name': first_names,
+            'last_name': last_names,
+            'email': self._emails(first_names, last_names),
+            'phone_number': self._phone_numbers(len(chunk)).values,
+            'date_of_birth': self._dates_of_birth(len(chunk)),
+            'date_of_joining': chunk['Joining_Date'],
+            'salary': chunk['Salary'],
+            'department': chunk['Department'],
+            'position': chunk['Position'],
+        }, index=chunk.index)
 
-    while email in used_emails:
-        email = f"{row['first_name'].lower()}.{row['last_name'].lower()}{counter}@example.com"
-        counter += 1
+        self.rows_done += len(chunk)
+        return cleaned[OUTPUT_COLUMNS]
 
-    used_emails.add(email)
-    emails.append(email)
 
-df['email'] = emails
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Clean raw employee records for import_employees')
+    parser.add_argument('input_file', help='Raw CSV (Employee_Name, Department, Position, Salary, Joining_Date, ...)')
+    parser.add_argument('output_file', help='Where to write the cleaned CSV')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Rows processed per chunk')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for generated phone numbers and birth dates')
+    parser.add_argument('--email-domain', default='example.com')
+    parser.add_argument(
+        '--reference-date', required=True, type=date.fromisoformat,
+        help=f'YYYY-MM-DD that generated birth dates ({MIN_AGE}-{MAX_AGE} years before it) are counted from',
+    )
+    args = parser.parse_args(argv)
 
-# Generate unique phone numbers
-df['phone_number'] = [fake.unique.msisdn()[:10] for _ in range(len(df))]
+    cleaner = Cleaner(args.reference_date, seed=args.seed, email_domain=args.email_domain)
+    reader = pd.read_csv(
+        args.input_file,
+        chunksize=args.chunksize,
+        usecols=['Employee_Name', 'Department', 'Position', 'Salary', 'Joining_Date'],
+        dtype={'Employee_Name': str, 'Department': str, 'Position': str, 'Joining_Date': str},
+    )
 
-# Add random realistic date_of_birth
-df['date_of_birth'] = [fake.date_of_birth(minimum_age=22, maximum_age=60) for _ in range(len(df))]
+    for number, chunk in enumerate(reader):
+        cleaner.clean(chunk).to_csv(args.output_file, mode='w' if number == 0 else 'a', header=number == 0, index=False)
 
-# Rename columns to match model
-df.rename(columns={
-    'Joining_Date': 'date_of_joining',
-    'Salary': 'salary',
-    'Department': 'department',
-    'Position': 'position'
-}, inplace=True)
+    print(f"✅ Data cleaned and saved: {args.output_file} ({cleaner.rows_done} rows)")
 
-# Select required fields
-df = df[['first_name', 'last_name', 'email', 'phone_number', 'date_of_birth', 'date_of_joining', 'salary', 'department', 'position']]
 
-# Save
-df.to_csv(output_file, index=False)
-print(f"✅ Data cleaned and saved: {output_file}")
+if __name__ == '__main__':
+    main()
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')  # Native async read endpoints (adminpanel/async_views.py)
+# Requests don't keep a thread under ASGI, so connections can't persist per thread; use DB_POOL_SIZE instead
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
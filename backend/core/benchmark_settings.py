@@ -0,0 +1,30 @@
+"""
+Settings for `manage.py benchmark --settings=core.benchmark_settings`: a throwaway
+SQLite database and an in-process cache, so benchmarks run without MySQL or Redis.
+"""
+from .settings import *  # noqa: F401,F403
+
+_configured = DATABASES['default']  # noqa: F405
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'core.db_backends.sqlite3',
+        'NAME': BASE_DIR / 'benchmark.sqlite3',  # noqa: F405
+        # Connection lifetime and pooling as configured through the environment
+        'CONN_MAX_AGE': _configured['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': _configured['CONN_HEALTH_CHECKS'],
+        'POOL': _configured['POOL'],
+    }
+}
+
+# A second SQLite database standing in for a replica. BENCHMARK_REPLICA=1 routes reads to it
+# (a replica of the same file, so always in sync); tests opt in with override_settings and get
+# their own, separate (empty) test database for it.
+DATABASES['replica_1'] = {**DATABASES['default']}
+REPLICA_DATABASES = ['replica_1'] if os.environ.get('BENCHMARK_REPLICA') == '1' else []  # noqa: F405
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
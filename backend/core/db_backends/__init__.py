@@ -0,0 +1,5 @@
+"""
+Django's database backends with connect timing and optional pooling (core/db_pool.py).
+
+Use them as ENGINE, e.g. 'core.db_backends.mysql' in place of 'django.db.backends.mysql'.
+"""
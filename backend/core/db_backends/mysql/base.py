@@ -0,0 +1,7 @@
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from core.db_pool import PooledDatabaseMixin
+
+
+class DatabaseWrapper(PooledDatabaseMixin, MySQLDatabaseWrapper):
+    pass
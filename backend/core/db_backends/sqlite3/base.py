@@ -0,0 +1,7 @@
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+
+from core.db_pool import PooledDatabaseMixin
+
+
+class DatabaseWrapper(PooledDatabaseMixin, SQLiteDatabaseWrapper):
+    pass
@@ -0,0 +1,187 @@
+"""
+Connection timing and pooling for the database backends in core/db_backends.
+
+Every connect is timed into the request's "db_connect" section, which shows up
+in Server-Timing and the metrics endpoint. With DATABASES[alias]['POOL']['MAX_SIZE']
+above 0, connections come from a per-process pool instead of being opened, and
+closing one hands it back. CONN_MAX_AGE should then be 0, so each request
+returns its connection when it finishes.
+
+- At most MAX_SIZE connections are open per database. A caller waits up to
+  TIMEOUT seconds for one to come back, then gets OperationalError.
+- A connection idle for more than CHECK_IDLE seconds is checked with SELECT 1
+  before it is handed out. One older than MAX_LIFETIME seconds is closed instead.
+- A connection closed inside a transaction, outside autocommit or after a
+  database error that left it unusable is closed, never reused.
+
+In-memory SQLite databases (the test database) are never pooled.
+"""
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from django.db.utils import OperationalError
+
+from .metrics import instrument
+
+POOL_DEFAULTS = {'MAX_SIZE': 0, 'TIMEOUT': 5, 'CHECK_IDLE': 30, 'MAX_LIFETIME': 30 * 60}
+
+
+class ConnectionPool:
+    def __init__(self, alias, max_size, timeout=5, check_idle=30, max_lifetime=30 * 60):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.max_lifetime = max_lifetime
+        self.size = 0  # Open connections: idle, handed out or being opened
+        self._idle = deque()  # (connection, released at); the most recently used on the right
+        self._opened_at = {}  # id(connection) -> when it was opened
+        self._condition = threading.Condition()
+        self.opened = self.discarded = self.waits = self.timeouts = 0
+
+    def acquire(self, connect):
+        """A pooled connection, or a new one from connect() if there is room."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = self._take(deadline)
+            if entry is None:
+                return self._open(connect)
+            connection, released_at = entry
+            now = time.monotonic()
+            if now - self._opened_at[id(connection)] > self.max_lifetime:
+                self.discard(connection)
+            elif now - released_at > self.check_idle and not self._alive(connection):
+                self.discard(connection)
+            else:
+                return connection
+
+    def release(self, connection, reusable=True):
+        if not reusable:
+            self.discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._opened_at.pop(id(connection), None)
+            self.size -= 1
+            self.discarded += 1
+            self._condition.notify()
+
+    def _take(self, deadline):
+        # An idle entry, or None once a slot for a new connection is reserved
+        with self._condition:
+            waited = False
+            while not self._idle and self.size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise OperationalError(
+                        f"No connection to '{self.alias}' came free within {self.timeout}s "
+                        f"(pool size {self.max_size})."
+                    )
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self._condition.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self.size += 1
+            return None
+
+    def _open(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self._condition:
+                self.size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opened_at[id(connection)] = time.monotonic()
+            self.opened += 1
+        return connection
+
+    def _alive(self, connection):
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def stats(self):
+        with self._condition:
+            idle = len(self._idle)
+            return {
+                'alias': self.alias,
+                'max_size': self.max_size,
+                'size': self.size,
+                'idle': idle,
+                'in_use': self.size - idle,
+                'opened': self.opened,
+                'discarded': self.discarded,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(wrapper):
+    """The pool behind a DatabaseWrapper, or None if its database isn't pooled."""
+    settings_dict = wrapper.settings_dict
+    options = {**POOL_DEFAULTS, **settings_dict.get('POOL', {})}
+    if not options['MAX_SIZE'] or getattr(wrapper, 'is_in_memory_db', lambda: False)():
+        return None
+    # Keyed by the connection target too, as the test runner renames the database in place
+    key = (wrapper.alias, str(settings_dict['NAME']), settings_dict['HOST'], settings_dict['PORT'], settings_dict['USER'])
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                wrapper.alias, options['MAX_SIZE'], options['TIMEOUT'], options['CHECK_IDLE'], options['MAX_LIFETIME'],
+            )
+        return _pools[key]
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+class PooledDatabaseMixin:
+    """Mixed into a backend's DatabaseWrapper (see core/db_backends)."""
+
+    def connect(self):
+        with instrument('db_connect'):
+            super().connect()
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self)
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        return pool.acquire(partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        pool = get_pool(self)
+        if pool is None or self.connection is None:
+            return super()._close()
+        # Transaction state must not carry over into the next request, nor a
+        # connection broken by an error (checked the way close_if_unusable_or_obsolete does)
+        reusable = self.autocommit and not self.in_atomic_block and (not self.errors_occurred or self.is_usable())
+        pool.release(self.connection, reusable=reusable)
@@ -0,0 +1,177 @@
+"""
+Read-replica routing.
+
+REPLICA_DATABASES lists the replica aliases (DB_REPLICA_HOSTS in settings.py).
+ReplicaRoutingMiddleware lets a request read from a replica when all of these hold:
+- it is safe (GET, HEAD, OPTIONS);
+- a view from REPLICA_READ_VIEW_MODULES serves it (the adminpanel API, pages
+  and exports, and the admin);
+- its client hasn't written in the last REPLICA_LAG_SECONDS.
+
+ReplicaRouter then sends the request's reads to one replica, picked at random
+among the reachable ones. Writes, and every query outside such requests, go to
+the primary ('default').
+
+A request's reads go back to the primary for the rest of it:
+- once it writes, through the ORM or a raw cursor on the primary (note_writes());
+- once it reads the data version of a model written in the last
+  REPLICA_LAG_SECONDS (adminpanel/versioning.py). Nothing read from a lagging
+  replica is then cached under the new version.
+
+A client is identified by its token, else its session, else its address. A
+token or session just handed out at login is a new identity, so it is kept on
+the primary for REPLICA_LAG_SECONDS too (stick_to_primary()).
+
+Streaming responses (the exports) read as they are sent, after the view has
+returned, so their content is wrapped to carry the request's routing along.
+
+A replica that can't be reached is skipped for REPLICA_RETRY_SECONDS. With
+none left, reads fall back to the primary.
+"""
+import hashlib
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('replica_routing', default=None)
+_unreachable_until = {}  # Replica alias -> time.monotonic() until which it is skipped
+
+WRITE_STATEMENT = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|ALTER|DROP|TRUNCATE)\b', re.IGNORECASE)
+
+
+class RoutingState:
+    """Where the current request's reads go."""
+
+    def __init__(self, replica_allowed):
+        self.replica_allowed = replica_allowed  # Safe method, client not sticky
+        self.replica = None  # Picked once the view turns out to be a replica reader
+        self.primary = False  # Pinned to the primary for the rest of the request
+        self.wrote = False
+
+    def read_alias(self):
+        return None if self.primary else self.replica
+
+
+def current_state():
+    return _current.get()
+
+
+@contextmanager
+def routing(state):
+    token = _current.set(state)
+    try:
+        yield state
+    finally:
+        _current.reset(token)
+
+
+_END = object()
+
+
+def routed_stream(state, content):
+    """A streaming response's content, produced under the request's routing like the rest of it."""
+    iterator = iter(content)
+    while True:
+        with routing(state):  # Per chunk, as the server may resume the stream in another context
+            chunk = next(iterator, _END)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+async def arouted_stream(state, content):
+    iterator = aiter(content)
+    while True:
+        with routing(state):
+            chunk = await anext(iterator, _END)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+def pin_primary():
+    """Send the rest of the current request's reads to the primary."""
+    state = _current.get()
+    if state is not None:
+        state.primary = True
+
+
+def note_writes(execute, sql, params, many, context):
+    """Execute wrapper on the primary: a write pins the request even when it bypasses the router."""
+    state = _current.get()
+    if state is not None and not state.wrote and WRITE_STATEMENT.match(sql):
+        state.wrote = state.primary = True
+    return execute(sql, params, many, context)
+
+
+def install_write_tracker(connection, **kwargs):
+    """Keep note_writes() on the primary's connections; a connection_created receiver."""
+    if connection.alias == DEFAULT_DB_ALIAS and note_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(note_writes)
+
+
+def client_identity(request):
+    # The client behind a request: its token (without the auth scheme), else its session, else its address
+    token = request.headers.get('Authorization', '').partition(' ')[2].strip()
+    return token or request.COOKIES.get(settings.SESSION_COOKIE_NAME) or request.META.get('REMOTE_ADDR', '')
+
+
+def sticky_key(identity):
+    return 'core:replica_sticky:' + hashlib.md5(identity.encode()).hexdigest()
+
+
+def stick_to_primary(*identities):
+    """Keep the reads of these clients (e.g. a token just issued) on the primary for REPLICA_LAG_SECONDS."""
+    if settings.REPLICA_DATABASES:
+        cache.set_many({sticky_key(identity): True for identity in identities}, settings.REPLICA_LAG_SECONDS)
+
+
+def reads_from_replica(view_func):
+    return view_func.__module__.startswith(tuple(settings.REPLICA_READ_VIEW_MODULES))
+
+
+def pick_replica():
+    """A reachable replica alias, or None."""
+    now = time.monotonic()
+    candidates = [alias for alias in settings.REPLICA_DATABASES if _unreachable_until.get(alias, 0) <= now]
+    random.shuffle(candidates)
+    for alias in candidates:
+        connection = connections[alias]
+        try:
+            if connection.connection is not None and not connection.is_usable():
+                connection.close()
+            connection.ensure_connection()
+            return alias
+        except DatabaseError:
+            logger.warning("Replica '%s' is unreachable; skipping it for %ss", alias, settings.REPLICA_RETRY_SECONDS)
+            _unreachable_until[alias] = now + settings.REPLICA_RETRY_SECONDS
+    return None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        return None if state is None else state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = state.primary = True  # Read-your-writes within the request
+        # Explicitly, or an object read from a replica would be saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's data, so objects read from any of them relate freely
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
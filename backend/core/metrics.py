@@ -0,0 +1,152 @@
+"""
+Per-request instrumentation data and the rolling per-route statistics behind
+the local metrics endpoint (see InstrumentationMiddleware in core/middleware.py).
+"""
+import hmac
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponseForbidden, JsonResponse
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.sections = defaultdict(float)  # Timed sections such as "serialize", in seconds
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def record_query(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook: time every query the request runs."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+
+def record_query(execute, sql, params, many, context):
+    """connection.execute_wrapper hook: times the query for the request being measured, if any."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    """
+    Keep record_query() on the connection for good; also a connection_created receiver.
+
+    Connections belong to a thread, and the async ORM queries from a thread of its
+    own, so a wrapper added per request would miss those queries. record_query()
+    finds the request through the context instead, which sync_to_async carries over.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def collecting(metrics):
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def instrument(section):
+    """Add the time spent in the block to the current request's `section` timing."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.sections[section] += time.perf_counter() - started
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class RouteStats:
+    """The last METRICS_WINDOW samples of every route, summarised on read."""
+    FIELDS = ('total_ms', 'db_queries', 'db_ms', 'db_connect_ms', 'serialize_ms', 'password_hash_ms', 'response_bytes')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._requests = defaultdict(int)
+
+    def add(self, route, sample):
+        with self._lock:
+            if route not in self._samples:
+                self._samples[route] = deque(maxlen=settings.METRICS_WINDOW)
+            self._samples[route].append(sample)
+            self._requests[route] += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = {route: list(window) for route, window in self._samples.items()}
+            requests = dict(self._requests)
+
+        routes = {}
+        for route, window in sorted(samples.items()):
+            summary = {'requests': requests[route], 'window': len(window)}
+            for index, field in enumerate(self.FIELDS):
+                values = [sample[index] for sample in window if sample[index] is not None]
+                if values:
+                    summary[field] = {
+                        'mean': round(sum(values) / len(values), 2),
+                        'p50': _percentile(values, 50),
+                        'p95': _percentile(values, 95),
+                        'p99': _percentile(values, 99),
+                        'max': max(values),
+                    }
+            routes[route] = summary
+        return routes
+
+
+route_stats = RouteStats()
+
+
+def metrics_allowed(request):
+    """Staff users, requests carrying METRICS_TOKEN and, where configured, addresses in METRICS_ALLOWED_IPS."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    token = request.headers.get('X-Metrics-Token', '')
+    if settings.METRICS_TOKEN and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        return True
+    # Behind a proxy on the same host every request comes from its address, so the
+    # allowlist is only safe when clients reach this process directly
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """Rolling per-route request statistics and connection pool state for this process; see metrics_allowed()."""
+    from .db_pool import pool_stats  # db_pool times connects through this module
+
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return JsonResponse({'routes': route_stats.snapshot(), 'pools': pool_stats()})
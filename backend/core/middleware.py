@@ -1,8 +1,28 @@
 from django.shortcuts import redirect
+import json
 import logging
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_router import (
+    RoutingState, arouted_stream, client_identity, current_state, install_write_tracker, pick_replica,
+    reads_from_replica, routed_stream, routing, sticky_key,
+)
+from .metrics import RequestMetrics, collecting, install_query_recorder, route_stats
 
 logger = logging.getLogger(__name__)
 
+_END = object()
+
+connection_created.connect(install_query_recorder)
+connection_created.connect(install_write_tracker)
+
 class DebugRedirectMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -14,3 +34,178 @@ class DebugRedirectMiddleware:
             logger.warning(f"Redirecting {request.path} → {response['Location']}")
         
         return response
+
+
+class InstrumentationMiddleware:
+    """
+    Times every request: total time, DB query count and time (through
+    metrics.record_query), connection setup, instrumented sections such as
+    serialization and the response size. Adds a Server-Timing header, feeds the
+    per-route stats of the metrics endpoint and logs a structured line for slow
+    or query-heavy requests. Streamed responses are recorded once their body has
+    been sent, so the queries it runs are counted.
+    """
+
+    sync_capable = True
+    async_capable = True  # Keeps the async views in async_views.py off a thread under ASGI
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        with self.measuring(metrics):
+            response = self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        with self.measuring(metrics):
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    @contextmanager
+    def measuring(self, metrics):
+        for connection in connections.all():  # Opened before the receiver was connected
+            install_query_recorder(connection)
+        with collecting(metrics):
+            yield
+
+    def finish(self, request, response, metrics):
+        db_ms = metrics.db_seconds * 1000
+        timings = [f'db;dur={db_ms:.1f};desc="{metrics.db_queries} queries"']
+        timings += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in metrics.sections.items()]
+        timings.append(f'total;dur={metrics.elapsed * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)  # Sent first, so a streamed body is not included
+
+        if response.streaming:
+            # The body is produced (and queried for) as it is sent: keep measuring
+            # until it is done, then record the request
+            stream = self.ameasured_stream if response.is_async else self.measured_stream
+            response.streaming_content = stream(request, response, metrics, response.streaming_content)
+        else:
+            self.record(request, response, metrics, len(response.content))
+        return response
+
+    def measured_stream(self, request, response, metrics, content):
+        size = 0
+        iterator = iter(content)
+        try:
+            while True:
+                with collecting(metrics):  # Per chunk, as the server may resume the stream in another context
+                    chunk = next(iterator, _END)
+                if chunk is _END:
+                    return
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.record(request, response, metrics, size)
+
+    async def ameasured_stream(self, request, response, metrics, content):
+        size = 0
+        iterator = aiter(content)
+        try:
+            while True:
+                with collecting(metrics):
+                    chunk = await anext(iterator, _END)
+                if chunk is _END:
+                    return
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.record(request, response, metrics, size)
+
+    def record(self, request, response, metrics, size):
+        total_ms = metrics.elapsed * 1000
+        db_ms = metrics.db_seconds * 1000
+        connect_ms = metrics.sections.get('db_connect', 0) * 1000  # Opening or taking a pooled connection
+        serialize_ms = metrics.sections.get('serialize', 0) * 1000
+        hash_seconds = metrics.sections.get('password_hash')  # Only requests that ran the hasher
+        hash_ms = None if hash_seconds is None else round(hash_seconds * 1000, 2)
+
+        match = request.resolver_match
+        route = f"{request.method} /{match.route if match else '<unmatched>'}"
+        route_stats.add(route, (
+            round(total_ms, 2), metrics.db_queries, round(db_ms, 2), round(connect_ms, 2), round(serialize_ms, 2),
+            hash_ms, size,
+        ))
+
+        if total_ms >= settings.SLOW_REQUEST_MS or metrics.db_queries >= settings.SLOW_REQUEST_QUERIES:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'route': route,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'total_ms': round(total_ms, 1),
+                'db_queries': metrics.db_queries,
+                'db_ms': round(db_ms, 1),
+                'db_connect_ms': round(connect_ms, 1),
+                'serialize_ms': round(serialize_ms, 1),
+                'password_hash_ms': hash_ms,
+                'response_bytes': size,
+            }))
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Routes the reads of safe requests to the views in REPLICA_READ_VIEW_MODULES
+    to a replica (see core/db_router.py), and keeps a client's reads on the
+    primary for REPLICA_LAG_SECONDS after it writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        safe = request.method in SAFE_METHODS
+        state = RoutingState(replica_allowed=safe and not cache.get(sticky_key(client_identity(request))))
+        with routing(state):
+            response = self.get_response(request)
+        if state.wrote or not safe:
+            cache.set_many(self.sticky_keys(request, response), settings.REPLICA_LAG_SECONDS)
+        return self.route_stream(response, state)
+
+    async def __acall__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return await self.get_response(request)
+        safe = request.method in SAFE_METHODS
+        state = RoutingState(replica_allowed=safe and not await cache.aget(sticky_key(client_identity(request))))
+        with routing(state):
+            response = await self.get_response(request)
+        if state.wrote or not safe:
+            await cache.aset_many(self.sticky_keys(request, response), settings.REPLICA_LAG_SECONDS)
+        return self.route_stream(response, state)
+
+    def sticky_keys(self, request, response):
+        # The client's, and that of a session it was just given: logging in rotates the session key
+        identities = [client_identity(request)]
+        session = response.cookies.get(settings.SESSION_COOKIE_NAME)
+        if session is not None and session.value:
+            identities.append(session.value)
+        return {sticky_key(identity): True for identity in identities}
+
+    def route_stream(self, response, state):
+        if response.streaming and state.replica is not None:
+            stream = arouted_stream if response.is_async else routed_stream
+            response.streaming_content = stream(state, response.streaming_content)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Runs in a thread under ASGI, so the replica can be connected to here
+        state = current_state()
+        if state is not None and state.replica_allowed and reads_from_replica(view_func):
+            state.replica = pick_replica()
+        return None
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -35,7 +36,7 @@ INSTALLED_APPS = [
 # DRF Pagination Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'adminpanel.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -45,6 +46,17 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # orjson-backed when installed; same output as DRF's JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'adminpanel.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Token endpoints only (adminpanel/throttles.py); each login runs the password hasher
+    'DEFAULT_THROTTLE_RATES': {
+        'token_client': '60/min',
+        'token_email': '10/min',
+        'token_refresh': '120/min',  # No password hashing, so cheaper than a login
+    },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
 }
@@ -70,7 +82,39 @@ CACHES = {
     }
 }
 
+# Tests run against the local-memory backend as a stand-in for Redis
+if 'test' in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Serve the list/detail reads and the CSV export from adminpanel/async_views.py; core/asgi.py turns it on
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+
+# Seconds a cached API response is kept (entries are invalidated on write regardless)
+API_CACHE_TIMEOUT = 60 * 10
+
+# Seconds the full user behind a JWT is cached (adminpanel/authentication.py); revocation applies at once
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Seconds a login's token pair is handed back to the same credentials and client without hashing (0 disables)
+TOKEN_REUSE_SECONDS = 30
+# Secret for the HMAC those pairs are cached under, kept apart from SECRET_KEY; reuse is off while it is unset
+TOKEN_REUSE_KEY = os.environ.get('TOKEN_REUSE_KEY', '')
+
+# Background export jobs (adminpanel/export_jobs.py)
+EXPORT_ROOT = os.path.join(BASE_DIR, 'exports')  # Finished export artifacts
+EXPORT_JOB_WORKERS = 2  # Threads per process rendering exports
+EXPORT_JOB_TIMEOUT = 15 * 60  # Seconds without a heartbeat before an unfinished job is treated as abandoned
+
+# Bulk employee endpoint (adminpanel/bulk.py)
+EMPLOYEE_BULK_MAX_BATCH = 1000  # Items accepted per request
+
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',  # Outermost, so it times everything below it
+    'core.middleware.ReplicaRoutingMiddleware',  # Read replicas (core/db_router.py)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,6 +124,17 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request instrumentation (core/middleware.py, core/metrics.py)
+SLOW_REQUEST_MS = 500  # Requests at least this slow are logged
+SLOW_REQUEST_QUERIES = 50  # ...and so are requests running at least this many queries
+METRICS_WINDOW = 1000  # Recent requests kept per route for the metrics endpoint
+# The metrics endpoint is open to staff users and to requests sending METRICS_TOKEN
+# in an X-Metrics-Token header. METRICS_ALLOWED_IPS opts addresses in without
+# either; leave it empty behind a reverse proxy on the same host, where every
+# request arrives from 127.0.0.1.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = []
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -103,18 +158,64 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+#
+# Configured from the environment; the defaults are the local development database.
+# With DB_POOL_SIZE above 0 each process keeps a pool of that many connections (core/db_pool.py)
+# and requests hand theirs back when they finish. Otherwise connections persist for
+# DB_CONN_MAX_AGE seconds and are health-checked before they are reused.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0'))
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'sabhyasha_db',
-        'USER': 'sabhyasha_user',
-        'PASSWORD': '12345',
-        'HOST': 'localhost',  # Use the actual host if different
-        'PORT': '3306',       # Default MySQL port
+        'ENGINE': 'core.db_backends.mysql',  # django.db.backends.mysql with connect timing and pooling
+        'NAME': os.environ.get('DB_NAME', 'sabhyasha_db'),
+        'USER': os.environ.get('DB_USER', 'sabhyasha_user'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', '12345'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '3306'),
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5')),
+        },
+        'POOL': {
+            'MAX_SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', '5')),  # Seconds to wait for a free connection
+            'CHECK_IDLE': int(os.environ.get('DB_POOL_CHECK_IDLE', '30')),  # Ping connections idle this long
+            'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', '1800')),  # Below MySQL's wait_timeout
+        },
     }
 }
 
+# Read replicas (core/db_router.py): DB_REPLICA_HOSTS=host[:port],... adds replica_1, replica_2, ...
+# with the primary's database and credentials (DB_REPLICA_USER / DB_REPLICA_PASSWORD to override).
+for _index, _host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    _host, _, _port = _host.strip().partition(':')
+    DATABASES[f'replica_{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'PORT': _port or DATABASES['default']['PORT'],
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'TEST': {'MIRROR': 'default'},  # Tests read what they wrote
+    }
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias.startswith('replica_')]
+REPLICA_LAG_SECONDS = int(os.environ.get('DB_REPLICA_LAG_SECONDS', '5'))  # Reads stay on the primary this long after a write
+REPLICA_RETRY_SECONDS = 30  # An unreachable replica is skipped this long
+REPLICA_READ_VIEW_MODULES = ['adminpanel.', 'django.contrib.admin.']  # Views whose safe requests may read from replicas
+
+
+# Django's default hashers; PBKDF2 is timed into Server-Timing and the metrics endpoint (password_hash)
+PASSWORD_HASHERS = [
+    'adminpanel.hashers.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
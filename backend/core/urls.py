@@ -1,11 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
-from adminpanel.views import HomeView, MyTokenObtainPairView  # ✅ Custom token view
+from adminpanel.views import HomeEmployeesView, HomeView, MyTokenObtainPairView, MyTokenRefreshView  # ✅ Custom token views
 from rest_framework import permissions
+from core.metrics import metrics_view
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
-from rest_framework_simplejwt.views import TokenRefreshView
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from adminpanel.authentication import ClaimsJWTAuthentication
 
 # ✅ Swagger schema configuration
 schema_view = get_schema_view(
@@ -16,17 +16,19 @@ schema_view = get_schema_view(
     ),
     public=True,
     permission_classes=(permissions.AllowAny,),
-    authentication_classes=(JWTAuthentication,),
+    authentication_classes=(ClaimsJWTAuthentication,),
 )
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
+    path('home/employees/', HomeEmployeesView.as_view(), name='home-employees'),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
     path('api/', include('adminpanel.urls')),
 
     # ✅ JWT token endpoints
     path('api/token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/refresh/', MyTokenRefreshView.as_view(), name='token_refresh'),
 
     # ✅ Swagger and ReDoc UI endpoints
     path('api/docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),